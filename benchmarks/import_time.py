@@ -0,0 +1,58 @@
+"""
+measures the cold start cost of importing portfoliosim
+
+each measurement runs in a fresh interpreter so nothing is cached in sys.modules.
+compares a bare 'import portfoliosim' against importing it and touching Simulator,
+which is what the package cost before heavy imports were deferred
+
+usage:
+    python benchmarks/import_time.py [repeats]
+"""
+import subprocess
+import statistics
+import sys
+import pathlib
+
+REPO_ROOT = pathlib.Path(__file__).resolve().parent.parent
+
+SNIPPETS = {
+    'import portfoliosim': 'import portfoliosim',
+    'import portfoliosim; portfoliosim.Simulator': 'import portfoliosim; portfoliosim.Simulator'
+    }
+
+TIMER = """
+import time
+start = time.perf_counter()
+{snippet}
+print(time.perf_counter() - start)
+"""
+
+def time_snippet(snippet, repeats):
+    """
+    returns list of wall times in seconds for running snippet in fresh interpreters
+    """
+    times = []
+    for i in range(repeats):
+        output = subprocess.run(
+            [sys.executable, '-c', TIMER.format(snippet=snippet)],
+            cwd=REPO_ROOT,
+            check=True,
+            capture_output=True,
+            text=True
+            ).stdout
+        times.append(float(output.strip().splitlines()[-1]))
+    return(times)
+
+def main():
+    repeats = int(sys.argv[1]) if len(sys.argv) > 1 else 10
+    results = {}
+    for name, snippet in SNIPPETS.items():
+        results[name] = statistics.median(time_snippet(snippet, repeats))
+        print(f'{name:<45} median {results[name]*1000:8.1f} ms over {repeats} runs')
+
+    lazy = results['import portfoliosim']
+    eager = results['import portfoliosim; portfoliosim.Simulator']
+    print(f'cold start gain from deferred imports: {eager/max(lazy,1e-9):.0f}x ({(eager-lazy)*1000:.1f} ms)')
+
+if __name__ == '__main__':
+    main()
@@ -1,4 +1,24 @@
 __version__ = '0.1.0'
 
-from .simulator import Simulator
-from .simulation import Simulation
\ No newline at end of file
+import importlib
+
+# public names and the submodule defining them
+# submodules pull in pandas, numpy and progressbar, so they are only imported
+# the first time one of these names is accessed
+_lazy_attributes = {
+    'Simulator': 'simulator',
+    'Simulation': 'simulation',
+    'Results': 'results',
+    'ResultsWriter': 'writer'
+    }
+
+def __getattr__(name):
+    if name in _lazy_attributes:
+        module = importlib.import_module(f'.{_lazy_attributes[name]}', __name__)
+        value = getattr(module, name)
+        globals()[name] = value
+        return(value)
+    raise AttributeError(f"module '{__name__}' has no attribute '{name}'")
+
+def __dir__():
+    return(sorted(list(globals()) + list(_lazy_attributes)))
@@ -0,0 +1,109 @@
+import asyncio
+from .parallel import run_windows
+from .kernel import build_window_arrays, normalise_allocation, run_kernel, kernel_results_to_frames
+
+def run_time_frame_range(spec, start, stop):
+    """
+    runs time frames start to stop - 1 of a simulator on its engine
+
+    a module level function of plain data so it can be sent to a process pool
+
+    Parameters:
+        spec: dict
+            historical_data, income_schedule and the simulation config, as built by Simulator.
+            historical_data may hold only the rows from first_row on, see get_range_spec
+
+        start, stop: int
+            range of time frames to run. time frame i starts at row i - first_row of historical_data
+
+    Returns:
+        run_results, timestep_data: data frames for the time frames, without simulator_id
+    """
+    simulation_length_years = spec['simulation_length_years']
+    income_schedule = spec['income_schedule']
+    first_row = spec.get('first_row', 0)
+    if spec['engine'] == 'vectorized':
+        historical_data = spec['historical_data'].iloc[start-first_row:stop-first_row-1+12*simulation_length_years]
+        prices, years, months = build_window_arrays(historical_data,simulation_length_years)
+        results = run_kernel(
+            prices,
+            income_schedule['desired_income'].to_numpy(),
+            income_schedule['min_income'].to_numpy(),
+            spec['starting_portfolio_value'],
+            spec['max_withdrawal_rate'],
+            normalise_allocation(spec['portfolio_allocation']),
+            spec['cash_buffer_years']
+            )
+        return(kernel_results_to_frames(results,years,months,spec['timestep_recording'],start))
+    run_results, timestep_data = run_windows(
+        spec['historical_data'],
+        income_schedule,
+        list(range(start-first_row,stop-first_row)),
+        spec['starting_portfolio_value'],
+        spec['max_withdrawal_rate'],
+        simulation_length_years,
+        spec['portfolio_allocation'],
+        spec['cash_buffer_years'],
+        spec['timestep_recording']
+        )
+    if first_row > 0:
+        run_results['run_index'] += first_row
+        if spec['timestep_recording'] == 'compact':
+            timestep_data['run_index'] += first_row
+    return(run_results,timestep_data)
+
+def get_range_spec(spec, start, stop):
+    """
+    returns a copy of spec whose historical_data only holds the rows time frames start to stop - 1 read
+
+    sent to the executor in place of spec, so a process pool pickles a slice of
+    historical data for each range instead of all of it
+    """
+    range_spec = dict(spec)
+    range_spec['historical_data'] = spec['historical_data'].iloc[start:stop-1+12*spec['simulation_length_years']]
+    range_spec['first_row'] = start
+    return(range_spec)
+
+def get_time_frame_ranges(number_of_frames, batch_size):
+    """
+    splits time frames into contiguous (start, stop) ranges of at most batch_size frames
+    """
+    return([(start, min(start+batch_size,number_of_frames)) for start in range(0,number_of_frames,batch_size)])
+
+async def aiter_time_frame_ranges(spec, ranges, executor=None, prefetch=1):
+    """
+    runs time frame ranges on an executor, yielding their results in order without blocking the event loop
+
+    up to prefetch ranges beyond the one being awaited are submitted ahead, so the executor
+    keeps working while the consumer handles a batch. each range is sent with only the
+    rows of historical data it reads. ranges not yet finished are cancelled
+    when the consumer stops iterating or the awaiting task is cancelled
+
+    Parameters:
+        spec: dict
+            as in run_time_frame_range
+
+        ranges: list of (start, stop)
+            time frame ranges to run
+
+        executor: concurrent.futures.Executor, default None
+            executor running the simulations. the event loop's default thread pool if not given.
+            a ProcessPoolExecutor shared between requests runs them in parallel
+
+        prefetch: int, default 1
+            ranges submitted ahead of the one being awaited
+
+    Yields:
+        run_results, timestep_data: data frames for one range
+    """
+    loop = asyncio.get_running_loop()
+    pending = []
+    try:
+        for n in range(len(ranges)):
+            while len(pending) <= prefetch and n + len(pending) < len(ranges):
+                start, stop = ranges[n + len(pending)]
+                pending.append(loop.run_in_executor(executor,run_time_frame_range,get_range_spec(spec,start,stop),start,stop))
+            yield(await pending.pop(0))
+    finally:
+        for future in pending:
+            future.cancel()
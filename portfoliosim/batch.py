@@ -0,0 +1,96 @@
+import numpy as np
+import pandas as pd
+from .simulator import load_historical_data
+from .kernel import build_window_arrays, get_config_arrays, run_config_kernel, PORTFOLIO_ASSETS
+
+def _get_source_key(historical_data_source):
+    """
+    key identifying a historical data source, so each source is loaded once
+    """
+    if isinstance(historical_data_source, str):
+        return(('path', historical_data_source))
+    return(('object', id(historical_data_source)))
+
+def run_config_table(valid_configs, window_arrays=None):
+    """
+    runs every config of a validated config table on the vectorized kernel
+
+    no Simulator is built. historical data is loaded once per source, the window
+    arrays are built once per (source, simulation_length_years) and every config
+    using them runs in one run_config_kernel pass. only run level results are
+    produced, timestep data is not recorded
+
+    Parameters:
+        valid_configs: data frame
+            valid configs as returned by validation.validate_configs
+
+        window_arrays: dict, default None
+            cache of window arrays keyed by (source, simulation_length_years), filled as
+            arrays are built. pass the same dict to several calls to share arrays between them
+
+    Returns:
+        run_results: data frame
+            one row per config and time frame, with columns config (index label of the config),
+            run_index, start_ref_year, start_ref_month, end_ref_year, end_ref_month,
+            final_value, survival_duration, failed
+    """
+    historical_data = {}
+    if window_arrays is None:
+        window_arrays = {}
+    groups = {}
+    for row, config in valid_configs.iterrows():
+        source_key = _get_source_key(config['historical_data_source'])
+        if source_key not in historical_data:
+            historical_data[source_key] = load_historical_data(config['historical_data_source'])
+        groups.setdefault((source_key, int(config['simulation_length_years'])), []).append(row)
+
+    run_results_list = []
+    for window_key, rows in groups.items():
+        source_key, simulation_length_years = window_key
+        if window_key not in window_arrays:
+            window_arrays[window_key] = build_window_arrays(historical_data[source_key], simulation_length_years)
+        prices, years, months = window_arrays[window_key]
+
+        configs = [dict(
+            valid_configs.loc[row],
+            portfolio_allocation={asset: valid_configs.at[row, f'{asset}_allocation'] for asset in PORTFOLIO_ASSETS}
+            ) for row in rows]
+        results = run_config_kernel(prices, **get_config_arrays(configs, simulation_length_years))
+        run_results_list.append(pd.DataFrame({
+            'config': np.repeat(pd.Index(rows).to_numpy(), len(prices)),
+            'run_index': np.tile(np.arange(len(prices)), len(rows)),
+            'start_ref_year': np.tile(years[:,0].astype('int64'), len(rows)),
+            'start_ref_month': np.tile(months[:,0].astype('int64'), len(rows)),
+            'end_ref_year': np.tile(years[:,-1].astype('int64'), len(rows)),
+            'end_ref_month': np.tile(months[:,-1].astype('int64'), len(rows)),
+            'final_value': results['final_value'].ravel(),
+            'survival_duration': results['survival_duration'].ravel(),
+            'failed': results['survival_duration'].ravel() < simulation_length_years
+            }))
+
+    if len(run_results_list) == 0:
+        return(pd.DataFrame(columns=['config','run_index','start_ref_year','start_ref_month',
+            'end_ref_year','end_ref_month','final_value','survival_duration','failed']))
+    run_results = pd.concat(run_results_list, axis=0, ignore_index=True)
+    if len(groups) > 1:
+        # back to the order of valid_configs
+        position = pd.Series(np.arange(len(valid_configs)), index=valid_configs.index)
+        order = np.argsort(position.loc[run_results['config']].to_numpy(), kind='stable')
+        run_results = run_results.iloc[order].reset_index(drop=True)
+    return(run_results)
+
+def summarise_runs(run_results, by='config'):
+    """
+    summarises run results per config
+
+    Returns:
+        summary: data frame indexed by config with columns runs, success_rate,
+        median_final_value, mean_survival_duration
+    """
+    grouped = run_results.groupby(by)
+    return(pd.DataFrame({
+        'runs': grouped.size(),
+        'success_rate': 1 - grouped['failed'].mean(),
+        'median_final_value': grouped['final_value'].median(),
+        'mean_survival_duration': grouped['survival_duration'].mean()
+        }))
@@ -0,0 +1,244 @@
+"""
+command line entry point
+
+    portfoliosim CONFIG [CONFIG ...] [options]
+
+each CONFIG is a JSON or TOML file holding one Simulator config, a list of configs
+(JSON list, or [[simulators]] tables in TOML) or a config with a 'grid' entry.
+grid maps config keys to lists of values and expands to every combination of them
+"""
+import argparse
+import itertools
+import json
+import pathlib
+import sys
+import time
+
+ENGINES = ('reference','vectorized')
+RECORDINGS = ('full','compact')
+OUTPUTS = ('csv','columnar','sqlite','duckdb','parquet')
+
+class PhaseTimer():
+    """
+    accumulates wall time and item counts per named phase
+    """
+    def __init__(self):
+        self.__phases = {}
+
+    def time(self, phase, items=1):
+        return(_TimedPhase(self, phase, items))
+
+    def add(self, phase, seconds, items):
+        total_seconds, total_items = self.__phases.get(phase, (0.0, 0))
+        self.__phases[phase] = (total_seconds + seconds, total_items + items)
+
+    def get_phases(self):
+        return(dict(self.__phases))
+
+    def format_summary(self):
+        """
+        returns the timing summary table as a string
+        """
+        lines = [f"{'phase':<12} {'seconds':>10} {'items':>8}"]
+        total = 0.0
+        for phase, (seconds, items) in self.__phases.items():
+            lines.append(f'{phase:<12} {seconds:>10.3f} {items:>8}')
+            total += seconds
+        lines.append(f"{'total':<12} {total:>10.3f}")
+        return('\n'.join(lines))
+
+class _TimedPhase():
+    def __init__(self, timer, phase, items):
+        self.__timer = timer
+        self.__phase = phase
+        self.__items = items
+
+    def __enter__(self):
+        self.__start = time.perf_counter()
+        return(self)
+
+    def __exit__(self, *exc_info):
+        self.__timer.add(self.__phase, time.perf_counter() - self.__start, self.__items)
+
+def _load_toml(path):
+    try:
+        import tomllib
+    except ImportError:
+        try:
+            import tomli as tomllib
+        except ImportError:
+            raise ImportError("reading TOML configs on python < 3.11 requires the tomli package. install it with 'pip install tomli'")
+    with open(path, 'rb') as f:
+        return(tomllib.load(f))
+
+def load_config_file(path):
+    """
+    reads a JSON or TOML config file
+
+    Returns:
+        configs: list of config dicts, before grid expansion
+    """
+    path = pathlib.Path(path)
+    if path.suffix.lower() == '.toml':
+        data = _load_toml(path)
+        if 'simulators' in data:
+            data = data['simulators']
+    else:
+        with open(path) as f:
+            data = json.load(f)
+
+    if isinstance(data, dict):
+        data = [data]
+    if not isinstance(data, list) or not all(isinstance(config, dict) for config in data):
+        raise ValueError(f"config file should hold a config or a list of configs. received '{path}'")
+    return(data)
+
+def expand_grid(config):
+    """
+    expands a config with a 'grid' entry into one config per combination of grid values
+
+    Parameters:
+        config: dict
+            Simulator config. config['grid'], if present, maps keys to lists of values
+
+    Returns:
+        configs: list of config dicts without 'grid'
+    """
+    config = dict(config)
+    grid = config.pop('grid', {})
+    for key, values in grid.items():
+        if not isinstance(values, list) or len(values) == 0:
+            raise ValueError(f"grid values should be a non-empty list. received '{values}' for {key}")
+
+    keys = list(grid)
+    configs = []
+    for combination in itertools.product(*[grid[key] for key in keys]):
+        expanded = dict(config)
+        expanded.update(zip(keys, combination))
+        configs.append(expanded)
+    return(configs)
+
+def deduplicate_configs(configs):
+    """
+    removes repeated configs, keeping the first occurrence of each
+    """
+    from .workqueue import WorkQueue
+
+    seen = set()
+    unique = []
+    for config in configs:
+        unit_id = WorkQueue.get_unit_id(config)
+        if unit_id not in seen:
+            seen.add(unit_id)
+            unique.append(config)
+    return(unique)
+
+def build_parser():
+    parser = argparse.ArgumentParser(
+        prog='portfoliosim',
+        description='run portfolio simulations for one or many Simulator configs'
+        )
+    parser.add_argument('configs', nargs='+', help='JSON or TOML config files')
+    parser.add_argument('--engine', choices=ENGINES, default=None,
+        help="simulation engine. overrides 'engine' in configs (default reference)")
+    parser.add_argument('--workers', type=int, default=None,
+        help="worker processes per simulator. overrides 'workers' in configs that use the reference engine")
+    parser.add_argument('--recording', choices=RECORDINGS, default=None,
+        help="timestep data layout. overrides 'timestep_recording' in configs (default full)")
+    parser.add_argument('--output', choices=OUTPUTS, default='csv',
+        help='csv or columnar result folders, or a sqlite/duckdb/parquet results store (default csv)')
+    parser.add_argument('--results-directory', default='./results/',
+        help='folder results are written to (default ./results/)')
+    parser.add_argument('--store', default=None,
+        help='results store file for sqlite/duckdb output, or folder for parquet output (default <results-directory>/results.<output>)')
+    parser.add_argument('--partition-by', default='simulator_id',
+        help='comma separated simulation_inputs columns to partition parquet output by (default simulator_id)')
+    parser.add_argument('--check', action='store_true',
+        help='load, expand and validate configs without running them')
+    return(parser)
+
+def main(argv=None):
+    """
+    console entry point. returns the process exit code
+    """
+    args = build_parser().parse_args(argv)
+    if args.workers is not None and args.workers < 1:
+        print(f"error: --workers should be at least one. received '{args.workers}'", file=sys.stderr)
+        return(2)
+    if args.workers is not None and args.workers > 1 and args.engine == 'vectorized':
+        print(f"error: --workers only applies to the reference engine, the vectorized engine runs in a single process. received '{args.workers}'", file=sys.stderr)
+        return(2)
+
+    timer = PhaseTimer()
+    overrides = {}
+    if args.engine is not None:
+        overrides['engine'] = args.engine
+    if args.recording is not None:
+        overrides['timestep_recording'] = args.recording
+
+    with timer.time('load', len(args.configs)):
+        configs = []
+        for path in args.configs:
+            configs.extend(load_config_file(path))
+
+    with timer.time('expand'):
+        expanded = []
+        for config in configs:
+            for expanded_config in expand_grid(config):
+                expanded_config.update(overrides)
+                # configs left on the vectorized engine keep their own workers
+                if args.workers is not None and expanded_config.get('engine', 'reference') != 'vectorized':
+                    expanded_config['workers'] = args.workers
+                expanded.append(expanded_config)
+        unique = deduplicate_configs(expanded)
+    print(f'{len(unique)} configs to run ({len(expanded) - len(unique)} duplicates removed)')
+
+    from .simulator import Simulator
+    from .validation import validate_configs
+
+    with timer.time('validate', len(unique)):
+        valid_configs, validation_errors = validate_configs(unique)
+    for row, message in validation_errors[['row','message']].itertuples(index=False):
+        print(f'config {row+1}: {message}', file=sys.stderr)
+    invalid = set(validation_errors['row'])
+
+    results_directory = args.results_directory.rstrip('/') + '/'
+    store = None
+    if args.output in ('sqlite','duckdb','parquet') and not args.check:
+        from .results_store import open_results_store, ParquetResultsStore
+        store_path = args.store if args.store is not None else results_directory + f'results.{args.output}'
+        pathlib.Path(store_path).parent.mkdir(parents=True, exist_ok=True)
+        if args.output == 'parquet':
+            store = ParquetResultsStore(store_path, partition_keys=tuple(args.partition_by.split(',')))
+        else:
+            store = open_results_store(store_path, backend=args.output)
+
+    try:
+        for n in ([] if args.check else valid_configs.index):
+            try:
+                with timer.time('build'):
+                    simulator = Simulator(**unique[n])
+            except (ValueError, TypeError, OSError) as e:
+                invalid.add(n)
+                print(f'config {n+1}: {e}', file=sys.stderr)
+                continue
+
+            with timer.time('run'):
+                simulator.run_simulations()
+            with timer.time('write'):
+                if store is not None:
+                    store.write_simulator(simulator)
+                else:
+                    simulator.write_results(results_directory, timestep_format=args.output)
+    finally:
+        if store is not None:
+            store.close()
+
+    print(timer.format_summary())
+    if len(invalid) > 0:
+        print(f'{len(invalid)} of {len(unique)} configs were invalid', file=sys.stderr)
+        return(1)
+    return(0)
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,113 @@
+import pandas as pd
+
+# dtypes used for the compact timestep_data layout
+# run_id and simulator_id are not stored on every row. Each row instead carries
+# a small run_index that points into run_results, which acts as the side table
+COMPACT_TIMESTEP_DTYPES = {
+    'run_index': 'int32',
+    'timestep': 'int16',
+    'year': 'int16',
+    'month': 'int8',
+    'cash_buffer': 'float32',
+    'bonds_qty': 'float32',
+    'stocks_qty': 'float32',
+    'gold_qty': 'float32',
+    'bonds_value': 'float32',
+    'stocks_value': 'float32',
+    'gold_value': 'float32',
+    'cash_notional': 'float32',
+    'allowance': 'float32',
+    'desired_allowance': 'float32',
+    'failed': 'bool'
+    }
+
+# dtypes used for the full timestep_data layout
+FULL_TIMESTEP_DTYPES = {
+    'simulator_id': 'int64',
+    'run_id': 'int64',
+    'timestep': 'int64',
+    'year': 'int64',
+    'month': 'int64',
+    'cash_buffer': 'float64',
+    'bonds_qty': 'float64',
+    'stocks_qty': 'float64',
+    'gold_qty': 'float64',
+    'bonds_value': 'float64',
+    'stocks_value': 'float64',
+    'gold_value': 'float64',
+    'cash_notional': 'float64',
+    'allowance': 'float64',
+    'desired_allowance': 'float64',
+    'failed': 'boolean'
+    }
+
+
+def empty_compact_timestep_data():
+    """
+    returns an empty data frame with the compact timestep_data layout
+    """
+    return(pd.DataFrame({
+        column: pd.Series([], dtype=dtype) for column, dtype in COMPACT_TIMESTEP_DTYPES.items()
+        }))
+
+def compact_timestep_data(timestep_data, run_index):
+    """
+    converts timestep data of a single run into the compact layout
+
+    Parameters:
+        timestep_data: data frame
+            timestep data as returned by Simulation.run
+
+        run_index: int
+            position of the run in the simulator's run_results
+
+    Returns:
+        compact_timestep_data: data frame
+            timestep data with run_index in place of run_id/simulator_id
+            and downcast time and value columns
+    """
+    compact = pd.DataFrame({'run_index': run_index}, index=timestep_data.index)
+    for column, dtype in COMPACT_TIMESTEP_DTYPES.items():
+        if column == 'run_index':
+            continue
+        compact[column] = timestep_data[column].to_numpy(dtype=dtype)
+    compact['run_index'] = compact['run_index'].astype(COMPACT_TIMESTEP_DTYPES['run_index'])
+    return(compact)
+
+def expand_timestep_data(compact_timestep_data, run_results):
+    """
+    converts compact timestep data back into the full layout
+
+    Parameters:
+        compact_timestep_data: data frame
+            timestep data in the compact layout
+
+        run_results: data frame
+            run results containing run_index, run_id and simulator_id
+            for every run referenced by compact_timestep_data
+
+    Returns:
+        timestep_data: data frame
+            timestep data with simulator_id and run_id on every row
+    """
+    ids = run_results.set_index('run_index')[['simulator_id','run_id']]
+    ids = ids.reindex(compact_timestep_data['run_index'].to_numpy())
+
+    timestep_data = pd.DataFrame(index=compact_timestep_data.index)
+    for column, dtype in FULL_TIMESTEP_DTYPES.items():
+        if column in ('simulator_id','run_id'):
+            timestep_data[column] = ids[column].to_numpy(dtype=dtype)
+        else:
+            timestep_data[column] = compact_timestep_data[column].astype(dtype)
+    return(timestep_data)
+
+def get_timestep_row_bytes(timestep_recording):
+    """
+    returns the approximate number of bytes one timestep_data row takes in memory
+
+    Parameters:
+        timestep_recording: str
+            'full' or 'compact'
+    """
+    dtypes = COMPACT_TIMESTEP_DTYPES if timestep_recording == 'compact' else FULL_TIMESTEP_DTYPES
+    return(sum(pd.api.types.pandas_dtype(dtype).itemsize for dtype in dtypes.values()))
@@ -0,0 +1,66 @@
+import pandas as pd
+import hashlib
+import json
+import os
+import pathlib
+
+def get_dataset_hash(historical_data):
+    """
+    returns a sha256 hex digest of the content of historical_data
+
+    the digest covers column names, dtypes and values, so equal data loaded
+    separately by different simulators hashes the same
+    """
+    digest = hashlib.sha256()
+    digest.update(json.dumps([[str(column), str(dtype)] for column, dtype in historical_data.dtypes.items()]).encode())
+    digest.update(pd.util.hash_pandas_object(historical_data, index=False).to_numpy().tobytes())
+    return(digest.hexdigest())
+
+def write_dataset(historical_data, datasets_directory):
+    """
+    writes historical_data once under its content hash
+
+    the file is written to a temporary name and renamed into place, so concurrent
+    writers of the same dataset never leave a partial file behind
+
+    Parameters:
+        historical_data: data frame
+            historical data to store. it is not modified
+
+        datasets_directory: folder path
+            folder holding datasets as <hash>.csv. created if needed
+
+    Returns:
+        dataset_hash, path: content hash and path of the stored csv
+    """
+    dataset_hash = get_dataset_hash(historical_data)
+    directory = pathlib.Path(datasets_directory)
+    path = directory / f'{dataset_hash}.csv'
+    if not path.exists():
+        directory.mkdir(parents=True, exist_ok=True)
+        temporary_path = directory / f'{dataset_hash}.csv.{os.getpid()}.tmp'
+        historical_data.to_csv(temporary_path, index=False)
+        os.replace(temporary_path, path)
+    return(dataset_hash, path)
+
+def write_dataset_reference(results_folder, dataset_hash, dataset_path, rows):
+    """
+    writes historical_data.json in a results folder, pointing at a dataset stored by write_dataset
+
+    the path is relative to the results folder, so the folder and the datasets can be moved together
+    """
+    with open(pathlib.Path(results_folder) / 'historical_data.json', 'w') as f:
+        json.dump({
+            'sha256': dataset_hash,
+            'path': os.path.relpath(dataset_path, results_folder),
+            'rows': rows
+            }, f)
+
+def read_dataset_reference(results_folder):
+    """
+    loads the historical data referenced by a results folder
+    """
+    results_folder = pathlib.Path(results_folder)
+    with open(results_folder / 'historical_data.json') as f:
+        reference = json.load(f)
+    return(pd.read_csv(results_folder / reference['path']))
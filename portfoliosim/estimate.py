@@ -0,0 +1,137 @@
+import numpy as np
+import pandas as pd
+import time
+from .kernel import build_window_arrays, run_kernel, kernel_results_to_frames
+from .parallel import run_windows
+from .compact import get_timestep_row_bytes
+
+# run time coefficients measured by calibrate, keyed by (engine, timestep_recording)
+_calibrations = {}
+
+# copies of timestep data alive at the peak of a run held in memory:
+# the per time frame frames plus the concatenated result, and for the
+# vectorized engine also the kernel's per timestep arrays
+_PEAK_COPIES = {'reference': 2, 'vectorized': 3}
+
+def _create_benchmark_data(number_of_windows, simulation_length_years):
+    rng = np.random.default_rng(0)
+    number_of_months = 12*simulation_length_years + number_of_windows - 1
+    return(pd.DataFrame({
+        'year': 2000 + np.arange(number_of_months) // 12,
+        'month': 1 + np.arange(number_of_months) % 12,
+        'gold': 100*np.exp(np.cumsum(rng.normal(0,0.05,number_of_months))),
+        'stocks': 100*np.exp(np.cumsum(rng.normal(0,0.1,number_of_months))),
+        'bonds': 100*np.exp(np.cumsum(rng.normal(0,0.03,number_of_months)))
+        }))
+
+def _time_windows(engine, timestep_recording, number_of_windows, simulation_length_years):
+    """
+    runs number_of_windows time frames of simulation_length_years on the engine's own
+    code path and returns the wall time taken
+    """
+    historical_data = _create_benchmark_data(number_of_windows, simulation_length_years)
+    desired_income = 40000*(1.02**np.arange(simulation_length_years))
+    min_income = 0.5*desired_income
+    allocation = {'stocks': 0.6, 'bonds': 0.3, 'gold': 0.05, 'cash': 0.05}
+
+    start = time.perf_counter()
+    if engine == 'vectorized':
+        prices, years, months = build_window_arrays(historical_data, simulation_length_years)
+        results = run_kernel(prices, desired_income, min_income, 1000000.0, 0.05,
+            np.array([0.6, 0.05, 0.3, 0.05]), 2)
+        kernel_results_to_frames(results, years, months, timestep_recording)
+    else:
+        income_schedule = pd.DataFrame({
+            'year': np.arange(1, simulation_length_years + 1),
+            'desired_income': desired_income,
+            'min_income': min_income
+            })
+        run_windows(historical_data, income_schedule, list(range(number_of_windows)), 1000000.0, 0.05,
+            simulation_length_years, allocation, 2, timestep_recording)
+    return(time.perf_counter() - start)
+
+def calibrate(engine, timestep_recording):
+    """
+    measures run time coefficients of an engine on this machine with a short micro-benchmark
+
+    the run time of a simulator is modelled as windows * (seconds_per_window
+    + seconds_per_timestep * simulation_length_years), fitted from two short runs.
+    results are cached for the rest of the process
+
+    Returns:
+        calibration: dict with seconds_per_window and seconds_per_timestep
+    """
+    key = (engine, timestep_recording)
+    if key not in _calibrations:
+        number_of_windows = 500 if engine == 'vectorized' else 8
+        short_years, long_years = 5, 25
+        short = _time_windows(engine, timestep_recording, number_of_windows, short_years)
+        long = _time_windows(engine, timestep_recording, number_of_windows, long_years)
+        seconds_per_timestep = max((long - short) / (number_of_windows * (long_years - short_years)), 0.0)
+        seconds_per_window = max(short / number_of_windows - seconds_per_timestep * short_years, 0.0)
+        _calibrations[key] = {
+            'seconds_per_window': seconds_per_window,
+            'seconds_per_timestep': seconds_per_timestep
+            }
+    return(dict(_calibrations[key]))
+
+def estimate_run(
+    historical_data,
+    simulation_length_years,
+    timestep_recording,
+    engine,
+    workers=1,
+    memory_limit=None
+    ):
+    """
+    predicts the size, peak memory and wall time of running a simulator
+
+    Parameters:
+        historical_data: data frame
+            monthly historical asset prices
+
+        remaining parameters are as in Simulator
+
+    Returns:
+        estimate: dict
+            windows: number of time frames
+            timestep_rows: rows of timestep data
+            timestep_data_bytes: memory taken by timestep data
+            peak_memory_bytes: estimated peak memory of the run
+            seconds: estimated wall time
+    """
+    windows = max(len(historical_data) - 12*simulation_length_years + 1, 0)
+    timestep_rows = windows * simulation_length_years
+    timestep_data_bytes = timestep_rows * get_timestep_row_bytes(timestep_recording)
+    fixed_bytes = int(historical_data.memory_usage(index=False, deep=True).sum()) + windows * 9 * 8
+
+    if memory_limit is None:
+        peak_memory_bytes = fixed_bytes + _PEAK_COPIES[engine] * timestep_data_bytes
+    else:
+        peak_memory_bytes = fixed_bytes + min(2 * memory_limit, _PEAK_COPIES[engine] * timestep_data_bytes)
+
+    calibration = calibrate(engine, timestep_recording)
+    seconds = windows * (calibration['seconds_per_window'] + calibration['seconds_per_timestep'] * simulation_length_years)
+    if engine == 'reference':
+        seconds = seconds / min(workers, max(windows, 1))
+    return({
+        'windows': windows,
+        'timestep_rows': timestep_rows,
+        'timestep_data_bytes': timestep_data_bytes,
+        'peak_memory_bytes': peak_memory_bytes,
+        'seconds': seconds
+        })
+
+def check_estimate(estimate, max_memory=None, max_seconds=None, memory_limit=None, engine='reference'):
+    """
+    raises ValueError when an estimate exceeds max_memory bytes or max_seconds, suggesting what to change
+    """
+    if max_memory is not None and estimate['peak_memory_bytes'] > max_memory:
+        suggestion = ('set memory_limit to spill timestep data to disk' if memory_limit is None
+            else 'lower memory_limit or use timestep_recording compact')
+        raise ValueError(f"estimated peak memory of {estimate['peak_memory_bytes']/2**20:.1f} MB exceeds "
+            f"max_memory of {max_memory/2**20:.1f} MB. {suggestion}")
+    if max_seconds is not None and estimate['seconds'] > max_seconds:
+        suggestion = ('use the vectorized engine or more workers' if engine == 'reference'
+            else 'shorten simulation_length_years or split the historical data')
+        raise ValueError(f"estimated run time of {estimate['seconds']:.1f}s exceeds max_seconds of {max_seconds:.1f}s. {suggestion}")
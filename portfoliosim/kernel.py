@@ -0,0 +1,412 @@
+import numpy as np
+import pandas as pd
+import random
+from .compact import COMPACT_TIMESTEP_DTYPES
+
+# assets that carry a price, in the order Simulation holds them in its portfolio
+# cash is held in notional amount and always has a price of 1
+PRICED_ASSETS = ('stocks','gold','bonds')
+PORTFOLIO_ASSETS = PRICED_ASSETS + ('cash',)
+
+# configs x windows state entries run_config_kernel evaluates together.
+# blocks of this size keep its working arrays in cache
+CONFIG_BLOCK_ELEMENTS = 32768
+
+def build_window_arrays(historical_data, simulation_length_years):
+    """
+    gathers the yearly prices of every time frame into dense arrays
+
+    time frame i holds rows i, i+12, ... of historical_data, as in
+    Simulator._generate_simulation_time_frames
+
+    Parameters:
+        historical_data: data frame
+            monthly historical asset prices with year and month columns
+
+        simulation_length_years: int
+            length of the simulation in years
+
+    Returns:
+        prices: array of shape (n_windows, simulation_length_years, 3)
+            prices of stocks, gold, bonds. assets missing from historical_data are priced at 1
+
+        years, months: arrays of shape (n_windows, simulation_length_years)
+    """
+    number_of_frames = max(len(historical_data) - (12 * simulation_length_years) + 1, 0)
+    rows = np.arange(number_of_frames)[:,None] + 12*np.arange(simulation_length_years)[None,:]
+
+    prices = np.ones((number_of_frames, simulation_length_years, len(PRICED_ASSETS)))
+    for n, asset in enumerate(PRICED_ASSETS):
+        if asset in historical_data.columns:
+            prices[:,:,n] = historical_data[asset].to_numpy(dtype='float64')[rows]
+    years = historical_data['year'].to_numpy()[rows]
+    months = historical_data['month'].to_numpy()[rows]
+    return(prices, years, months)
+
+def normalise_allocation(portfolio_allocation):
+    """
+    returns portfolio_allocation as an array in PORTFOLIO_ASSETS order, normalised to sum to 1
+    """
+    base = sum(portfolio_allocation.values())
+    return(np.array([portfolio_allocation[asset]/base for asset in PORTFOLIO_ASSETS], dtype='float64'))
+
+def get_income_arrays(desired_annual_income, inflation, min_income_multiplier, simulation_length_years):
+    """
+    returns desired and minimum income for every year, computed as in Simulator's income schedule
+
+    Returns:
+        desired_income, min_income: arrays of shape (simulation_length_years,)
+    """
+    desired_income = np.array([desired_annual_income*(inflation**i) for i in range(simulation_length_years)], dtype='float64')
+    min_income = np.array([min_income_multiplier*desired_annual_income*(inflation**i) for i in range(simulation_length_years)], dtype='float64')
+    return(desired_income, min_income)
+
+def get_desired_cash_buffers(desired_income, cash_buffer_years):
+    """
+    returns the desired cash buffer at every timestep
+
+    matches Simulation: the buffer at timestep t holds desired income of years t to t+cash_buffer_years-1
+    """
+    desired_income = np.asarray(desired_income, dtype='float64')
+    return(np.array([desired_income[t:t+cash_buffer_years].sum() for t in range(len(desired_income))]))
+
+def _get_portfolio_value(quantities, cash, prices):
+    """
+    value of holdings, summed in the same order as Simulation._get_portfolio_value
+
+    quantities and prices hold one entry per asset along their first axis
+    """
+    value = quantities[0] * prices[0]
+    for n in range(1, len(PRICED_ASSETS)):
+        value = value + quantities[n] * prices[n]
+    return(value + cash)
+
+def get_config_arrays(configs, simulation_length_years):
+    """
+    stacks the parameters of several configs sharing a horizon into the arrays taken by run_config_kernel
+
+    Parameters:
+        configs: list of dict
+            Simulator configs with starting_portfolio_value, desired_annual_income, inflation,
+            min_income_multiplier, max_withdrawal_rate, portfolio_allocation, cash_buffer_years
+
+        simulation_length_years: int
+            horizon shared by every config
+
+    Returns:
+        config_arrays: dict of desired_income, min_income (n_configs, years), starting_portfolio_value,
+        max_withdrawal_rate, cash_buffer_years (n_configs,) and allocation (n_configs, 4)
+    """
+    incomes = [
+        get_income_arrays(config['desired_annual_income'], config['inflation'], config['min_income_multiplier'], simulation_length_years)
+        for config in configs
+        ]
+    return({
+        'desired_income': np.array([desired_income for desired_income, min_income in incomes], dtype='float64').reshape(len(configs), simulation_length_years),
+        'min_income': np.array([min_income for desired_income, min_income in incomes], dtype='float64').reshape(len(configs), simulation_length_years),
+        'starting_portfolio_value': np.array([config['starting_portfolio_value'] for config in configs], dtype='float64'),
+        'max_withdrawal_rate': np.array([config['max_withdrawal_rate'] for config in configs], dtype='float64'),
+        'allocation': np.array([normalise_allocation(config['portfolio_allocation']) for config in configs], dtype='float64').reshape(len(configs), len(PORTFOLIO_ASSETS)),
+        'cash_buffer_years': np.array([int(config['cash_buffer_years']) for config in configs], dtype='int64')
+        })
+
+def run_config_kernel(
+    prices,
+    desired_income,
+    min_income,
+    starting_portfolio_value,
+    max_withdrawal_rate,
+    allocation,
+    cash_buffer_years,
+    record_timesteps=False
+    ):
+    """
+    simulates many configs over many time frames at once, following the outcomes of Simulation.execute_strategy
+
+    state is held in arrays of shape (n_configs, n_windows) and every timestep is
+    evaluated for all configs and time frames together, so configs sharing a horizon
+    cost one pass over the timesteps. configs are run in blocks of about
+    CONFIG_BLOCK_ELEMENTS state entries so the working arrays stay in cache.
+    each config gives the same results as run_kernel
+
+    Parameters:
+        prices: array of shape (n_windows, years, 3) or (n_configs, n_windows, years, 3)
+            prices of stocks, gold, bonds as returned by build_window_arrays,
+            shared by every config or given per config
+
+        desired_income, min_income: arrays of shape (n_configs, years)
+            income schedule of each config
+
+        starting_portfolio_value, max_withdrawal_rate: arrays of shape (n_configs,)
+
+        allocation: array of shape (n_configs, 4)
+            normalised allocations as returned by normalise_allocation
+
+        cash_buffer_years: array of int of shape (n_configs,)
+
+        record_timesteps: bool, default False
+            whether to return per timestep state
+
+    Returns:
+        results: dict
+            final_value and survival_duration arrays of shape (n_configs, n_windows)
+            if record_timesteps, also one (n_configs, n_windows, years) array per timestep_data column
+    """
+    desired_income = np.asarray(desired_income, dtype='float64')
+    number_of_configs = desired_income.shape[0]
+    number_of_windows = prices.shape[-3]
+    block_size = max(1, CONFIG_BLOCK_ELEMENTS // max(number_of_windows, 1))
+    if number_of_configs <= block_size:
+        return(_run_config_block(prices, desired_income, min_income, starting_portfolio_value,
+            max_withdrawal_rate, allocation, cash_buffer_years, record_timesteps))
+
+    blocks = []
+    for start in range(0, number_of_configs, block_size):
+        block = slice(start, start + block_size)
+        blocks.append(_run_config_block(
+            prices if prices.ndim == 3 else prices[block],
+            desired_income[block],
+            np.asarray(min_income, dtype='float64')[block],
+            np.asarray(starting_portfolio_value, dtype='float64')[block],
+            np.asarray(max_withdrawal_rate, dtype='float64')[block],
+            np.asarray(allocation, dtype='float64')[block],
+            np.asarray(cash_buffer_years)[block],
+            record_timesteps
+            ))
+    results = {key: np.concatenate([block[key] for block in blocks]) for key in ('final_value','survival_duration')}
+    if record_timesteps:
+        results['timesteps'] = {column: np.concatenate([block['timesteps'][column] for block in blocks]) for column in blocks[0]['timesteps']}
+    return(results)
+
+def _run_config_block(
+    prices,
+    desired_income,
+    min_income,
+    starting_portfolio_value,
+    max_withdrawal_rate,
+    allocation,
+    cash_buffer_years,
+    record_timesteps
+    ):
+    """
+    run_config_kernel for one block of configs
+    """
+    desired_income = np.asarray(desired_income, dtype='float64')
+    min_income = np.asarray(min_income, dtype='float64')
+    number_of_configs, years = desired_income.shape
+    if prices.ndim == 3:
+        prices = prices[None]
+    number_of_windows, number_of_assets = prices.shape[1], prices.shape[3]
+    shape = (number_of_configs, number_of_windows)
+
+    # state is laid out asset first and prices time first, so every
+    # per asset, per timestep slice below is a contiguous array
+    prices = np.ascontiguousarray(prices.transpose(2, 3, 0, 1))
+    starting_portfolio_value = np.asarray(starting_portfolio_value, dtype='float64')[:,None]
+    max_withdrawal_rate = np.asarray(max_withdrawal_rate, dtype='float64')[:,None]
+    allocation = np.asarray(allocation, dtype='float64')
+    asset_allocation = np.ascontiguousarray(allocation[:,:number_of_assets].T)[:,:,None]
+    cash_allocation = allocation[:,number_of_assets,None]
+    desired_cash_buffers = np.array([
+        get_desired_cash_buffers(desired_income[c], int(cash_buffer_years[c])) for c in range(number_of_configs)
+        ]).reshape(number_of_configs, years)
+    zeros = np.zeros(shape)
+
+    # initial cash buffer and allocation at the first prices
+    if years > 0:
+        cash_buffer = np.broadcast_to(np.minimum(desired_cash_buffers[:,:1], starting_portfolio_value), shape).copy()
+        current_prices = prices[0]
+    else:
+        cash_buffer = zeros
+        current_prices = np.ones((number_of_assets, 1, number_of_windows))
+    value = np.where(cash_buffer >= starting_portfolio_value, 0.0, starting_portfolio_value - cash_buffer)
+    quantities = value[None] * asset_allocation / current_prices
+    cash = value * cash_allocation
+    failed = np.zeros(shape, dtype='bool')
+    survival_duration = np.full(shape, years, dtype='int64')
+
+    if record_timesteps:
+        timesteps = {column: np.empty(shape + (years,)) for column in (
+            'cash_buffer','bonds_qty','stocks_qty','gold_qty','bonds_value','stocks_value','gold_value',
+            'cash_notional','allowance','desired_allowance')}
+        timesteps['failed'] = np.empty(shape + (years,), dtype='bool')
+
+    for t in range(years):
+        current_prices = prices[t]
+        value = _get_portfolio_value(quantities, cash, current_prices)
+        desired_allowance = desired_income[:,t,None]
+        min_allowance = min_income[:,t,None]
+        withdrawal_limit = max_withdrawal_rate * value
+
+        # outcome 01/02: desired allowance within withdrawal limit
+        # withdraw it, then top up the buffer with what is left of the limit
+        allowance_a = np.minimum(desired_allowance, value)
+        value_a = value - allowance_a
+        buffer_gap = desired_cash_buffers[:,t,None] - cash_buffer
+        limit_left = withdrawal_limit - desired_allowance
+        top_up = np.where(buffer_gap <= limit_left, buffer_gap, limit_left)
+        top_up = np.minimum(top_up, value_a)
+        value_a = value_a - top_up
+        cash_buffer_a = cash_buffer + top_up
+
+        # outcome 03: allowance paid from the cash buffer
+        allowance_b = np.minimum(desired_allowance, cash_buffer)
+        cash_buffer_b = cash_buffer - allowance_b
+
+        # outcome 04/05/06: empty the buffer, then withdraw up to desired, limit or min income
+        allowance_c = cash_buffer
+        desired_left = desired_allowance - allowance_c
+        min_left = min_allowance - allowance_c
+        target = np.where(
+            withdrawal_limit >= desired_left,
+            desired_left,
+            np.where(withdrawal_limit >= min_left, withdrawal_limit, min_left)
+            )
+        withdrawal_c = np.minimum(target, value)
+        value_c = value - withdrawal_c
+        allowance_c = allowance_c + withdrawal_c
+
+        within_limit = desired_allowance <= withdrawal_limit
+        from_buffer = cash_buffer >= desired_allowance
+        value = np.where(within_limit, value_a, np.where(from_buffer, value, value_c))
+        allowance = np.where(within_limit, allowance_a, np.where(from_buffer, allowance_b, allowance_c))
+        cash_buffer = np.where(within_limit, cash_buffer_a, np.where(from_buffer, cash_buffer_b, zeros))
+
+        # rebalance
+        quantities = value[None] * asset_allocation / current_prices
+        cash = value * cash_allocation
+
+        newly_failed = ~failed & (_get_portfolio_value(quantities, cash, current_prices) <= 0)
+        survival_duration[newly_failed] = t
+        failed = failed | newly_failed
+
+        if record_timesteps:
+            timesteps['cash_buffer'][...,t] = cash_buffer
+            timesteps['stocks_qty'][...,t] = quantities[0]
+            timesteps['gold_qty'][...,t] = quantities[1]
+            timesteps['bonds_qty'][...,t] = quantities[2]
+            timesteps['stocks_value'][...,t] = quantities[0] * current_prices[0]
+            timesteps['gold_value'][...,t] = quantities[1] * current_prices[1]
+            timesteps['bonds_value'][...,t] = quantities[2] * current_prices[2]
+            timesteps['cash_notional'][...,t] = cash
+            timesteps['allowance'][...,t] = allowance
+            timesteps['desired_allowance'][...,t] = desired_allowance
+            timesteps['failed'][...,t] = failed
+
+    results = {
+        'final_value': _get_portfolio_value(quantities, cash, current_prices) + cash_buffer,
+        'survival_duration': survival_duration
+        }
+    if record_timesteps:
+        results['timesteps'] = timesteps
+    return(results)
+
+def run_kernel(
+    prices,
+    desired_income,
+    min_income,
+    starting_portfolio_value,
+    max_withdrawal_rate,
+    allocation,
+    cash_buffer_years,
+    record_timesteps=True
+    ):
+    """
+    simulates every time frame of one config at once, following the outcomes of Simulation.execute_strategy
+
+    runs run_config_kernel with a single config
+
+    Parameters:
+        prices: array of shape (n_windows, years, 3)
+            prices of stocks, gold, bonds as returned by build_window_arrays
+
+        desired_income, min_income: arrays of shape (years,)
+            income schedule
+
+        allocation: array of shape (4,)
+            normalised allocation as returned by normalise_allocation
+
+        record_timesteps: bool, default True
+            whether to return per timestep state
+
+        remaining parameters are as in Simulator
+
+    Returns:
+        results: dict
+            final_value and survival_duration arrays of shape (n_windows,)
+            if record_timesteps, also one (n_windows, years) array per timestep_data column
+    """
+    results = run_config_kernel(
+        prices,
+        np.asarray(desired_income, dtype='float64')[None,:],
+        np.asarray(min_income, dtype='float64')[None,:],
+        [starting_portfolio_value],
+        [max_withdrawal_rate],
+        np.asarray(allocation, dtype='float64')[None,:],
+        [cash_buffer_years],
+        record_timesteps
+        )
+    single = {
+        'final_value': results['final_value'][0],
+        'survival_duration': results['survival_duration'][0]
+        }
+    if record_timesteps:
+        single['timesteps'] = {column: values[0] for column, values in results['timesteps'].items()}
+    return(single)
+
+def kernel_results_to_frames(results, years, months, timestep_recording='full', run_index_offset=0):
+    """
+    converts run_kernel output into run_results and timestep_data frames shaped like Simulation.run
+
+    Parameters:
+        results: dict
+            output of run_kernel with record_timesteps=True
+
+        years, months: arrays of shape (n_windows, years)
+            as returned by build_window_arrays
+
+        timestep_recording: str, default 'full'
+            'full' or 'compact' timestep_data layout
+
+        run_index_offset: int, default 0
+            run_index of the first window in results
+
+    Returns:
+        run_results, timestep_data: data frames with one row per window and per timestep
+    """
+    number_of_windows, number_of_years = years.shape
+    run_ids = np.array([random.randint(10**12, 10**13 - 1) for i in range(number_of_windows)], dtype='int64')
+    run_index = np.arange(run_index_offset, run_index_offset + number_of_windows)
+
+    run_results = pd.DataFrame({
+        'start_ref_year':pd.Series(years[:,0], dtype='int'),
+        'start_ref_month':pd.Series(months[:,0], dtype='int'),
+        'end_ref_year':pd.Series(years[:,-1], dtype='int'),
+        'end_ref_month':pd.Series(months[:,-1], dtype='int'),
+        'final_value':pd.Series(results['final_value'], dtype='float'),
+        'survival_duration':pd.Series(results['survival_duration'], dtype='int'),
+        'run_id':run_ids,
+        'run_index':run_index
+        })
+
+    timesteps = results['timesteps']
+    columns = {
+        'timestep': np.tile(np.arange(1, number_of_years + 1), number_of_windows),
+        'year': years.ravel(),
+        'month': months.ravel()
+        }
+    for column in ('cash_buffer','bonds_qty','stocks_qty','gold_qty','bonds_value','stocks_value','gold_value',
+            'cash_notional','allowance','desired_allowance','failed'):
+        columns[column] = timesteps[column].ravel()
+
+    if timestep_recording == 'compact':
+        timestep_data = pd.DataFrame({'run_index': np.repeat(run_index, number_of_years).astype(COMPACT_TIMESTEP_DTYPES['run_index'])})
+        for column, values in columns.items():
+            timestep_data[column] = values.astype(COMPACT_TIMESTEP_DTYPES[column])
+    else:
+        timestep_data = pd.DataFrame({
+            column: pd.Series(values, dtype='boolean' if column == 'failed' else ('int' if column in ('timestep','year','month') else 'float'))
+            for column, values in columns.items()
+            })
+        timestep_data['run_id'] = np.repeat(run_ids, number_of_years)
+    return(run_results, timestep_data)
@@ -0,0 +1,161 @@
+import itertools
+import numpy as np
+import pandas as pd
+from .kernel import build_window_arrays, get_config_arrays, run_config_kernel, PORTFOLIO_ASSETS
+
+OPTIMISE_OBJECTIVES = ('success_rate','final_value')
+
+def get_simplex_grid(number_of_assets, divisions):
+    """
+    returns every allocation of number_of_assets assets in steps of 1/divisions
+
+    Returns:
+        grid: array of shape (n_points, number_of_assets) whose rows sum to 1
+    """
+    points = [
+        composition for composition in itertools.product(range(divisions + 1), repeat=number_of_assets - 1)
+        if sum(composition) <= divisions
+        ]
+    grid = np.array([list(composition) + [divisions - sum(composition)] for composition in points], dtype='float64')
+    return(grid.reshape(len(points), number_of_assets) / divisions)
+
+def get_neighbours(allocation, step):
+    """
+    returns the allocations reached by moving step from one asset to another, staying on the simplex
+    """
+    neighbours = []
+    for source, target in itertools.permutations(range(len(allocation)), 2):
+        if allocation[source] >= step - 1e-12:
+            neighbour = allocation.copy()
+            neighbour[source] = max(neighbour[source] - step, 0.0)
+            neighbour[target] = neighbour[target] + step
+            neighbours.append(neighbour)
+    return(neighbours)
+
+def optimise_allocation(
+    historical_data,
+    config,
+    objective='success_rate',
+    percentile=50,
+    assets=PORTFOLIO_ASSETS,
+    grid_step=0.1,
+    refinement_steps=2,
+    top_candidates=3
+    ):
+    """
+    searches the allocation simplex for the portfolio_allocation that maximises an objective
+
+    a grid of allocations in steps of grid_step is evaluated first. then, for each of
+    refinement_steps halvings of the step, the top_candidates allocations are moved by
+    the step between every pair of assets until no move improves on the best allocation.
+    window arrays are built once, every search step evaluates its new allocations in one
+    run_config_kernel pass and allocations already evaluated are not run again
+
+    Parameters:
+        historical_data: data frame
+            monthly historical asset prices
+
+        config: dict
+            Simulator config. portfolio_allocation is ignored
+
+        objective: str, default 'success_rate'
+            'success_rate' or 'final_value' (the given percentile of final value across time frames).
+            ties are broken by the other one
+
+        percentile: float, default 50
+            percentile of final value reported and used by the 'final_value' objective
+
+        assets: tuple of str, default all of PORTFOLIO_ASSETS
+            assets the search may allocate to. the others are held at zero
+
+        grid_step: float, default 0.1
+            spacing of the initial grid. 1/grid_step should be a whole number
+
+        refinement_steps: int, default 2
+            number of times the step is halved during local refinement
+
+        top_candidates: int, default 3
+            allocations refined from at every step
+
+    Returns:
+        frontier: data frame
+            one row per evaluated allocation, best first, with columns stocks, gold, bonds, cash,
+            success_rate, final_value_p<percentile> and on_frontier, which marks allocations
+            no other allocation beats on both success rate and final value
+    """
+    if objective not in OPTIMISE_OBJECTIVES:
+        raise ValueError(f"objective should be one of {', '.join(repr(i) for i in OPTIMISE_OBJECTIVES)}. received '{objective}'")
+    if not 0 <= percentile <= 100:
+        raise ValueError(f"percentile should be between 0 and 100 inclusive. received '{percentile}'")
+    if len(assets) == 0 or any(asset not in PORTFOLIO_ASSETS for asset in assets):
+        raise ValueError(f"assets should be a non-empty selection of {', '.join(PORTFOLIO_ASSETS)}. received '{assets}'")
+    divisions = round(1 / grid_step) if grid_step > 0 else 0
+    if divisions < 1 or not np.isclose(divisions * grid_step, 1):
+        raise ValueError(f"grid_step should divide 1 into a whole number of steps. received '{grid_step}'")
+
+    assets = [asset for asset in PORTFOLIO_ASSETS if asset in assets]
+    simulation_length_years = int(config['simulation_length_years'])
+    prices, years, months = build_window_arrays(historical_data, simulation_length_years)
+    metric = f'final_value_p{percentile:g}'
+
+    evaluated = {}
+    def evaluate(allocations):
+        """
+        runs the allocations not yet in evaluated in a single kernel pass
+        """
+        new = {}
+        for allocation in allocations:
+            key = tuple(np.round(allocation, 10))
+            if key not in evaluated and key not in new:
+                new[key] = np.array(key)
+        if len(new) == 0:
+            return
+        configs = [
+            dict(config, portfolio_allocation={
+                asset: (allocation[assets.index(asset)] if asset in assets else 0.0) for asset in PORTFOLIO_ASSETS
+                })
+            for allocation in new.values()
+            ]
+        results = run_config_kernel(prices, **get_config_arrays(configs, simulation_length_years))
+        if len(prices) > 0:
+            success_rate = (results['survival_duration'] >= simulation_length_years).mean(axis=1)
+            final_value = np.percentile(results['final_value'], percentile, axis=1)
+        else:
+            success_rate = final_value = np.full(len(new), np.nan)
+        for n, key in enumerate(new):
+            evaluated[key] = (float(success_rate[n]), float(final_value[n]))
+
+    def score(key):
+        success_rate, final_value = evaluated[key]
+        return((success_rate, final_value) if objective == 'success_rate' else (final_value, success_rate))
+
+    def get_ranking():
+        return(sorted(evaluated, key=score, reverse=True))
+
+    evaluate(list(get_simplex_grid(len(assets), divisions)))
+    step = grid_step
+    for refinement in range(refinement_steps):
+        step = step / 2
+        while True:
+            best = score(get_ranking()[0])
+            evaluate([neighbour for key in get_ranking()[:top_candidates] for neighbour in get_neighbours(np.array(key), step)])
+            if not score(get_ranking()[0]) > best:
+                break
+
+    ranking = get_ranking()
+    frontier = pd.DataFrame(
+        [[key[assets.index(asset)] if asset in assets else 0.0 for asset in PORTFOLIO_ASSETS] for key in ranking],
+        columns=list(PORTFOLIO_ASSETS)
+        )
+    frontier['success_rate'] = [evaluated[key][0] for key in ranking]
+    frontier[metric] = [evaluated[key][1] for key in ranking]
+
+    # pareto frontier of success rate against final value
+    success_rate = frontier['success_rate'].to_numpy()
+    final_value = frontier[metric].to_numpy()
+    dominated = (
+        (success_rate[None,:] >= success_rate[:,None]) & (final_value[None,:] >= final_value[:,None])
+        & ((success_rate[None,:] > success_rate[:,None]) | (final_value[None,:] > final_value[:,None]))
+        ).any(axis=1)
+    frontier['on_frontier'] = ~dominated
+    return(frontier)
@@ -0,0 +1,239 @@
+import pandas as pd
+import numpy as np
+import random
+import concurrent.futures
+from .simulation import Simulation, slice_time_frame
+from .shared import SharedArray, attach_shared_array
+from .compact import compact_timestep_data
+
+def _initialise_worker():
+    """
+    reseeds random in each worker so forked workers do not hand out identical run ids
+    """
+    random.seed()
+
+def _frame_to_arrays(df):
+    """
+    converts a data frame to a dict of plain numpy arrays for sending between processes
+    """
+    arrays = {}
+    for column in df.columns:
+        if str(df[column].dtype) == 'boolean':
+            arrays[column] = df[column].to_numpy(dtype='bool')
+        else:
+            arrays[column] = df[column].to_numpy()
+    return(arrays)
+
+def arrays_to_frame(arrays, dtypes=None):
+    """
+    converts a dict of numpy arrays sent back by a worker into a data frame
+
+    Parameters:
+        arrays: dict
+            column name to numpy array
+
+        dtypes: dict, default None
+            optional column name to dtype mapping applied after construction
+    """
+    df = pd.DataFrame(arrays)
+    if dtypes is not None:
+        df = df.astype({column: dtype for column, dtype in dtypes.items() if column in df.columns})
+    return(df)
+
+def run_windows(
+    historical_data,
+    income_schedule,
+    window_starts,
+    starting_portfolio_value,
+    max_withdrawal_rate,
+    simulation_length_years,
+    portfolio_allocation,
+    cash_buffer_years,
+    timestep_recording
+    ):
+    """
+    runs the simulations for a list of time frames on the reference engine, reusing one Simulation
+
+    Parameters:
+        window_starts: list of int
+            rows of historical data at which each time frame starts. also used as run_index
+
+        remaining parameters are as in Simulator
+
+    Returns:
+        run_results, timestep_data: data frames for all time frames
+    """
+    run_results_list = []
+    timestep_data_list = []
+    sim = None
+    for i in window_starts:
+        historical_data_subset = slice_time_frame(historical_data,i,simulation_length_years)
+        if sim is None:
+            sim = Simulation(
+                starting_portfolio_value,
+                max_withdrawal_rate,
+                income_schedule,
+                historical_data_subset,
+                portfolio_allocation,
+                cash_buffer_years
+                )
+        else:
+            sim.reset(historical_data_subset)
+        run_results, timestep_data = sim.run()
+        run_results['run_index'] = i
+        if timestep_recording == 'compact':
+            timestep_data = compact_timestep_data(timestep_data,i)
+        run_results_list.append(run_results)
+        timestep_data_list.append(timestep_data)
+
+    run_results = pd.concat(run_results_list,axis=0,ignore_index=True)
+    timestep_data = pd.concat(timestep_data_list,axis=0,ignore_index=True)
+    return(run_results,timestep_data)
+
+def run_window_batch(spec, window_starts):
+    """
+    runs the simulations for a batch of time frames inside a worker process
+
+    historical data and income schedule are attached zero-copy from shared memory
+
+    Parameters:
+        spec: dict
+            shared memory descriptors and simulation parameters created by iter_windows_in_pool
+
+        window_starts: list of int
+            rows of historical data at which each time frame starts. also used as run_index
+
+    Returns:
+        run_results, timestep_data: dicts of numpy arrays for all windows in the batch
+    """
+    historical_data = pd.DataFrame(
+        attach_shared_array(spec['historical_data']),
+        columns=spec['historical_columns'],
+        copy=False
+        )
+    schedule = attach_shared_array(spec['income_schedule'])
+    income_schedule = pd.DataFrame({
+        'year': schedule[:,0].astype('int'),
+        'desired_income': schedule[:,1],
+        'min_income': schedule[:,2]
+        })
+
+    run_results, timestep_data = run_windows(
+        historical_data,
+        income_schedule,
+        window_starts,
+        spec['starting_portfolio_value'],
+        spec['max_withdrawal_rate'],
+        spec['simulation_length_years'],
+        spec['portfolio_allocation'],
+        spec['cash_buffer_years'],
+        spec['timestep_recording']
+        )
+    return(_frame_to_arrays(run_results),_frame_to_arrays(timestep_data))
+
+def split_into_batches(items, number_of_batches):
+    """
+    splits items into at most number_of_batches contiguous lists of similar size
+    """
+    number_of_batches = max(1,min(number_of_batches,len(items)))
+    return([list(batch) for batch in np.array_split(np.asarray(items,dtype='int64'),number_of_batches) if len(batch) > 0])
+
+def iter_windows_in_pool(
+    historical_data,
+    income_schedule,
+    number_of_frames,
+    workers,
+    starting_portfolio_value,
+    max_withdrawal_rate,
+    simulation_length_years,
+    portfolio_allocation,
+    cash_buffer_years,
+    timestep_recording,
+    batch_size=None,
+    progress=None
+    ):
+    """
+    runs every time frame in a process pool, yielding results batch by batch in run_index order
+
+    historical data and income schedule are published once through shared memory.
+    workers attach to them by name and send back plain result arrays. at most
+    2 * workers batches are in flight or waiting to be yielded, so a slow consumer
+    holds up the workers instead of letting finished results pile up.
+    closing the generator early cancels batches that have not started
+
+    Parameters:
+        historical_data: data frame
+            numeric historical asset prices
+
+        income_schedule: data frame
+            data frame containing year, desired_income, min_income
+
+        number_of_frames: int
+            number of time frames to simulate. frame i starts at row i of historical_data
+
+        workers: int
+            number of worker processes
+
+        batch_size: int, default None
+            time frames per batch. by default the frames are split into 4 batches per worker
+
+        progress: callable, default None
+            called with the number of finished windows after each batch completes
+
+        remaining parameters are as in Simulator
+
+    Yields:
+        run_results, timestep_data: data frames for one batch of time frames
+    """
+    frames = list(range(number_of_frames))
+    if batch_size is None:
+        batches = split_into_batches(frames,workers*4)
+    else:
+        batches = [frames[start:start+batch_size] for start in range(0,number_of_frames,batch_size)]
+
+    with SharedArray(historical_data.to_numpy(dtype='float64')) as shared_historical_data, \
+        SharedArray(income_schedule[['year','desired_income','min_income']].to_numpy(dtype='float64')) as shared_income_schedule:
+        spec = {
+            'historical_data': shared_historical_data.get_descriptor(),
+            'historical_columns': list(historical_data.columns),
+            'income_schedule': shared_income_schedule.get_descriptor(),
+            'starting_portfolio_value': starting_portfolio_value,
+            'max_withdrawal_rate': max_withdrawal_rate,
+            'simulation_length_years': simulation_length_years,
+            'portfolio_allocation': dict(portfolio_allocation),
+            'cash_buffer_years': cash_buffer_years,
+            'timestep_recording': timestep_recording
+            }
+
+        results = {}
+        finished = 0
+        next_batch = 0
+        executor = concurrent.futures.ProcessPoolExecutor(max_workers=workers,initializer=_initialise_worker)
+        futures = {}
+        try:
+            submitted = 0
+            while next_batch < len(batches):
+                while submitted < len(batches) and submitted - next_batch < 2*workers:
+                    futures[executor.submit(run_window_batch,spec,batches[submitted])] = submitted
+                    submitted += 1
+                done, pending = concurrent.futures.wait(futures,return_when=concurrent.futures.FIRST_COMPLETED)
+                for future in done:
+                    n = futures.pop(future)
+                    results[n] = future.result()
+                    finished += len(batches[n])
+                    if progress is not None:
+                        progress(finished)
+
+                # hand over every batch whose predecessors have all finished, in run_index order
+                while next_batch in results:
+                    run_results, timestep_data = results.pop(next_batch)
+                    next_batch += 1
+                    yield(
+                        arrays_to_frame(run_results),
+                        arrays_to_frame(timestep_data,{'failed':'boolean'} if timestep_recording != 'compact' else None)
+                        )
+        finally:
+            # cancelled here rather than through shutdown(cancel_futures=True), which needs python 3.9
+            for future in futures:
+                future.cancel()
+            executor.shutdown(wait=True)
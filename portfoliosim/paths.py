@@ -0,0 +1,153 @@
+import numpy as np
+import pandas as pd
+from .kernel import normalise_allocation, get_income_arrays, run_kernel, PRICED_ASSETS
+
+class LognormalReturns():
+    """
+    generator of price paths with correlated lognormal yearly returns
+
+    yearly gross returns of the priced assets are lognormal with the given arithmetic
+    mean and volatility, and their log returns have the given correlation
+    """
+    def __init__(self, expected_returns, volatilities, correlation=None):
+        """
+        Parameters:
+            expected_returns: dict
+                expected arithmetic yearly return per asset, eg {'stocks': 0.07, 'bonds': 0.03}.
+                assets left out have a return of zero
+
+            volatilities: dict
+                standard deviation of yearly returns per asset. assets left out have no volatility
+
+            correlation: array of shape (3, 3), default None
+                correlation of log returns in stocks, gold, bonds order. uncorrelated by default
+        """
+        for name, values in (('expected_returns', expected_returns), ('volatilities', volatilities)):
+            for asset in values:
+                if asset not in PRICED_ASSETS:
+                    raise ValueError(f"{name} assets should only be {', '.join(PRICED_ASSETS)}. received '{asset}'")
+        expected = np.array([float(expected_returns.get(asset, 0.0)) for asset in PRICED_ASSETS])
+        volatility = np.array([float(volatilities.get(asset, 0.0)) for asset in PRICED_ASSETS])
+        if (expected <= -1).any():
+            raise ValueError(f"expected_returns should be greater than -1. received '{expected_returns}'")
+        if (volatility < 0).any():
+            raise ValueError(f"volatilities should be at least zero. received '{volatilities}'")
+
+        if correlation is None:
+            correlation = np.eye(len(PRICED_ASSETS))
+        correlation = np.asarray(correlation, dtype='float64')
+        if (correlation.shape != (len(PRICED_ASSETS), len(PRICED_ASSETS))
+                or not np.allclose(correlation, correlation.T)
+                or not np.allclose(np.diag(correlation), 1)):
+            raise ValueError(f"correlation should be a symmetric {len(PRICED_ASSETS)}x{len(PRICED_ASSETS)} matrix with ones on the diagonal. received '{correlation.tolist()}'")
+        try:
+            cholesky = np.linalg.cholesky(correlation)
+        except np.linalg.LinAlgError:
+            raise ValueError(f"correlation should be positive definite. received '{correlation.tolist()}'")
+
+        # moments of log returns matching the arithmetic mean and volatility
+        log_variance = np.log(1 + (volatility / (1 + expected))**2)
+        self.__log_mean = np.log(1 + expected) - log_variance / 2
+        self.__log_volatility = np.sqrt(log_variance)
+        self.__cholesky = cholesky
+
+    def generate(self, number_of_paths, simulation_length_years, rng):
+        """
+        draws price paths
+
+        Parameters:
+            number_of_paths: int
+            simulation_length_years: int
+            rng: numpy Generator
+
+        Returns:
+            prices: array of shape (number_of_paths, simulation_length_years, 3)
+                prices of stocks, gold, bonds starting at 1, in the layout of build_window_arrays
+        """
+        shocks = rng.standard_normal((number_of_paths, max(simulation_length_years - 1, 0), len(PRICED_ASSETS)))
+        log_returns = self.__log_mean + (shocks @ self.__cholesky.T) * self.__log_volatility
+        prices = np.ones((number_of_paths, simulation_length_years, len(PRICED_ASSETS)))
+        if simulation_length_years > 1:
+            prices[:,1:,:] = np.exp(np.cumsum(log_returns, axis=1))
+        return(prices)
+
+def iter_path_batches(generator, number_of_paths, simulation_length_years, batch_size=10000, seed=None):
+    """
+    yields price paths in batches of at most batch_size paths
+
+    batch k draws from its own generator seeded with (seed, k), so the paths of
+    a batch do not depend on batch processing order. only one batch is held at a time
+
+    Yields:
+        path_offset: int
+            index of the first path in the batch
+
+        prices: array of shape (batch paths, simulation_length_years, 3)
+    """
+    if isinstance(batch_size, bool) or not isinstance(batch_size, int) or batch_size < 1:
+        raise ValueError(f"batch_size should be an int of at least one. received '{batch_size}'")
+    if seed is None:
+        seed = np.random.SeedSequence().entropy
+    for batch, path_offset in enumerate(range(0, number_of_paths, batch_size)):
+        rng = np.random.default_rng([seed, batch])
+        yield(path_offset, generator.generate(min(batch_size, number_of_paths - path_offset), simulation_length_years, rng))
+
+def run_parametric(config, generator, number_of_paths, batch_size=10000, seed=None):
+    """
+    streams generated price paths through the vectorized kernel
+
+    memory is bounded by batch_size paths, only run level results of every path are kept
+
+    Parameters:
+        config: dict
+            Simulator config
+
+        generator: LognormalReturns
+            source of price paths
+
+        number_of_paths: int
+            total number of paths to simulate
+
+        batch_size: int, default 10000
+            paths generated and simulated at a time
+
+        seed: int, default None
+            seed of the path batches. random if not given
+
+    Returns:
+        run_results: data frame
+            one row per path with columns path_index, final_value, survival_duration, failed
+    """
+    if isinstance(number_of_paths, bool) or not isinstance(number_of_paths, int) or number_of_paths < 1:
+        raise ValueError(f"number_of_paths should be an int of at least one. received '{number_of_paths}'")
+    simulation_length_years = int(config['simulation_length_years'])
+    desired_income, min_income = get_income_arrays(
+        config['desired_annual_income'],
+        config['inflation'],
+        config['min_income_multiplier'],
+        simulation_length_years
+        )
+    allocation = normalise_allocation(config['portfolio_allocation'])
+
+    final_value = np.empty(number_of_paths)
+    survival_duration = np.empty(number_of_paths, dtype='int64')
+    for path_offset, prices in iter_path_batches(generator, number_of_paths, simulation_length_years, batch_size, seed):
+        results = run_kernel(
+            prices,
+            desired_income,
+            min_income,
+            config['starting_portfolio_value'],
+            config['max_withdrawal_rate'],
+            allocation,
+            int(config['cash_buffer_years']),
+            record_timesteps=False
+            )
+        final_value[path_offset:path_offset+len(prices)] = results['final_value']
+        survival_duration[path_offset:path_offset+len(prices)] = results['survival_duration']
+
+    return(pd.DataFrame({
+        'path_index': np.arange(number_of_paths),
+        'final_value': final_value,
+        'survival_duration': survival_duration,
+        'failed': survival_duration < simulation_length_years
+        }))
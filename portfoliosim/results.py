@@ -0,0 +1,230 @@
+import numpy as np
+import pandas as pd
+import json
+import pathlib
+
+COLUMNAR_FORMAT_VERSION = 1
+
+def write_timestep_columns(timestep_data, directory, run_key='run_id'):
+    """
+    writes timestep data in a columnar on-disk format with a run offset index
+
+    every column is written to its own .npy file with rows grouped by run.
+    run_keys.npy holds the key of each run and run_offsets.npy the row at
+    which each run starts, so a single run can be read without touching the rest
+
+    Parameters:
+        timestep_data: data frame
+            timestep data in the full or compact layout
+
+        directory: folder path
+            folder to write the columnar files into. created if needed
+
+        run_key: str, default 'run_id'
+            column identifying the run of each row. 'run_index' for the compact layout
+    """
+    path = pathlib.Path(directory)
+    path.mkdir(parents=True, exist_ok=True)
+
+    keys = timestep_data[run_key].to_numpy(dtype='int64')
+    if not _runs_are_contiguous(keys):
+        # group the rows of each run while keeping the order runs first appear in
+        order = np.argsort(pd.factorize(keys)[0], kind='stable')
+        timestep_data = timestep_data.iloc[order]
+        keys = keys[order]
+    run_starts = np.flatnonzero(np.concatenate([[True], keys[1:] != keys[:-1]])) if len(keys) > 0 else np.zeros(0, dtype='int64')
+    run_keys = keys[run_starts]
+    run_offsets = np.append(run_starts, len(keys)).astype('int64')
+
+    columns = {}
+    for column in timestep_data.columns:
+        values = timestep_data[column]
+        if str(values.dtype) == 'boolean':
+            array = values.to_numpy(dtype='bool')
+        else:
+            array = values.to_numpy()
+        np.save(path / f'{column}.npy', np.ascontiguousarray(array), allow_pickle=False)
+        columns[column] = str(values.dtype)
+    np.save(path / 'run_keys.npy', run_keys)
+    np.save(path / 'run_offsets.npy', run_offsets)
+
+    with open(path / 'meta.json', 'w') as f:
+        json.dump({
+            'format_version': COLUMNAR_FORMAT_VERSION,
+            'run_key': run_key,
+            'rows': int(len(keys)),
+            'columns': columns
+            }, f)
+
+def _runs_are_contiguous(keys):
+    """
+    checks that all rows belonging to the same run are next to each other
+    """
+    if len(keys) == 0:
+        return(True)
+    run_keys = keys[np.concatenate([[True], keys[1:] != keys[:-1]])]
+    return(len(np.unique(run_keys)) == len(run_keys))
+
+class Results():
+    """
+    lazy, memory-mapped view over timestep data written by write_timestep_columns
+
+    nothing is read on construction apart from the small run index.
+    columns are memory-mapped on first use, so reading one run or one column
+    only touches the pages it needs
+    """
+    def __init__(self, directory):
+        """
+        Parameters:
+            directory: folder path
+                folder written by write_timestep_columns
+        """
+        self.__path = pathlib.Path(directory)
+        with open(self.__path / 'meta.json') as f:
+            self.__meta = json.load(f)
+        self.__run_keys = np.load(self.__path / 'run_keys.npy')
+        self.__run_offsets = np.load(self.__path / 'run_offsets.npy')
+        self.__run_positions = {key: position for position, key in enumerate(self.__run_keys.tolist())}
+        self.__columns = {}
+
+    def __len__(self):
+        return(self.__meta['rows'])
+
+    def get_run_key(self):
+        return(self.__meta['run_key'])
+
+    def get_run_ids(self):
+        """
+        returns the keys of all runs in the order they were written
+        """
+        return(self.__run_keys)
+
+    def get_column_names(self):
+        return(list(self.__meta['columns']))
+
+    def get_column(self, column):
+        """
+        returns a read only memory-mapped array of column across all runs
+        """
+        if column not in self.__meta['columns']:
+            raise KeyError(f"column should be one of {', '.join(self.__meta['columns'])}. received '{column}'")
+        if column not in self.__columns:
+            self.__columns[column] = np.load(self.__path / f'{column}.npy', mmap_mode='r')
+        return(self.__columns[column])
+
+    def get_run(self, run_id, columns=None):
+        """
+        returns timestep data of a single run
+
+        Parameters:
+            run_id: int
+                key of the run, run_id for the full layout or run_index for the compact layout
+
+            columns: list of str, default None
+                columns to read. all columns by default
+
+        Returns:
+            timestep_data: data frame containing only the rows of this run
+        """
+        if run_id not in self.__run_positions:
+            raise KeyError(f"run '{run_id}' not found in results")
+        position = self.__run_positions[run_id]
+        return(self.__read_rows(self.__run_offsets[position],self.__run_offsets[position + 1],columns))
+
+    def has_run(self, run_id):
+        return(run_id in self.__run_positions)
+
+    def to_frame(self, columns=None):
+        """
+        reads every row into a data frame
+
+        Parameters:
+            columns: list of str, default None
+                columns to read. all columns by default
+        """
+        return(self.__read_rows(0,len(self),columns))
+
+    def __read_rows(self, start, stop, columns):
+        if columns is None:
+            columns = self.get_column_names()
+
+        df = pd.DataFrame({column: np.array(self.get_column(column)[start:stop]) for column in columns})
+        for column in columns:
+            if self.__meta['columns'][column] == 'boolean':
+                df[column] = df[column].astype('boolean')
+        return(df)
+
+class ChunkedResults():
+    """
+    lazy concatenation of timestep data chunks written by write_timestep_columns
+
+    the folder holds one columnar chunk per subfolder and a chunks.json index listing
+    them in order. chunks are opened as Results and only read when asked for
+    """
+    def __init__(self, directory):
+        """
+        Parameters:
+            directory: folder path
+                folder holding chunks.json and the chunk folders
+        """
+        self.__path = pathlib.Path(directory)
+        with open(self.__path / 'chunks.json') as f:
+            self.__meta = json.load(f)
+        self.__chunks = [Results(self.__path / chunk) for chunk in self.__meta['chunks']]
+
+    def __len__(self):
+        return(sum(len(chunk) for chunk in self.__chunks))
+
+    def get_path(self):
+        return(self.__path)
+
+    def get_run_key(self):
+        return(self.__meta['run_key'])
+
+    def get_chunks(self):
+        return(list(self.__chunks))
+
+    def get_chunk_names(self):
+        return(list(self.__meta['chunks']))
+
+    def get_run_ids(self):
+        """
+        returns the keys of all runs in the order they were written
+        """
+        if len(self.__chunks) == 0:
+            return(np.zeros(0, dtype='int64'))
+        return(np.concatenate([chunk.get_run_ids() for chunk in self.__chunks]))
+
+    def get_column_names(self):
+        return(self.__chunks[0].get_column_names() if len(self.__chunks) > 0 else [])
+
+    def get_column(self, column):
+        """
+        returns column across all chunks. unlike Results.get_column the column is read into memory
+        """
+        return(np.concatenate([chunk.get_column(column) for chunk in self.__chunks]))
+
+    def iter_frames(self, columns=None):
+        """
+        yields each chunk as a data frame, holding one chunk in memory at a time
+        """
+        for chunk in self.__chunks:
+            yield(chunk.to_frame(columns))
+
+    def get_run(self, run_id, columns=None):
+        """
+        returns timestep data of a single run
+        """
+        for chunk in self.__chunks:
+            if chunk.has_run(run_id):
+                return(chunk.get_run(run_id, columns))
+        raise KeyError(f"run '{run_id}' not found in results")
+
+    def to_frame(self, columns=None):
+        """
+        reads every chunk into a single data frame
+        """
+        frames = list(self.iter_frames(columns))
+        if len(frames) == 0:
+            return(pd.DataFrame())
+        return(pd.concat(frames, axis=0, ignore_index=True))
@@ -0,0 +1,419 @@
+import pandas as pd
+import pathlib
+import sqlite3
+
+# column definitions shared by every results store backend
+RESULTS_SCHEMA = {
+    'simulation_inputs': [
+        ('simulator_id', 'BIGINT'),
+        ('starting_portfolio_value', 'DOUBLE'),
+        ('desired_annual_income', 'DOUBLE'),
+        ('inflation', 'DOUBLE'),
+        ('min_income_multiplier', 'DOUBLE'),
+        ('max_withdrawal_rate', 'DOUBLE'),
+        ('cash_buffer_years', 'INTEGER'),
+        ('stocks_allocation', 'DOUBLE'),
+        ('bonds_allocation', 'DOUBLE'),
+        ('gold_allocation', 'DOUBLE'),
+        ('cash_allocation', 'DOUBLE')
+        ],
+    'run_results': [
+        ('simulator_id', 'BIGINT'),
+        ('run_id', 'BIGINT'),
+        ('run_index', 'INTEGER'),
+        ('start_ref_year', 'INTEGER'),
+        ('start_ref_month', 'INTEGER'),
+        ('end_ref_year', 'INTEGER'),
+        ('end_ref_month', 'INTEGER'),
+        ('final_value', 'DOUBLE'),
+        ('survival_duration', 'INTEGER')
+        ],
+    'timestep_data': [
+        ('simulator_id', 'BIGINT'),
+        ('run_id', 'BIGINT'),
+        ('timestep', 'INTEGER'),
+        ('year', 'INTEGER'),
+        ('month', 'INTEGER'),
+        ('cash_buffer', 'DOUBLE'),
+        ('bonds_qty', 'DOUBLE'),
+        ('stocks_qty', 'DOUBLE'),
+        ('gold_qty', 'DOUBLE'),
+        ('bonds_value', 'DOUBLE'),
+        ('stocks_value', 'DOUBLE'),
+        ('gold_value', 'DOUBLE'),
+        ('cash_notional', 'DOUBLE'),
+        ('allowance', 'DOUBLE'),
+        ('desired_allowance', 'DOUBLE'),
+        ('failed', 'BOOLEAN')
+        ]
+    }
+
+# indexes created on the results tables
+RESULTS_INDEXES = {
+    'simulation_inputs_simulator_id': ('simulation_inputs', ['simulator_id']),
+    'run_results_simulator_id': ('run_results', ['simulator_id']),
+    'run_results_run_id': ('run_results', ['run_id']),
+    'run_results_start': ('run_results', ['start_ref_year','start_ref_month']),
+    'timestep_data_simulator_id_run_id': ('timestep_data', ['simulator_id','run_id'])
+    }
+
+class ResultsStore():
+    """
+    database holding run_results, timestep_data and simulation_inputs of many simulators
+
+    replaces the per simulator csv folders written by Simulator.write_results.
+    subclasses provide the connection and the bulk insert for a specific backend
+    """
+    def __init__(self, path):
+        """
+        opens the store, creating tables and indexes if they do not exist
+
+        Parameters:
+            path: file path
+                path to the database file
+        """
+        self._path = str(path)
+        self._connection = self._connect(self._path)
+        for table, columns in RESULTS_SCHEMA.items():
+            column_definitions = ', '.join(f'{column} {column_type}' for column, column_type in columns)
+            self._execute(f'CREATE TABLE IF NOT EXISTS {table} ({column_definitions})')
+        for index, (table, columns) in RESULTS_INDEXES.items():
+            self._execute(f"CREATE INDEX IF NOT EXISTS {index} ON {table} ({', '.join(columns)})")
+
+    def _connect(self, path):
+        raise NotImplementedError
+
+    def _execute(self, sql, parameters=()):
+        return(self._connection.execute(sql, parameters))
+
+    def _insert(self, table, df):
+        raise NotImplementedError
+
+    def _begin(self):
+        self._execute('BEGIN TRANSACTION')
+
+    def _commit(self):
+        self._execute('COMMIT')
+
+    def _rollback(self):
+        self._execute('ROLLBACK')
+
+    def get_path(self):
+        return(self._path)
+
+    def close(self):
+        self._connection.close()
+
+    def __enter__(self):
+        return(self)
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def write_simulator(self, simulator):
+        """
+        bulk inserts the results of a simulator that has been run
+        """
+        self.write_simulators([simulator])
+
+    def write_simulators(self, simulators):
+        """
+        bulk inserts the results of several simulators in a single transaction
+
+        Parameters:
+            simulators: iterable of Simulator
+                simulators whose run_simulations has completed
+        """
+        tables = {table: [] for table in RESULTS_SCHEMA}
+        for simulator in simulators:
+            tables['simulation_inputs'].append(simulator._get_simulator_inputs_df())
+            tables['run_results'].append(simulator._get_run_results())
+            tables['timestep_data'].append(simulator._get_expanded_timestep_data())
+
+        self._begin()
+        try:
+            for table, frames in tables.items():
+                columns = [column for column, column_type in RESULTS_SCHEMA[table]]
+                df = pd.concat(frames, axis=0, ignore_index=True)[columns]
+                if len(df) > 0:
+                    self._insert(table, df)
+            self._commit()
+        except BaseException:
+            self._rollback()
+            raise
+
+    def query(self, sql, parameters=()):
+        """
+        runs sql against the store and returns the result as a data frame
+        """
+        raise NotImplementedError
+
+    def get_simulation_inputs(self):
+        return(self.query('SELECT * FROM simulation_inputs'))
+
+    def get_run_results(self, simulator_id=None):
+        """
+        returns run results, optionally restricted to a single simulator
+        """
+        if simulator_id is None:
+            return(self.query('SELECT * FROM run_results'))
+        return(self.query('SELECT * FROM run_results WHERE simulator_id = ?', (int(simulator_id),)))
+
+    def get_timestep_data(self, simulator_id, run_id=None):
+        """
+        returns timestep data of a simulator, optionally restricted to a single run
+        """
+        if run_id is None:
+            return(self.query(
+                'SELECT * FROM timestep_data WHERE simulator_id = ? ORDER BY run_id, timestep',
+                (int(simulator_id),)
+                ))
+        return(self.query(
+            'SELECT * FROM timestep_data WHERE simulator_id = ? AND run_id = ? ORDER BY timestep',
+            (int(simulator_id), int(run_id))
+            ))
+
+class SQLiteResultsStore(ResultsStore):
+    """
+    results store backed by a SQLite file
+    """
+    def _connect(self, path):
+        connection = sqlite3.connect(path, isolation_level=None)
+        connection.execute('PRAGMA journal_mode=WAL')
+        connection.execute('PRAGMA synchronous=NORMAL')
+        return(connection)
+
+    def _insert(self, table, df):
+        placeholders = ', '.join('?' for column in df.columns)
+        self._connection.executemany(
+            f"INSERT INTO {table} ({', '.join(df.columns)}) VALUES ({placeholders})",
+            df.itertuples(index=False, name=None)
+            )
+
+    def query(self, sql, parameters=()):
+        return(pd.read_sql_query(sql, self._connection, params=parameters))
+
+class DuckDBResultsStore(ResultsStore):
+    """
+    results store backed by a DuckDB file. requires the optional duckdb package
+    """
+    def _connect(self, path):
+        try:
+            import duckdb
+        except ImportError:
+            raise ImportError("DuckDBResultsStore requires the duckdb package. install it with 'pip install duckdb'")
+        return(duckdb.connect(path))
+
+    def _insert(self, table, df):
+        self._connection.register('results_store_insert', df)
+        try:
+            self._execute(f"INSERT INTO {table} ({', '.join(df.columns)}) SELECT * FROM results_store_insert")
+        finally:
+            self._connection.unregister('results_store_insert')
+
+    def query(self, sql, parameters=()):
+        return(self._execute(sql, parameters).df())
+
+
+
+# arrow types of the RESULTS_SCHEMA column types
+_ARROW_TYPES = {
+    'BIGINT': 'int64',
+    'INTEGER': 'int64',
+    'DOUBLE': 'float64',
+    'BOOLEAN': 'bool'
+    }
+
+# rows per parquet row group. large groups keep scans sequential, while run_results and
+# timestep_data are sorted so that each group covers a narrow range of start years and runs
+PARQUET_ROW_GROUP_SIZE = 131072
+
+class ParquetResultsStore():
+    """
+    results store written as hive-partitioned parquet datasets. requires the optional pyarrow package
+
+    each table is a folder under path, partitioned by simulator_id and any
+    simulation_inputs columns given as partition_keys, eg
+    run_results/max_withdrawal_rate=0.04/simulator_id=.../part-....parquet.
+    files are zstd compressed and dtypes are kept, so readers such as pyarrow,
+    duckdb or spark can prune partitions when querying one config.
+    provides the same methods as ResultsStore
+    """
+    def __init__(self, path, partition_keys=('simulator_id',)):
+        """
+        Parameters:
+            path: folder path
+                folder holding one dataset per table. created if needed
+
+            partition_keys: tuple of str, default ('simulator_id',)
+                simulation_inputs columns to partition run_results and timestep_data by,
+                outermost first. simulator_id is added as the innermost key when not given.
+                simulation_inputs is always partitioned by simulator_id only
+        """
+        try:
+            import pyarrow
+            import pyarrow.dataset
+        except ImportError:
+            raise ImportError("ParquetResultsStore requires the pyarrow package. install it with 'pip install pyarrow'")
+        input_columns = [column for column, column_type in RESULTS_SCHEMA['simulation_inputs']]
+        for key in partition_keys:
+            if key not in input_columns:
+                raise ValueError(f"partition_keys should be columns of simulation_inputs. received '{key}'")
+        self._path = str(path)
+        self._partition_keys = list(partition_keys) + ([] if 'simulator_id' in partition_keys else ['simulator_id'])
+        self._pa = pyarrow
+        self._ds = pyarrow.dataset
+
+    def get_path(self):
+        return(self._path)
+
+    def close(self):
+        pass
+
+    def __enter__(self):
+        return(self)
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def _get_partition_keys(self, table):
+        if table == 'simulation_inputs':
+            return(['simulator_id'])
+        return(self._partition_keys)
+
+    def _get_arrow_schema(self, table):
+        columns = [(column, _ARROW_TYPES[column_type]) for column, column_type in RESULTS_SCHEMA[table]]
+        if table != 'simulation_inputs':
+            input_types = dict(RESULTS_SCHEMA['simulation_inputs'])
+            columns += [(key, _ARROW_TYPES[input_types[key]]) for key in self._partition_keys if key not in dict(columns)]
+        return(self._pa.schema(columns))
+
+    def _get_partitioning(self, table):
+        schema = self._get_arrow_schema(table)
+        return(self._ds.partitioning(
+            self._pa.schema([schema.field(key) for key in self._get_partition_keys(table)]),
+            flavor='hive'
+            ))
+
+    def write_simulator(self, simulator):
+        """
+        writes the results of a simulator that has been run
+        """
+        self.write_simulators([simulator])
+
+    def write_simulators(self, simulators):
+        """
+        writes the results of several simulators as new files in each table's dataset
+
+        Parameters:
+            simulators: iterable of Simulator
+                simulators whose run_simulations has completed
+        """
+        import uuid
+
+        tables = {table: [] for table in RESULTS_SCHEMA}
+        for simulator in simulators:
+            simulation_inputs = simulator._get_simulator_inputs_df()
+            tables['simulation_inputs'].append(simulation_inputs)
+            for table, df in (('run_results', simulator._get_run_results()), ('timestep_data', simulator._get_expanded_timestep_data())):
+                df = df.copy()
+                for key in self._partition_keys:
+                    df[key] = simulation_inputs[key][0]
+                tables[table].append(df)
+
+        sort_keys = {
+            'simulation_inputs': ['simulator_id'],
+            'run_results': ['start_ref_year','start_ref_month'],
+            'timestep_data': ['run_id','timestep']
+            }
+        for table, frames in tables.items():
+            schema = self._get_arrow_schema(table)
+            df = pd.concat(frames, axis=0, ignore_index=True)[schema.names]
+            if len(df) == 0:
+                continue
+            df = df.sort_values(self._get_partition_keys(table) + sort_keys[table], kind='stable')
+            if 'failed' in df.columns:
+                df['failed'] = df['failed'].astype('bool')
+            self._ds.write_dataset(
+                self._pa.Table.from_pandas(df, schema=schema, preserve_index=False),
+                f'{self._path}/{table}',
+                format='parquet',
+                partitioning=self._get_partitioning(table),
+                basename_template=f'part-{uuid.uuid4().hex}-{{i}}.parquet',
+                existing_data_behavior='overwrite_or_ignore',
+                file_options=self._ds.ParquetFileFormat().make_write_options(compression='zstd'),
+                max_rows_per_group=PARQUET_ROW_GROUP_SIZE,
+                min_rows_per_group=min(PARQUET_ROW_GROUP_SIZE, len(df))
+                )
+
+    def _read(self, table, filter=None):
+        schema = self._get_arrow_schema(table)
+        if not pathlib.Path(f'{self._path}/{table}').exists():
+            return(schema.empty_table().to_pandas()[[column for column, column_type in RESULTS_SCHEMA[table]]])
+        dataset = self._ds.dataset(
+            f'{self._path}/{table}',
+            schema=schema,
+            format='parquet',
+            partitioning=self._get_partitioning(table)
+            )
+        df = dataset.to_table(filter=filter).to_pandas()
+        return(df[[column for column, column_type in RESULTS_SCHEMA[table]]])
+
+    def query(self, sql, parameters=()):
+        """
+        runs sql against the store with duckdb, where each table is a view over its dataset
+        """
+        try:
+            import duckdb
+        except ImportError:
+            raise ImportError("querying a ParquetResultsStore requires the duckdb package. install it with 'pip install duckdb'")
+        connection = duckdb.connect()
+        try:
+            for table in RESULTS_SCHEMA:
+                if pathlib.Path(f'{self._path}/{table}').exists():
+                    connection.execute(f"CREATE VIEW {table} AS SELECT * FROM read_parquet('{self._path}/{table}/**/*.parquet', hive_partitioning = true)")
+            return(connection.execute(sql, parameters).df())
+        finally:
+            connection.close()
+
+    def get_simulation_inputs(self):
+        return(self._read('simulation_inputs'))
+
+    def get_run_results(self, simulator_id=None):
+        """
+        returns run results, optionally restricted to a single simulator
+        """
+        if simulator_id is None:
+            return(self._read('run_results'))
+        return(self._read('run_results', self._ds.field('simulator_id') == int(simulator_id)).reset_index(drop=True))
+
+    def get_timestep_data(self, simulator_id, run_id=None):
+        """
+        returns timestep data of a simulator, optionally restricted to a single run
+        """
+        condition = self._ds.field('simulator_id') == int(simulator_id)
+        if run_id is not None:
+            condition = condition & (self._ds.field('run_id') == int(run_id))
+        df = self._read('timestep_data', condition)
+        return(df.sort_values(['run_id','timestep'], kind='stable').reset_index(drop=True))
+
+RESULTS_STORE_BACKENDS = {
+    'sqlite': SQLiteResultsStore,
+    'duckdb': DuckDBResultsStore,
+    'parquet': ParquetResultsStore
+    }
+
+def open_results_store(path, backend='sqlite'):
+    """
+    opens a results store
+
+    Parameters:
+        path: file path
+            path to the database file, or folder for parquet
+
+        backend: str, default 'sqlite'
+            one of 'sqlite', 'duckdb', 'parquet'
+    """
+    if backend not in RESULTS_STORE_BACKENDS:
+        raise ValueError(f"backend should be one of {', '.join(repr(i) for i in RESULTS_STORE_BACKENDS)}. received '{backend}'")
+    return(RESULTS_STORE_BACKENDS[backend](path))
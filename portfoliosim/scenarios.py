@@ -0,0 +1,112 @@
+import numpy as np
+import pandas as pd
+from .kernel import build_window_arrays, get_config_arrays, run_config_kernel, PRICED_ASSETS
+
+BASELINE_SCENARIO = 'historical'
+
+def check_scenarios(scenarios):
+    """
+    checks scenario definitions
+
+    Parameters:
+        scenarios: dict
+            maps scenario name to shocks. shocks map an asset in PRICED_ASSETS to a list of
+            yearly returns applied from the first year of the simulation, eg
+            {'crash': {'stocks': [-0.4, 0, 0, 0]}} is -40% stocks in year 1 and flat for 3 years.
+            None in a list keeps the historical return of that year
+    """
+    if not isinstance(scenarios, dict) or len(scenarios) == 0:
+        raise ValueError(f"scenarios should be a non-empty dict of scenario name to shocks. received '{scenarios}'")
+    for name, shocks in scenarios.items():
+        if name == BASELINE_SCENARIO:
+            raise ValueError(f"scenario name '{BASELINE_SCENARIO}' is reserved for the unshocked time frames")
+        if not isinstance(shocks, dict):
+            raise ValueError(f"shocks of scenario {name} should be a dict of asset to yearly returns. received '{shocks}'")
+        for asset, returns in shocks.items():
+            if asset not in PRICED_ASSETS:
+                raise ValueError(f"scenario assets should only be {', '.join(PRICED_ASSETS)}. received '{asset}'")
+            for value in returns:
+                if value is not None and not value > -1:
+                    raise ValueError(f"scenario returns should be greater than -1. received '{value}' for {asset} in {name}")
+
+def apply_scenario(prices, shocks):
+    """
+    overlays the shocks of one scenario on window prices
+
+    prices follow each window's own yearly returns except where a shock replaces the
+    return, so the path after the shock continues from the shocked level. shocks
+    longer than the simulation are cut off
+
+    Parameters:
+        prices: array of shape (n_windows, years, 3)
+            window prices as returned by build_window_arrays
+
+        shocks: dict
+            asset to list of yearly returns, see check_scenarios
+
+    Returns:
+        shocked_prices: array of shape (n_windows, years, 3)
+    """
+    number_of_windows, years, number_of_assets = prices.shape
+    if years < 2:
+        return(prices.copy())
+    growth = prices[:,1:,:] / prices[:,:-1,:]
+    for asset, returns in shocks.items():
+        n = PRICED_ASSETS.index(asset)
+        for t, value in enumerate(returns[:years-1]):
+            if value is not None:
+                growth[:,t,n] = 1 + value
+    shocked_prices = np.empty_like(prices)
+    shocked_prices[:,0,:] = prices[:,0,:]
+    shocked_prices[:,1:,:] = prices[:,:1,:] * np.cumprod(growth, axis=1)
+    return(shocked_prices)
+
+def run_scenarios(historical_data, config, scenarios, include_baseline=True):
+    """
+    runs every scenario against every time frame in a single kernel pass
+
+    window arrays are built once, each scenario is overlaid on them and the
+    scenarios are stacked along the config axis of run_config_kernel
+
+    Parameters:
+        historical_data: data frame
+            monthly historical asset prices
+
+        config: dict
+            Simulator config
+
+        scenarios: dict
+            scenario name to shocks, see check_scenarios
+
+        include_baseline: bool, default True
+            also run the unshocked time frames as scenario 'historical'
+
+    Returns:
+        run_results: data frame
+            one row per scenario and time frame with columns scenario, run_index,
+            start_ref_year, start_ref_month, end_ref_year, end_ref_month,
+            final_value, survival_duration, failed
+    """
+    check_scenarios(scenarios)
+    simulation_length_years = int(config['simulation_length_years'])
+    prices, years, months = build_window_arrays(historical_data, simulation_length_years)
+
+    names = ([BASELINE_SCENARIO] if include_baseline else []) + list(scenarios)
+    stacked_prices = np.stack(
+        [prices if name == BASELINE_SCENARIO else apply_scenario(prices, scenarios[name]) for name in names],
+        axis=0
+        )
+    results = run_config_kernel(stacked_prices, **get_config_arrays(len(names)*[config], simulation_length_years))
+
+    number_of_windows = len(prices)
+    return(pd.DataFrame({
+        'scenario': np.repeat(names, number_of_windows),
+        'run_index': np.tile(np.arange(number_of_windows), len(names)),
+        'start_ref_year': np.tile(years[:,0], len(names)).astype('int64'),
+        'start_ref_month': np.tile(months[:,0], len(names)).astype('int64'),
+        'end_ref_year': np.tile(years[:,-1], len(names)).astype('int64'),
+        'end_ref_month': np.tile(months[:,-1], len(names)).astype('int64'),
+        'final_value': results['final_value'].ravel(),
+        'survival_duration': results['survival_duration'].ravel(),
+        'failed': results['survival_duration'].ravel() < simulation_length_years
+        }))
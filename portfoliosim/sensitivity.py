@@ -0,0 +1,181 @@
+import numpy as np
+import pandas as pd
+from .kernel import build_window_arrays, normalise_allocation, get_config_arrays, run_config_kernel, PORTFOLIO_ASSETS
+
+# parameters that can be perturbed, with a check of whether a perturbed value is still valid
+SENSITIVITY_PARAMETERS = {
+    'max_withdrawal_rate': lambda value: 0 < value <= 1,
+    'inflation': lambda value: value > 0,
+    'desired_annual_income': lambda value: value > 0,
+    'min_income_multiplier': lambda value: 0 <= value <= 1,
+    'cash_buffer_years': lambda value: value >= 0,
+    'stocks_allocation': lambda value: 0 <= value <= 1
+    }
+SENSITIVITY_METRICS = ('success_rate','median_final_value')
+
+def get_deltas(parameters, deltas):
+    """
+    pairs every parameter with its delta and checks both
+
+    Parameters:
+        parameters: list of str
+            parameters to perturb, from SENSITIVITY_PARAMETERS
+
+        deltas: dict or list of float
+            step of each parameter, as a dict keyed by parameter or a list in the order of parameters
+
+    Returns:
+        deltas: dict of parameter to delta
+    """
+    parameters = list(parameters)
+    for parameter in parameters:
+        if parameter not in SENSITIVITY_PARAMETERS:
+            raise ValueError(f"parameters should be among {', '.join(SENSITIVITY_PARAMETERS)}. received '{parameter}'")
+    if isinstance(deltas, dict):
+        missing = [parameter for parameter in parameters if parameter not in deltas]
+        if len(missing) > 0:
+            raise ValueError(f"deltas should have a delta for every parameter. missing '{missing[0]}'")
+        deltas = {parameter: deltas[parameter] for parameter in parameters}
+    else:
+        deltas = list(deltas)
+        if len(deltas) != len(parameters):
+            raise ValueError(f"deltas should have one delta per parameter. received {len(deltas)} deltas for {len(parameters)} parameters")
+        deltas = dict(zip(parameters, deltas))
+
+    for parameter, delta in deltas.items():
+        if parameter == 'cash_buffer_years':
+            if isinstance(delta, bool) or not isinstance(delta, (int, np.integer)) or delta < 1:
+                raise ValueError(f"delta for cash_buffer_years should be an int of at least one. received '{delta}'")
+        elif not delta > 0:
+            raise ValueError(f"delta for {parameter} should be greater than zero. received '{delta}'")
+    return(deltas)
+
+def get_base_value(config, parameter):
+    """
+    returns the value of parameter in config. stocks_allocation is the normalised stock share
+    """
+    if parameter == 'stocks_allocation':
+        return(float(normalise_allocation(config['portfolio_allocation'])[PORTFOLIO_ASSETS.index('stocks')]))
+    return(config[parameter])
+
+def perturb_config(config, parameter, value):
+    """
+    returns a copy of config with parameter set to value
+
+    for stocks_allocation, value is the stock share of the normalised allocation and
+    the other assets are scaled to fill the remainder in their existing proportions
+    """
+    config = dict(config)
+    if parameter != 'stocks_allocation':
+        config[parameter] = value
+        return(config)
+
+    allocation = dict(zip(PORTFOLIO_ASSETS, normalise_allocation(config['portfolio_allocation'])))
+    others = [asset for asset in PORTFOLIO_ASSETS if asset != 'stocks']
+    other_total = sum(allocation[asset] for asset in others)
+    for asset in others:
+        if other_total > 0:
+            allocation[asset] = allocation[asset] / other_total * (1 - value)
+        else:
+            allocation[asset] = (1 - value) / len(others)
+    allocation['stocks'] = value
+    config['portfolio_allocation'] = allocation
+    return(config)
+
+def summarise_kernel_results(results, simulation_length_years):
+    """
+    returns the sensitivity metrics of one config's run_kernel results
+    """
+    if len(results['final_value']) == 0:
+        return({metric: np.nan for metric in SENSITIVITY_METRICS})
+    return({
+        'success_rate': float(np.mean(results['survival_duration'] >= simulation_length_years)),
+        'median_final_value': float(np.median(results['final_value']))
+        })
+
+def run_sensitivity(historical_data, config, parameters, deltas):
+    """
+    estimates how success rate and median final value respond to small changes in parameters
+
+    each parameter is moved down and up by its delta and the partial effect is the
+    central finite difference (upper - lower) / (upper_value - lower_value). when a
+    perturbed value is not valid, e.g. max_withdrawal_rate above one, the base value is used
+    in its place, giving a one sided difference
+
+    window arrays are built once, and the base config and every distinct perturbed
+    config run together in one run_config_kernel pass
+
+    Parameters:
+        historical_data: data frame
+            monthly historical asset prices
+
+        config: dict
+            Simulator config with starting_portfolio_value, desired_annual_income, inflation,
+            min_income_multiplier, max_withdrawal_rate, simulation_length_years,
+            portfolio_allocation, cash_buffer_years
+
+        parameters: list of str
+            parameters to perturb, from SENSITIVITY_PARAMETERS
+
+        deltas: dict or list of float
+            step of each parameter. steps of cash_buffer_years are whole years
+
+    Returns:
+        sensitivity: data frame
+            one row per parameter and metric with columns parameter, metric, base_value,
+            delta, lower_value, upper_value, base, lower, upper, partial_effect
+    """
+    deltas = get_deltas(parameters, deltas)
+    simulation_length_years = int(config['simulation_length_years'])
+    prices, years, months = build_window_arrays(historical_data, simulation_length_years)
+
+    def get_key(point_config):
+        return((
+            point_config['desired_annual_income'], point_config['inflation'], point_config['min_income_multiplier'],
+            point_config['max_withdrawal_rate'], point_config['cash_buffer_years'],
+            tuple(normalise_allocation(point_config['portfolio_allocation']))
+            ))
+
+    points = {get_key(config): config}
+    perturbations = {}
+    for parameter, delta in deltas.items():
+        base_value = get_base_value(config, parameter)
+        is_valid = SENSITIVITY_PARAMETERS[parameter]
+        lower_value = base_value - delta if is_valid(base_value - delta) else base_value
+        upper_value = base_value + delta if is_valid(base_value + delta) else base_value
+        lower_config = perturb_config(config, parameter, lower_value)
+        upper_config = perturb_config(config, parameter, upper_value)
+        points.setdefault(get_key(lower_config), lower_config)
+        points.setdefault(get_key(upper_config), upper_config)
+        perturbations[parameter] = (base_value, lower_value, upper_value, get_key(lower_config), get_key(upper_config))
+
+    results = run_config_kernel(prices, **get_config_arrays(list(points.values()), simulation_length_years))
+    metrics = {
+        key: summarise_kernel_results({
+            'final_value': results['final_value'][n],
+            'survival_duration': results['survival_duration'][n]
+            }, simulation_length_years)
+        for n, key in enumerate(points)
+        }
+
+    base = metrics[get_key(config)]
+    rows = []
+    for parameter, delta in deltas.items():
+        base_value, lower_value, upper_value, lower_key, upper_key = perturbations[parameter]
+        lower, upper = metrics[lower_key], metrics[upper_key]
+        for metric in SENSITIVITY_METRICS:
+            step = upper_value - lower_value
+            rows.append({
+                'parameter': parameter,
+                'metric': metric,
+                'base_value': base_value,
+                'delta': delta,
+                'lower_value': lower_value,
+                'upper_value': upper_value,
+                'base': base[metric],
+                'lower': lower[metric],
+                'upper': upper[metric],
+                'partial_effect': (upper[metric] - lower[metric]) / step if step != 0 else np.nan
+                })
+    return(pd.DataFrame(rows, columns=['parameter','metric','base_value','delta','lower_value',
+        'upper_value','base','lower','upper','partial_effect']))
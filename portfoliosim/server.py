@@ -0,0 +1,290 @@
+"""
+local simulation service
+
+    python -m portfoliosim.server HISTORICAL_DATA [--host 127.0.0.1] [--port 8000]
+
+POST /simulate with a JSON Simulator config (without historical_data_source) returns a
+JSON summary of its runs over the server's historical data. GET /stats returns counters
+"""
+import argparse
+import collections
+import concurrent.futures
+import http.server
+import json
+import queue
+import sys
+import threading
+import time
+import pandas as pd
+from .simulator import load_historical_data
+from .validation import validate_configs
+from .batch import run_config_table, summarise_runs
+
+class SimulationServer():
+    """
+    local HTTP/JSON service that coalesces concurrent requests into batched kernel runs
+
+    requests are queued for up to batch_window seconds after the first one arrives,
+    then every distinct config in the queue is validated and run in one pass of batch.run_config_table
+    over window arrays built once per simulation_length_years and kept for the life
+    of the server. summaries are kept in an LRU cache of cache_size configs, so
+    repeated configs are answered without running them again.
+    the server only binds to the host it is given, 127.0.0.1 by default
+    """
+    def __init__(
+        self,
+        historical_data_source,
+        host='127.0.0.1',
+        port=0,
+        batch_window=0.005,
+        max_batch_size=1024,
+        cache_size=4096,
+        request_timeout=60
+        ):
+        """
+        Parameters:
+            historical_data_source: file path or data frame
+                historical asset prices every request is simulated over
+
+            host: str, default '127.0.0.1'
+                address to bind to
+
+            port: int, default 0
+                port to bind to. 0 picks a free port, see get_url
+
+            batch_window: float, default 0.005
+                seconds to wait for more requests after the first one of a batch
+
+            max_batch_size: int, default 1024
+                requests run in a single batch at most
+
+            cache_size: int, default 4096
+                summaries kept in the LRU cache. 0 disables caching
+
+            request_timeout: float, default 60
+                seconds a request waits for its batch before it is answered with 504
+        """
+        if not batch_window >= 0:
+            raise ValueError(f"batch_window should be at least zero. received '{batch_window}'")
+        if not request_timeout > 0:
+            raise ValueError(f"request_timeout should be greater than zero. received '{request_timeout}'")
+        for name, value, minimum in (('max_batch_size', max_batch_size, 1), ('cache_size', cache_size, 0)):
+            if isinstance(value, bool) or not isinstance(value, int) or value < minimum:
+                raise ValueError(f"{name} should be an int of at least {'one' if minimum == 1 else 'zero'}. received '{value}'")
+
+        self.__historical_data = load_historical_data(historical_data_source)
+        self.__batch_window = batch_window
+        self.__max_batch_size = max_batch_size
+        self.__cache_size = cache_size
+        self.__request_timeout = request_timeout
+        self.__cache = collections.OrderedDict()
+        self.__window_arrays = {}
+        self.__lock = threading.Lock()
+        self.__queue = queue.Queue()
+        self.__stats = {'requests': 0, 'cache_hits': 0, 'batches': 0, 'configs_run': 0}
+
+        self.__http_server = _SimulationHTTPServer((host, port), _SimulationRequestHandler)
+        self.__http_server.simulation_server = self
+        self.__threads = []
+
+    def get_url(self):
+        host, port = self.__http_server.server_address[:2]
+        return(f'http://{host}:{port}')
+
+    def get_stats(self):
+        with self.__lock:
+            return(dict(self.__stats))
+
+    def start(self):
+        """
+        starts the HTTP and batching threads in the background
+        """
+        self.__threads = [
+            threading.Thread(target=self.__http_server.serve_forever, name='portfoliosim-server-http', daemon=True),
+            threading.Thread(target=self.__batch_loop, name='portfoliosim-server-batches', daemon=True)
+            ]
+        for thread in self.__threads:
+            thread.start()
+        return(self)
+
+    def stop(self):
+        """
+        stops serving and waits for the background threads
+        """
+        self.__http_server.shutdown()
+        self.__queue.put(None)
+        for thread in self.__threads:
+            thread.join()
+        self.__http_server.server_close()
+
+    def __enter__(self):
+        return(self.start())
+
+    def __exit__(self, *exc_info):
+        self.stop()
+
+    def simulate(self, config):
+        """
+        returns the summary of a config, running it in the next batch unless it is cached
+
+        called by the request handler threads. blocks until the batch has run,
+        raising TimeoutError after request_timeout seconds
+
+        Parameters:
+            config: dict
+                Simulator config without historical_data_source
+
+        Returns:
+            summary: dict with runs, success_rate, median_final_value, mean_survival_duration
+        """
+        if not isinstance(config, dict):
+            raise ValueError(f"request should be a JSON object holding a Simulator config. received '{config}'")
+        if 'historical_data_source' in config:
+            raise ValueError('historical_data_source is set by the server and should not be sent')
+        key = json.dumps(config, sort_keys=True)
+
+        with self.__lock:
+            self.__stats['requests'] += 1
+            if key in self.__cache:
+                self.__cache.move_to_end(key)
+                self.__stats['cache_hits'] += 1
+                return(dict(self.__cache[key]))
+
+        future = concurrent.futures.Future()
+        self.__queue.put((key, config, future))
+        try:
+            return(dict(future.result(timeout=self.__request_timeout)))
+        except concurrent.futures.TimeoutError:
+            # the batch still resolves the future and caches the summary when it finishes
+            raise TimeoutError(f'simulation did not finish within {self.__request_timeout} seconds')
+
+    def __batch_loop(self):
+        while True:
+            item = self.__queue.get()
+            if item is None:
+                return
+            batch = [item]
+            deadline = time.monotonic() + self.__batch_window
+            while len(batch) < self.__max_batch_size:
+                try:
+                    item = self.__queue.get(timeout=max(deadline - time.monotonic(), 0))
+                except queue.Empty:
+                    break
+                if item is None:
+                    self.__queue.put(None)
+                    break
+                batch.append(item)
+            self.__run_batch(batch)
+
+    def __run_batch(self, batch):
+        """
+        runs the distinct configs of a batch together and resolves every request's future
+        """
+        futures = collections.defaultdict(list)
+        configs = {}
+        for key, config, future in batch:
+            futures[key].append(future)
+            configs[key] = config
+        keys = list(configs)
+
+        try:
+            # the whole batch is validated in one vectorized pass, invalid configs fail on their own
+            valid_configs, errors = validate_configs([configs[key] for key in keys])
+            for row, messages in errors.groupby('row')['message']:
+                for future in futures.pop(keys[row]):
+                    future.set_exception(ValueError('. '.join(messages)))
+            valid_configs['historical_data_source'] = pd.Series([self.__historical_data]*len(valid_configs), index=valid_configs.index, dtype='object')
+            summary = summarise_runs(run_config_table(valid_configs, self.__window_arrays)).reindex(valid_configs.index)
+        except Exception as e:
+            for key in futures:
+                for future in futures[key]:
+                    future.set_exception(e)
+            return
+        keys = {row: keys[row] for row in valid_configs.index}
+
+        with self.__lock:
+            self.__stats['batches'] += 1
+            self.__stats['configs_run'] += len(keys)
+            for row, key in keys.items():
+                result = {
+                    'runs': int(summary.at[row,'runs']) if pd.notna(summary.at[row,'runs']) else 0,
+                    'success_rate': _to_json_float(summary.at[row,'success_rate']),
+                    'median_final_value': _to_json_float(summary.at[row,'median_final_value']),
+                    'mean_survival_duration': _to_json_float(summary.at[row,'mean_survival_duration'])
+                    }
+                if self.__cache_size > 0:
+                    self.__cache[key] = result
+                    self.__cache.move_to_end(key)
+                    while len(self.__cache) > self.__cache_size:
+                        self.__cache.popitem(last=False)
+                for future in futures[key]:
+                    future.set_result(result)
+
+def _to_json_float(value):
+    return(None if pd.isna(value) else float(value))
+
+class _SimulationHTTPServer(http.server.ThreadingHTTPServer):
+    # bursts of concurrent clients are expected, so allow a longer accept backlog than the default of 5
+    request_queue_size = 256
+    daemon_threads = True
+
+class _SimulationRequestHandler(http.server.BaseHTTPRequestHandler):
+    """
+    routes HTTP requests to the SimulationServer the HTTP server belongs to
+    """
+    def __send_json(self, status, body):
+        payload = json.dumps(body).encode()
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def do_GET(self):
+        if self.path == '/stats':
+            self.__send_json(200, self.server.simulation_server.get_stats())
+        else:
+            self.__send_json(404, {'error': f"unknown path '{self.path}'"})
+
+    def do_POST(self):
+        if self.path != '/simulate':
+            self.__send_json(404, {'error': f"unknown path '{self.path}'"})
+            return
+        try:
+            config = json.loads(self.rfile.read(int(self.headers.get('Content-Length', 0))))
+            self.__send_json(200, self.server.simulation_server.simulate(config))
+        except (ValueError, TypeError) as e:
+            self.__send_json(400, {'error': str(e)})
+        except TimeoutError as e:
+            self.__send_json(504, {'error': str(e)})
+        except Exception as e:
+            self.__send_json(500, {'error': str(e)})
+
+    def log_message(self, format, *args):
+        pass
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        prog='python -m portfoliosim.server',
+        description='serve simulation summaries over HTTP/JSON, batching concurrent requests'
+        )
+    parser.add_argument('historical_data', help='csv of monthly historical asset prices')
+    parser.add_argument('--host', default='127.0.0.1', help='address to bind to (default 127.0.0.1)')
+    parser.add_argument('--port', type=int, default=8000, help='port to bind to (default 8000)')
+    parser.add_argument('--batch-window', type=float, default=0.005,
+        help='seconds to wait for more requests before running a batch (default 0.005)')
+    parser.add_argument('--request-timeout', type=float, default=60,
+        help='seconds a request waits for its simulation before failing with 504 (default 60)')
+    args = parser.parse_args(argv)
+
+    server = SimulationServer(args.historical_data, args.host, args.port, args.batch_window, request_timeout=args.request_timeout).start()
+    print(f'serving on {server.get_url()}')
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        server.stop()
+    return(0)
+
+if __name__ == '__main__':
+    sys.exit(main())
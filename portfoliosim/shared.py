@@ -0,0 +1,68 @@
+import numpy as np
+from multiprocessing import shared_memory
+
+# arrays attached by this process, keyed by shared memory name
+# workers attach once and reuse the mapping for every batch they run
+_attached_arrays = {}
+
+class SharedArray():
+    """
+    numpy array published once through multiprocessing.shared_memory
+
+    the publishing process owns the block and must call unlink once workers are done.
+    other processes attach to it by name using the picklable descriptor
+    """
+    def __init__(self, array):
+        """
+        copies array into a new shared memory block
+
+        Parameters:
+            array: numpy array
+                array to publish. copied once into shared memory
+        """
+        array = np.ascontiguousarray(array)
+        self.__shm = shared_memory.SharedMemory(create=True, size=max(array.nbytes,1))
+        self.__array = np.ndarray(array.shape, dtype=array.dtype, buffer=self.__shm.buf)
+        self.__array[...] = array
+
+    def get_array(self):
+        return(self.__array)
+
+    def get_descriptor(self):
+        """
+        returns picklable (name, shape, dtype) tuple used by other processes to attach
+        """
+        return((self.__shm.name, self.__array.shape, self.__array.dtype.str))
+
+    def close(self):
+        """
+        releases the shared memory block. the block is removed once every process closed it
+        """
+        self.__array = None
+        self.__shm.close()
+        self.__shm.unlink()
+
+    def __enter__(self):
+        return(self)
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+def attach_shared_array(descriptor):
+    """
+    attaches to an array published by SharedArray without copying it
+
+    Parameters:
+        descriptor: tuple
+            (name, shape, dtype) as returned by SharedArray.get_descriptor
+
+    Returns:
+        array: read only numpy array backed by the shared memory block
+    """
+    name, shape, dtype = descriptor
+    if name not in _attached_arrays:
+        shm = shared_memory.SharedMemory(name=name)
+        array = np.ndarray(shape, dtype=dtype, buffer=shm.buf)
+        array.flags.writeable = False
+        _attached_arrays[name] = (shm, array)
+    return(_attached_arrays[name][1])
@@ -1,5 +1,47 @@
+import numpy as np
 import pandas as pd
 import random
+from .kernel import PORTFOLIO_ASSETS
+
+# layout of the timestep buffer of a Simulation, one record per year of the simulation
+TIMESTEP_DTYPE = np.dtype([
+    ('timestep', 'int64'),
+    ('year', 'int64'),
+    ('month', 'int64'),
+    ('cash_buffer', 'float64'),
+    ('bonds_qty', 'float64'),
+    ('stocks_qty', 'float64'),
+    ('gold_qty', 'float64'),
+    ('bonds_value', 'float64'),
+    ('stocks_value', 'float64'),
+    ('gold_value', 'float64'),
+    ('cash_notional', 'float64'),
+    ('allowance', 'float64'),
+    ('desired_allowance', 'float64'),
+    ('failed', 'bool')
+    ])
+
+def slice_time_frame(historical_data,start,simulation_length_years):
+    """
+    slice the time frame used by a single simulation out of historical data
+
+    Parameters:
+        historical_data: data frame
+            data frame containing monthly historical asset prices
+
+        start: int
+            row of historical_data the time frame starts at
+
+        simulation_length_years: int
+            length of the simulation in years
+
+    Returns:
+        time_frame: data frame containing 1 row per year, starting at row start
+    """
+    df = historical_data[start:(start+12*simulation_length_years)]
+    df = df[::12]
+    df.reset_index(inplace=True,drop=True)
+    return(df)
 
 class Simulation():
     def __init__(
@@ -66,22 +108,9 @@ class Simulation():
         #     'desired_allowance':pd.Series([], dtype='float'),
         #     'failed':pd.Series([], dtype='boolean')
         #     })
-        self.__run_timestep_data = {
-            'timestep': [],
-            'year': [],
-            'month': [],
-            'cash_buffer': [],
-            'bonds_qty': [],
-            'stocks_qty': [],
-            'gold_qty': [],
-            'bonds_value': [],
-            'stocks_value': [],
-            'gold_value': [],
-            'cash_notional': [],
-            'allowance': [],
-            'desired_allowance': [],
-            'failed': []
-            }
+        # timestep buffer is allocated once the length of the simulation is known
+        self.__run_timestep_data = np.zeros(0, dtype=TIMESTEP_DTYPE)
+        self.__logged_timesteps = 0
 
         # normalise portfolio_allocation so that they total up to 1
         portfolio_allocation = self.__normalise_portfolio_allocation(portfolio_allocation)
@@ -91,11 +120,22 @@ class Simulation():
         self.__income_schedule = income_schedule
         self.__max_withdrawal_rate = max_withdrawal_rate
         self.__income_schedule = income_schedule
-        self.__current_prices = income_schedule.iloc[0]
+        self.__desired_income = income_schedule['desired_income'].to_numpy(dtype='float64').tolist()
+        self.__min_income = income_schedule['min_income'].to_numpy(dtype='float64').tolist()
+        self.__load_price_arrays(historical_data_subset)
+        self.__current_timestep = 0
+        self.__current_price_values = [1.0]*len(PORTFOLIO_ASSETS)
         self.__portfolio_allocation = portfolio_allocation
         self.__cash_buffer_years = cash_buffer_years
+        self.__starting_portfolio_value = starting_portfolio_value
         self.__allowance = 0
         self.__failed = False
+
+        # desired cash buffer only depends on the income schedule, so it is the same for every time frame
+        self.__desired_cash_buffers = [
+            self.__get_desired_cash_buffer(income_schedule,cash_buffer_years,i)
+            for i in range(len(income_schedule))
+            ]
         
         self.__initialise_portfolio_cash_buffer(
             starting_portfolio_value,
@@ -104,16 +144,41 @@ class Simulation():
             income_schedule,
             historical_data_subset
             )
+        self.__initial_cash_buffer = self.__cash_buffer
+        self.__allocate_timestep_data()
+
+    def reset(self,historical_data_subset):
+        """
+        prepares the simulation to run again over a different time frame
+
+        the normalised allocation, income schedule and desired cash buffers are kept,
+        so only the portfolio needs allocating at the new prices
+
+        Parameters:
+            historical_data_subset: data frame
+                time frame to simulate, in the same format as when the simulation was created
+        """
+        # a new buffer, so that frames returned by an earlier run are not overwritten
+        self.__allocate_timestep_data()
+        self.__historical_data_subset = historical_data_subset
+        self.__load_price_arrays(historical_data_subset)
+        self.__allowance = 0
+        self.__failed = False
+        self.__cash_buffer = self.__initial_cash_buffer
+        self.__initialise_portfolio(
+            self.__starting_portfolio_value,
+            self.__portfolio_allocation,
+            historical_data_subset
+            )
 
     def __normalise_portfolio_allocation(self,portfolio_allocation):
         """
         normalises portfolio allocation to sum to 1
+
+        returns a new dict, the caller's portfolio_allocation is left untouched
         """
         base = sum(portfolio_allocation.values())       
-        for asset,allocation in portfolio_allocation.items():
-            portfolio_allocation[asset] = allocation/base
-        
-        return(portfolio_allocation)
+        return({asset: allocation/base for asset,allocation in portfolio_allocation.items()})
 
     def __initialise_portfolio_cash_buffer(
         self,
@@ -145,6 +210,29 @@ class Simulation():
             )
         
 
+    def __load_price_arrays(self,historical_data_subset):
+        """
+        converts the time frame to contiguous arrays once, so that every timestep
+        only needs plain indexing instead of pandas lookups
+
+        prices are held in PORTFOLIO_ASSETS order. assets missing from the time frame
+        and cash are priced at 1
+        """
+        prices = np.ones((len(historical_data_subset), len(PORTFOLIO_ASSETS)), dtype='float64')
+        for n, asset in enumerate(PORTFOLIO_ASSETS):
+            if asset in historical_data_subset.columns:
+                prices[:,n] = historical_data_subset[asset].to_numpy(dtype='float64')
+        self.__prices = prices
+        self.__years = historical_data_subset['year'].to_numpy(dtype='int64')
+        self.__months = historical_data_subset['month'].to_numpy(dtype='int64')
+
+    def __allocate_timestep_data(self):
+        """
+        allocates an empty timestep buffer with one record per year of the income schedule
+        """
+        self.__run_timestep_data = np.zeros(len(self.__income_schedule), dtype=TIMESTEP_DTYPE)
+        self.__logged_timesteps = 0
+
     def get_portfolio(self):
         return(self.__portfolio)
 
@@ -155,7 +243,10 @@ class Simulation():
         return(self.__cash_buffer)
 
     def get_current_prices(self):
-        return(self.__current_prices)
+        """
+        returns the historical data row of the current timestep
+        """
+        return(self.__historical_data_subset.iloc[self.__current_timestep])
 
     def get_max_withdrawal_rate(self):
         return(self.__max_withdrawal_rate)
@@ -170,7 +261,10 @@ class Simulation():
         return(self.__failed)
     
     def get_timestep_data(self):
-        return(self.__run_timestep_data)
+        """
+        returns the timesteps logged so far as a structured array with TIMESTEP_DTYPE layout
+        """
+        return(self.__run_timestep_data[:self.__logged_timesteps])
 
     def get_historical_data(self):
         return(self.__historical_data_subset)
@@ -233,28 +327,39 @@ class Simulation():
             allocatable_value = starting_portfolio_value - self.get_cash_buffer()
 
         # set portfolio to all cash initially
-        self.__portfolio = {
-            'stocks' : 0.0,
-            'gold' : 0.0,
-            'bonds' : 0.0,
-            'cash' : float(allocatable_value)
-            }
-
-        # allocate portfolio
-        self.allocate_portfolio(portfolio_allocation,historical_data_subset.iloc[0])
+        # the portfolio dict is reused when the simulation is reset
+        if not hasattr(self,'_Simulation__portfolio'):
+            self.__portfolio = {}
+        self.__portfolio['stocks'] = 0.0
+        self.__portfolio['gold'] = 0.0
+        self.__portfolio['bonds'] = 0.0
+        self.__portfolio['cash'] = float(allocatable_value)
 
         # set initial prices
         self.update_prices(0)
 
-    def allocate_portfolio(self,portfolio_allocation,current_prices):
+        # allocate portfolio
+        self.allocate_portfolio(portfolio_allocation)
+
+    def allocate_portfolio(self,portfolio_allocation,current_prices=None):
         """
         allocate portfolio based on desired allocation and current prices
+
+        Parameters:
+            portfolio_allocation: dict
+                normalised allocation among asset classes
+
+            current_prices: dict-like, default None
+                prices to allocate at. prices of the current timestep by default
         """
+        if current_prices is None:
+            prices = self.__current_price_values
+        else:
+            prices = [current_prices.get(asset,1) for asset in PORTFOLIO_ASSETS]
 
         value_to_allocate = self._get_portfolio_value()
 
-        for asset,value in self.__portfolio.items():
-            asset_price = current_prices.get(asset,1)
+        for asset,asset_price in zip(PORTFOLIO_ASSETS,prices):
             allocation_proportion = portfolio_allocation[asset]
             self.__portfolio[asset] = value_to_allocate * allocation_proportion / asset_price
 
@@ -279,21 +384,9 @@ class Simulation():
         # add randomised run id to results
         run_id = random.randint(10**12, 10**13 - 1)
         timestep_data = self.get_timestep_data()
-        timestep_data = pd.DataFrame({ ##
-            'timestep':pd.Series(self.__run_timestep_data['timestep'], dtype='int'),
-            'year':pd.Series(self.__run_timestep_data['year'], dtype='int'),
-            'month':pd.Series(self.__run_timestep_data['month'], dtype='int'),
-            'cash_buffer':pd.Series(self.__run_timestep_data['cash_buffer'], dtype='float'),
-            'bonds_qty':pd.Series(self.__run_timestep_data['bonds_qty'], dtype='float'),
-            'stocks_qty':pd.Series(self.__run_timestep_data['stocks_qty'], dtype='float'),
-            'gold_qty':pd.Series(self.__run_timestep_data['gold_qty'], dtype='float'),
-            'bonds_value':pd.Series(self.__run_timestep_data['bonds_value'], dtype='float'),
-            'stocks_value':pd.Series(self.__run_timestep_data['stocks_value'], dtype='float'),
-            'gold_value':pd.Series(self.__run_timestep_data['gold_value'], dtype='float'),
-            'cash_notional':pd.Series(self.__run_timestep_data['cash_notional'], dtype='float'),
-            'allowance':pd.Series(self.__run_timestep_data['allowance'], dtype='float'),
-            'desired_allowance':pd.Series(self.__run_timestep_data['desired_allowance'], dtype='float'),
-            'failed':pd.Series(self.__run_timestep_data['failed'], dtype='boolean')
+        timestep_data = pd.DataFrame({
+            name: pd.Series(timestep_data[name], dtype='boolean' if name == 'failed' else None, copy=False)
+            for name in TIMESTEP_DTYPE.names
             })
         timestep_data['run_id'] = run_id
         run_results['run_id'] = run_id
@@ -301,11 +394,11 @@ class Simulation():
         return(run_results,timestep_data)
 
     def get_survival_duration(self):
-        failed_list = self.get_timestep_data()['failed']
-        if True not in failed_list:
-            return(len(failed_list))
+        failed = self.get_timestep_data()['failed']
+        if not failed.any():
+            return(len(failed))
         else:
-            return(failed_list.index(True))
+            return(int(failed.argmax()))
         # df = self.get_timestep_data()
         # if df[df['failed']==True].empty:
         #     return(len(df))
@@ -331,8 +424,8 @@ class Simulation():
         """
         update prices based on the current timestep
         """
-        self.__current_prices = self.__historical_data_subset.iloc[timestep_number]
-        pass
+        self.__current_timestep = timestep_number
+        self.__current_price_values = self.__prices[timestep_number].tolist()
 
     def execute_strategy(self,timestep_number):
         """
@@ -347,22 +440,14 @@ class Simulation():
         if desired_allowance <= withdrawal_limit:
             self._withdraw_allowance_from_portfolio(desired_allowance)
             if self._check_remaining_withdrawal_amount_can_refill_buffer(
-                    self.__get_desired_cash_buffer(
-                        self.get_income_schedule(),
-                        self.get_cash_buffer_years(),
-                        timestep_number
-                        ),
+                    self.__desired_cash_buffers[timestep_number],
                     self.get_cash_buffer(),
                     withdrawal_limit,
                     desired_allowance
                     ) == True:
                 # outcome 01
                 self._top_up_cash_buffer_from_portfolio(
-                    self.__get_desired_cash_buffer(
-                        self.get_income_schedule(),
-                        self.get_cash_buffer_years(),
-                        timestep_number
-                        ) 
+                    self.__desired_cash_buffers[timestep_number]
                         - self.get_cash_buffer()
                     )
             else:
@@ -396,7 +481,7 @@ class Simulation():
                 self._withdraw_allowance_from_portfolio(
                     min_allowance - self.get_allowance()
                     )
-        self.allocate_portfolio(self.__portfolio_allocation,self.__current_prices)
+        self.allocate_portfolio(self.__portfolio_allocation)
 
         if self._get_portfolio_value() <= 0:
             self.__failed = True
@@ -415,7 +500,7 @@ class Simulation():
                 desired_allowance for this year of the simulation
         """
 
-        return(self.__income_schedule.iloc[timestep]['desired_income'])
+        return(self.__desired_income[timestep])
 
     def _get_min_income(self,timestep):
         """
@@ -430,14 +515,14 @@ class Simulation():
                 min_income for this year of the simulation
         """
 
-        return(self.__income_schedule.iloc[timestep]['min_income'])
+        return(self.__min_income[timestep])
     
     def _get_portfolio_value(self):
         """
         retrieve the current value of the portfolio based on holdings
-        in self.__portfolio and prices in self.__current_prices
+        in self.__portfolio and prices of the current timestep
         """
-        return(sum([self.__current_prices.get(key,1) * value for key,value in self.get_portfolio().items()]))
+        return(sum([price * value for price,value in zip(self.__current_price_values,self.__portfolio.values())]))
 
     def _get_withdrawal_limit(self):
         """
@@ -538,18 +623,23 @@ class Simulation():
         #         }),
         #     ignore_index=True
         #     )
-        self.__run_timestep_data['timestep'].append(timestep+1)
-        self.__run_timestep_data['year'].append(self.get_current_prices()['year'])
-        self.__run_timestep_data['month'].append(self.get_current_prices()['month'])
-        self.__run_timestep_data['cash_buffer'].append(self.get_cash_buffer())
-        self.__run_timestep_data['bonds_qty'].append(self.get_portfolio()['bonds'])
-        self.__run_timestep_data['stocks_qty'].append(self.get_portfolio()['stocks'])
-        self.__run_timestep_data['gold_qty'].append(self.get_portfolio()['gold'])
-        self.__run_timestep_data['bonds_value'].append(self.get_portfolio()['bonds'] * self.get_current_prices()['bonds'])
-        self.__run_timestep_data['stocks_value'].append(self.get_portfolio()['stocks'] * self.get_current_prices()['stocks'])
-        self.__run_timestep_data['gold_value'].append(self.get_portfolio()['gold'] * self.get_current_prices()['gold'])
-        self.__run_timestep_data['cash_notional'].append(self.get_portfolio()['cash'])
-        self.__run_timestep_data['allowance'].append(self.get_allowance())
-        self.__run_timestep_data['desired_allowance'].append(self._get_desired_allowance(timestep))
-        self.__run_timestep_data['failed'].append(self.get_failed_status())
+        stocks_price, gold_price, bonds_price, cash_price = self.__current_price_values
+        portfolio = self.get_portfolio()
+        self.__run_timestep_data[timestep] = (
+            timestep+1,
+            self.__years[self.__current_timestep],
+            self.__months[self.__current_timestep],
+            self.get_cash_buffer(),
+            portfolio['bonds'],
+            portfolio['stocks'],
+            portfolio['gold'],
+            portfolio['bonds'] * bonds_price,
+            portfolio['stocks'] * stocks_price,
+            portfolio['gold'] * gold_price,
+            portfolio['cash'],
+            self.get_allowance(),
+            self._get_desired_allowance(timestep),
+            self.get_failed_status()
+            )
+        self.__logged_timesteps = max(self.__logged_timesteps, timestep+1)
         
@@ -1,9 +1,46 @@
+import numpy as np
 import pandas as pd
-from .simulation import Simulation
+from .simulation import Simulation, slice_time_frame
+from .parallel import iter_windows_in_pool
+from .results import write_timestep_columns, ChunkedResults
+from .kernel import build_window_arrays, normalise_allocation, run_kernel, kernel_results_to_frames
+from .compact import compact_timestep_data, empty_compact_timestep_data, expand_timestep_data, get_timestep_row_bytes
+from .spill import TimestepSpill
+from .asynchronous import aiter_time_frame_ranges, get_time_frame_ranges
+from .estimate import estimate_run, check_estimate
+from .datasets import write_dataset, write_dataset_reference
+from .sensitivity import run_sensitivity
+from .scenarios import run_scenarios
+from .paths import run_parametric
+from .optimise import optimise_allocation
 import pathlib
 import datetime
+import tempfile
+import shutil
 import time
-import progressbar
+import weakref
+
+# time frames per batch yielded by the serial engine when no batch size is given
+DEFAULT_RUN_BATCH_SIZE = 1000
+
+def load_historical_data(historical_data_source):
+    """
+    loads historical data from a csv file, or passes a data frame through unchanged
+
+    args:
+        historical_data_source: file path to historical income data csv, or data frame
+
+    returns:
+        data frame of historical data
+    """
+    if str(type(historical_data_source)) == "<class 'pandas.core.frame.DataFrame'>":
+        historical_data = historical_data_source
+    else:
+        historical_data = pd.read_csv(historical_data_source)
+        for column in historical_data.columns:
+            if column not in ['year','month']:
+                historical_data[column] = pd.to_numeric(historical_data[column])
+    return(historical_data)
 
 class Simulator():
     """
@@ -25,6 +62,11 @@ class Simulator():
             'cash' : 0.0
             },
         cash_buffer_years=0,
+        timestep_recording='full',
+        workers=1,
+        engine='reference',
+        memory_limit=None,
+        spill_directory=None,
         **simulation_cofig
         ):
         """
@@ -76,6 +118,30 @@ class Simulator():
             
             portfolio_allocation: dict, default {'stocks' : 0.6,'bonds' : 0.4,'gold' : 0.0,'cash' : 0.0}
                 portfolio allocation among asset classes
+
+            timestep_recording: str, default 'full'
+                layout used to store timestep data
+                'full' stores simulator_id and run_id on every row with 64 bit columns
+                'compact' stores a run_index pointing into run_results instead of the ids,
+                with int16/int8 time columns and float32 values
+
+            workers: int, default 1
+                number of worker processes used to run simulations. must be at least 1
+                with more than 1 worker, historical data and the income schedule are shared
+                with the workers through shared memory instead of being copied to each of them
+
+            engine: str, default 'reference'
+                'reference' runs one Simulation object per time frame
+                'vectorized' runs all time frames together on numpy arrays. only supports 1 worker
+
+            memory_limit: int, default None
+                bytes of timestep data to hold in memory while running. once passed, finished
+                time frames are spilled to columnar chunks on disk and timestep data becomes a
+                results.ChunkedResults view over them. None keeps everything in memory
+
+            spill_directory: folder path, default None
+                folder spilled chunks are written to, in a subfolder named after the simulator_id.
+                by default a new temporary folder, removed when the simulator is garbage collected
             """
         # check validity of config data
         simulation_cofig['starting_portfolio_value']=starting_portfolio_value
@@ -87,6 +153,11 @@ class Simulator():
         simulation_cofig['simulation_length_years']=simulation_length_years
         simulation_cofig['portfolio_allocation']=portfolio_allocation
         simulation_cofig['cash_buffer_years']=cash_buffer_years
+        simulation_cofig['timestep_recording']=timestep_recording
+        simulation_cofig['workers']=workers
+        simulation_cofig['engine']=engine
+        simulation_cofig['memory_limit']=memory_limit
+        simulation_cofig['spill_directory']=spill_directory
         self.__check_config_validity(simulation_cofig)
         
         self.__simulation_config = simulation_cofig
@@ -124,27 +195,34 @@ class Simulator():
             'end_ref_year':pd.Series([], dtype='int'),
             'end_ref_month':pd.Series([], dtype='int'),
             'final_value':pd.Series([], dtype='float'), 
-            'survival_duration':pd.Series([], dtype='int')
+            'survival_duration':pd.Series([], dtype='int'),
+            'run_index':pd.Series([], dtype='int')
             })
         
-        self.__timestep_data = pd.DataFrame({
-            'simulator_id': self.__simulator_id,
-            'run_id':pd.Series([], dtype='int'),
-            'timestep':pd.Series([], dtype='int'),
-            'year':pd.Series([], dtype='int'),
-            'month':pd.Series([], dtype='int'),
-            'cash_buffer':pd.Series([], dtype='float'),
-            'bonds_qty':pd.Series([], dtype='float'),
-            'stocks_qty':pd.Series([], dtype='float'),
-            'gold_qty':pd.Series([], dtype='float'),
-            'bonds_value':pd.Series([], dtype='float'),
-            'stocks_value':pd.Series([], dtype='float'),
-            'gold_value':pd.Series([], dtype='float'),
-            'cash_notional':pd.Series([], dtype='float'),
-            'allowance':pd.Series([], dtype='float'),
-            'desired_allowance':pd.Series([], dtype='float'),
-            'failed':pd.Series([], dtype='boolean')
-            })
+        if timestep_recording == 'compact':
+            self.__timestep_data = empty_compact_timestep_data()
+        else:
+            self.__timestep_data = pd.DataFrame({
+                'simulator_id': self.__simulator_id,
+                'run_id':pd.Series([], dtype='int'),
+                'timestep':pd.Series([], dtype='int'),
+                'year':pd.Series([], dtype='int'),
+                'month':pd.Series([], dtype='int'),
+                'cash_buffer':pd.Series([], dtype='float'),
+                'bonds_qty':pd.Series([], dtype='float'),
+                'stocks_qty':pd.Series([], dtype='float'),
+                'gold_qty':pd.Series([], dtype='float'),
+                'bonds_value':pd.Series([], dtype='float'),
+                'stocks_value':pd.Series([], dtype='float'),
+                'gold_value':pd.Series([], dtype='float'),
+                'cash_notional':pd.Series([], dtype='float'),
+                'allowance':pd.Series([], dtype='float'),
+                'desired_allowance':pd.Series([], dtype='float'),
+                'failed':pd.Series([], dtype='boolean')
+                })
+        # kept as the column template of spilled chunks once timestep data is on disk
+        self.__empty_timestep_data = self.__timestep_data
+        self.__spill_path = None
 
     def __check_config_validity(self,simulation_cofig):
         float_fields = ['desired_annual_income', 'inflation', 'min_income_multiplier','starting_portfolio_value','max_withdrawal_rate']
@@ -163,6 +241,9 @@ class Simulator():
             except ValueError:
                 raise ValueError(f"{i} should be castable to int. received '{simulation_cofig[i]}' of type {type(simulation_cofig[i])}")
         
+        if not isinstance(simulation_cofig['portfolio_allocation'],dict):
+            raise ValueError(f"portfolio_allocation should be a dict of asset to allocation. received '{simulation_cofig['portfolio_allocation']}' of type {type(simulation_cofig['portfolio_allocation'])}")
+
         # check portfolio allocation values are castable to floats
         for key,value in simulation_cofig['portfolio_allocation'].items():
             try:
@@ -206,6 +287,27 @@ class Simulator():
         for i in positive_less_than_equal_to_one_fields:
             if not (0 < simulation_cofig[i] <= 1):
                 raise ValueError(f"{i} should be greater than zero and less than or equal to one. received '{simulation_cofig[i]}'")            
+
+        # check that timestep_recording is a known layout
+        allowed_timestep_recordings = ('full','compact')
+        if simulation_cofig['timestep_recording'] not in allowed_timestep_recordings:
+            raise ValueError(f"timestep_recording should be one of 'full', 'compact'. received '{simulation_cofig['timestep_recording']}'")
+
+        # check that workers is a positive whole number
+        if isinstance(simulation_cofig['workers'],bool) or not isinstance(simulation_cofig['workers'],int) or simulation_cofig['workers'] < 1:
+            raise ValueError(f"workers should be an int of at least one. received '{simulation_cofig['workers']}'")
+
+        # check that engine is known and supports the requested workers
+        allowed_engines = ('reference','vectorized')
+        if simulation_cofig['engine'] not in allowed_engines:
+            raise ValueError(f"engine should be one of 'reference', 'vectorized'. received '{simulation_cofig['engine']}'")
+        if simulation_cofig['engine'] == 'vectorized' and simulation_cofig['workers'] > 1:
+            raise ValueError(f"the vectorized engine runs in a single process. received workers '{simulation_cofig['workers']}'")
+
+        # check that memory_limit is None or a positive number of bytes
+        memory_limit = simulation_cofig['memory_limit']
+        if memory_limit is not None and (isinstance(memory_limit,bool) or not isinstance(memory_limit,int) or memory_limit < 1):
+            raise ValueError(f"memory_limit should be an int of at least one byte or None. received '{memory_limit}'")
                
 
     def __load_historical_data(self,historical_data_source):
@@ -218,14 +320,7 @@ class Simulator():
         returns:
             data frame of historical data
         """
-        if str(type(historical_data_source)) == "<class 'pandas.core.frame.DataFrame'>":
-            historical_data = historical_data_source
-        else:
-            historical_data = pd.read_csv(historical_data_source)
-            for column in historical_data.columns:
-                if column not in ['year','month']:
-                    historical_data[column] = pd.to_numeric(historical_data[column])
-        return(historical_data)
+        return(load_historical_data(historical_data_source))
 
     def __create_income_schedule(
         self,
@@ -276,6 +371,18 @@ class Simulator():
         return(self.__run_results)
     def _get_timestep_data(self):
         return(self.__timestep_data)
+    def _get_expanded_timestep_data(self):
+        """
+        returns timestep data in the full layout regardless of timestep_recording
+
+        spilled timestep data is read back into memory
+        """
+        timestep_data = self.__timestep_data
+        if isinstance(timestep_data,ChunkedResults):
+            timestep_data = timestep_data.to_frame()
+        if self.__simulation_config['timestep_recording'] == 'compact':
+            return(expand_timestep_data(timestep_data,self.__run_results))
+        return(timestep_data)
     def _get_simulator_inputs(self):
         return(self.__simulator_inputs)
     def _get_simulator_inputs_df(self):
@@ -309,6 +416,269 @@ class Simulator():
             **self.__simulation_config
         )
 
+    def iter_runs(self,batch_size=None):
+        """
+        runs the simulations, yielding results batch by batch as the engine produces them
+
+        results are not kept by the simulator, so memory is bounded by the batch size
+        however many time frames are run. batches come in run_index order
+
+        Parameters:
+            batch_size: int, default None
+                time frames per batch. by default the vectorized engine yields a single batch,
+                the process pool 4 batches per worker and the serial engine
+                DEFAULT_RUN_BATCH_SIZE time frames at a time
+
+        Yields:
+            run_results, timestep_data: data frames as in _get_run_results and _get_timestep_data
+        """
+        if batch_size is not None and (isinstance(batch_size,bool) or not isinstance(batch_size,int) or batch_size < 1):
+            raise ValueError(f"batch_size should be an int of at least one or None. received '{batch_size}'")
+        for run_results, timestep_data in self.__iter_run_batches(
+            batch_size=batch_size,
+            historical_data=self.__historical_data,
+            income_schedule=self.__income_schedule,
+            **self.__simulation_config
+            ):
+            run_results['simulator_id'] = self.__simulator_id
+            if self.__simulation_config['timestep_recording'] != 'compact':
+                timestep_data['simulator_id'] = self.__simulator_id
+            yield(run_results,timestep_data)
+
+    def __get_async_batches(self,batch_size):
+        """
+        returns the run spec and the time frame ranges of each batch. the spec is sliced per range before it is sent to executors
+        """
+        if batch_size is not None and (isinstance(batch_size,bool) or not isinstance(batch_size,int) or batch_size < 1):
+            raise ValueError(f"batch_size should be an int of at least one or None. received '{batch_size}'")
+        config = self.__simulation_config
+        number_of_frames = max(len(self.__historical_data) - (12 * config['simulation_length_years']) + 1, 0)
+        if batch_size is None:
+            batch_size = max(number_of_frames,1) if config['engine'] == 'vectorized' else DEFAULT_RUN_BATCH_SIZE
+        spec = {
+            'historical_data': self.__historical_data,
+            'income_schedule': self.__income_schedule,
+            'starting_portfolio_value': config['starting_portfolio_value'],
+            'max_withdrawal_rate': config['max_withdrawal_rate'],
+            'simulation_length_years': config['simulation_length_years'],
+            'portfolio_allocation': dict(config['portfolio_allocation']),
+            'cash_buffer_years': config['cash_buffer_years'],
+            'timestep_recording': config['timestep_recording'],
+            'engine': config['engine']
+            }
+        return(spec,get_time_frame_ranges(number_of_frames,batch_size))
+
+    async def arun(self,executor=None,batch_size=None):
+        """
+        asyncio variant of run_simulations that runs the simulations on an executor without blocking the event loop
+
+        time frames are run in batches, each a separate executor task, so one
+        ProcessPoolExecutor can be shared by many concurrent simulators. cancelling the
+        awaiting task cancels batches that have not started and leaves the simulator's
+        results untouched, removing any chunks it spilled. the workers config is not used, parallelism comes from the executor
+
+        Parameters:
+            executor: concurrent.futures.Executor, default None
+                executor running the batches. the event loop's default thread pool if not given
+
+            batch_size: int, default None
+                time frames per executor task, see iter_runs
+        """
+        spec, ranges = self.__get_async_batches(batch_size)
+        timestep_sink, sink_batch_size = self.__create_timestep_sink(
+            self.__simulation_config['memory_limit'],
+            self.__simulation_config['spill_directory'],
+            self.__simulation_config['timestep_recording'],
+            self.__simulation_config['simulation_length_years']
+            )
+        if timestep_sink is not None and batch_size is None:
+            spec, ranges = self.__get_async_batches(sink_batch_size)
+
+        run_results_list, timestep_data_list = [], []
+        run_index_offset = len(self.__run_results)
+        # without a spill every batch is submitted at once, with one only the next is run ahead
+        prefetch = len(ranges) if timestep_sink is None else 1
+        batches = aiter_time_frame_ranges(spec,ranges,executor,prefetch)
+        try:
+            async for run_results, timestep_data in batches:
+                self.__offset_run_index(run_results,timestep_data,run_index_offset)
+                run_results_list.append(run_results)
+                if timestep_sink is not None:
+                    timestep_sink.add(timestep_data)
+                else:
+                    timestep_data_list.append(timestep_data)
+        except BaseException:
+            # a cancelled or failed run leaves no chunks behind, see run_simulations
+            if timestep_sink is not None:
+                timestep_sink.discard()
+            raise
+        finally:
+            await batches.aclose()
+        self.__store_results(run_results_list,timestep_data_list,timestep_sink,self.__simulation_config['timestep_recording'])
+
+    async def aiter_runs(self,batch_size=None,executor=None):
+        """
+        asyncio variant of iter_runs, yielding result batches in run_index order as an async iterator
+
+        the next batch runs on the executor while the current one is being consumed.
+        results are not kept by the simulator
+
+        Parameters:
+            batch_size: int, default None
+                time frames per batch, see iter_runs
+
+            executor: concurrent.futures.Executor, default None
+                executor running the batches. the event loop's default thread pool if not given
+
+        Yields:
+            run_results, timestep_data: data frames as in _get_run_results and _get_timestep_data
+        """
+        spec, ranges = self.__get_async_batches(batch_size)
+        batches = aiter_time_frame_ranges(spec,ranges,executor)
+        try:
+            async for run_results, timestep_data in batches:
+                run_results['simulator_id'] = self.__simulator_id
+                if self.__simulation_config['timestep_recording'] != 'compact':
+                    timestep_data['simulator_id'] = self.__simulator_id
+                yield(run_results,timestep_data)
+        finally:
+            await batches.aclose()
+
+    def estimate(self,max_memory=None,max_seconds=None):
+        """
+        predicts the size, peak memory and wall time of run_simulations before running it
+
+        run time is calibrated from a short micro-benchmark of the configured engine on this
+        machine, run once per process
+
+        Parameters:
+            max_memory: int, default None
+                bytes. raise ValueError if the estimated peak memory is above it,
+                suggesting memory_limit when timestep data is held in memory
+
+            max_seconds: float, default None
+                raise ValueError if the estimated wall time is above it
+
+        Returns:
+            estimate: dict
+                windows, timestep_rows, timestep_data_bytes, peak_memory_bytes, seconds
+        """
+        config = self.__simulation_config
+        estimate = estimate_run(
+            self.__historical_data,
+            config['simulation_length_years'],
+            config['timestep_recording'],
+            config['engine'],
+            config['workers'],
+            config['memory_limit']
+            )
+        check_estimate(estimate,max_memory,max_seconds,config['memory_limit'],config['engine'])
+        return(estimate)
+
+    def sensitivity(self,params,deltas):
+        """
+        estimates how success rate and median final value respond to small changes in parameters
+
+        the base config and every perturbed config are run on the vectorized kernel over
+        the same window arrays. run_simulations does not need to be called first
+
+        Parameters:
+            params: list of str
+                parameters to perturb. any of max_withdrawal_rate, inflation, desired_annual_income,
+                min_income_multiplier, cash_buffer_years, stocks_allocation
+
+            deltas: dict or list of float
+                step of each parameter, keyed by parameter or in the order of params.
+                steps of cash_buffer_years should be whole years
+
+        Returns:
+            sensitivity: data frame
+                one row per parameter and metric (success_rate, median_final_value) with
+                the base, lower and upper metric values and the partial effect
+        """
+        return(run_sensitivity(self.__historical_data,self.__simulation_config,params,deltas))
+
+    def optimise_allocation(self,objective='success_rate',percentile=50,assets=('stocks','gold','bonds','cash'),grid_step=0.1,refinement_steps=2):
+        """
+        searches the stocks/gold/bonds/cash simplex for the portfolio_allocation maximising an objective
+        for the simulator's other parameters
+
+        a coarse grid is refined locally with halving steps. candidates are run in batches
+        on the vectorized kernel over shared window arrays and never run twice.
+        run_simulations does not need to be called first
+
+        Parameters:
+            objective: str, default 'success_rate'
+                'success_rate' or 'final_value', the given percentile of final value
+
+            percentile: float, default 50
+                percentile of final value across time frames
+
+            assets: tuple of str, default ('stocks','gold','bonds','cash')
+                assets the search may allocate to
+
+            grid_step: float, default 0.1
+                spacing of the initial grid
+
+            refinement_steps: int, default 2
+                number of times the grid step is halved during refinement
+
+        Returns:
+            frontier: data frame
+                one row per evaluated allocation, best first, with the allocation, success_rate,
+                final_value_p<percentile> and whether it is on the success rate / final value frontier
+        """
+        return(optimise_allocation(self.__historical_data,self.__simulation_config,objective,percentile,assets,grid_step,refinement_steps))
+
+    def run_scenarios(self,scenarios,include_baseline=True):
+        """
+        runs stress scenarios against every time frame
+
+        each scenario overlays shocks on the yearly returns of every time frame, eg
+        {'crash': {'stocks': [-0.4, 0, 0, 0]}} puts a 40% fall in stocks in the first year
+        of every time frame followed by three flat years. all scenario and time frame
+        combinations run in one pass of the vectorized kernel
+
+        Parameters:
+            scenarios: dict
+                scenario name to shocks. shocks map stocks, gold or bonds to a list of yearly
+                returns from the first year of the simulation. None keeps the historical return
+
+            include_baseline: bool, default True
+                also run the unshocked time frames as scenario 'historical'
+
+        Returns:
+            run_results: data frame
+                one row per scenario and time frame
+        """
+        return(run_scenarios(self.__historical_data,self.__simulation_config,scenarios,include_baseline))
+
+    def run_parametric(self,generator,number_of_paths,batch_size=10000,seed=None):
+        """
+        runs the simulator's config on generated price paths instead of historical time frames
+
+        paths are generated and simulated in batches on the vectorized kernel, so
+        memory is bounded by batch_size however many paths are run
+
+        Parameters:
+            generator: paths.LognormalReturns
+                source of price paths
+
+            number_of_paths: int
+                total number of paths to simulate
+
+            batch_size: int, default 10000
+                paths generated and simulated at a time
+
+            seed: int, default None
+                seed of the path batches. random if not given
+
+        Returns:
+            run_results: data frame
+                one row per path with columns path_index, final_value, survival_duration, failed
+        """
+        return(run_parametric(self.__simulation_config,generator,number_of_paths,batch_size,seed))
+
     def __run_simulations_wrapped(
         self,
         starting_portfolio_value,
@@ -318,6 +688,11 @@ class Simulator():
         simulation_length_years,
         portfolio_allocation,
         cash_buffer_years,
+        timestep_recording,
+        workers,
+        engine,
+        memory_limit,
+        spill_directory,
         **kwargs
         ):
         """
@@ -356,45 +731,248 @@ class Simulator():
             
             portfolio_allocation: dict
                 portfolio allocation among asset classes
+
+            timestep_recording: str
+                layout used to store timestep data. either 'full' or 'compact'
+
+            workers: int
+                number of worker processes used to run simulations
+
+            engine: str
+                'reference' or 'vectorized'
+
+            memory_limit: int or None
+                bytes of timestep data to hold before spilling to disk
+
+            spill_directory: folder path or None
+                folder spilled chunks are written to
         """
-        
-        # get different time frames
-        simulation_time_frames = self._generate_simulation_time_frames(historical_data,simulation_length_years)
-        
-        run_results_list = [] # for use in concatenating data frames later
-        timestep_data_list = [] # for use in concatenating data frames later
+        timestep_sink, batch_size = self.__create_timestep_sink(memory_limit,spill_directory,timestep_recording,simulation_length_years)
 
-        bar = progressbar.ProgressBar()
-        for i in bar(range(len(simulation_time_frames))):
-        # for i,historical_data_subset in enumerate(simulation_time_frames):
-        #     if (i+1)%100 == 0:
-        #         print(f'running simulation {i+1} of {len(simulation_time_frames)}')
-            #       initialise simulation
-            historical_data_subset = simulation_time_frames[i]
-            sim = Simulation(
+        run_results_list, timestep_data_list = [], []
+        run_index_offset = len(self.__run_results)
+        try:
+            for run_results, timestep_data in self.__iter_run_batches(
+                starting_portfolio_value=starting_portfolio_value,
+                max_withdrawal_rate=max_withdrawal_rate,
+                income_schedule=income_schedule,
+                historical_data=historical_data,
+                simulation_length_years=simulation_length_years,
+                portfolio_allocation=portfolio_allocation,
+                cash_buffer_years=cash_buffer_years,
+                timestep_recording=timestep_recording,
+                workers=workers,
+                engine=engine,
+                batch_size=batch_size
+                ):
+                self.__offset_run_index(run_results,timestep_data,run_index_offset)
+                run_results_list.append(run_results)
+                if timestep_sink is not None:
+                    timestep_sink.add(timestep_data)
+                else:
+                    timestep_data_list.append(timestep_data)
+        except BaseException:
+            # chunks of an unfinished run would stop the next run from spilling to the same folder
+            if timestep_sink is not None:
+                timestep_sink.discard()
+            raise
+
+        self.__store_results(run_results_list,timestep_data_list,timestep_sink,timestep_recording)
+
+    def __offset_run_index(self,run_results,timestep_data,run_index_offset):
+        """
+        moves the run_index of a batch past the runs stored by earlier calls, so it stays unique in run_results
+        """
+        if run_index_offset == 0:
+            return
+        run_results['run_index'] += run_index_offset
+        if self.__simulation_config['timestep_recording'] == 'compact':
+            timestep_data['run_index'] += run_index_offset
+
+    def __create_timestep_sink(self,memory_limit,spill_directory,timestep_recording,simulation_length_years):
+        """
+        creates the spill that receives timestep data when a memory limit is set
+
+        Returns:
+            timestep_sink: spill.TimestepSpill or None
+            batch_size: time frames per batch whose timestep data fits in memory_limit, or None
+        """
+        if memory_limit is None:
+            return(None,None)
+        if self.__spill_path is None:
+            if spill_directory is not None:
+                # each simulator spills to its own subfolder, so simulators can share a spill_directory
+                self.__spill_path = pathlib.Path(spill_directory) / str(self.__simulator_id)
+            else:
+                # the default temporary folder is removed with the simulator
+                self.__spill_path = pathlib.Path(tempfile.mkdtemp(prefix='portfoliosim-spill-'))
+                weakref.finalize(self, shutil.rmtree, self.__spill_path, True)
+        timestep_sink = TimestepSpill(
+            memory_limit,
+            self.__spill_path,
+            'run_index' if timestep_recording == 'compact' else 'run_id',
+            self.__empty_timestep_data,
+            {} if timestep_recording == 'compact' else {'simulator_id': self.__simulator_id},
+            self.__timestep_data if isinstance(self.__timestep_data,ChunkedResults) else None
+            )
+        batch_size = max(1, memory_limit // (get_timestep_row_bytes(timestep_recording) * max(simulation_length_years,1)))
+        return(timestep_sink,batch_size)
+
+    def __store_results(self,run_results_list,timestep_data_list,timestep_sink,timestep_recording):
+        """
+        appends collected batches to the simulator's results
+
+        timestep_data_list is ignored when timestep data went to timestep_sink. once timestep
+        data has spilled, later runs add their chunks to the same ChunkedResults
+        """
+        self.__run_results = pd.concat([self.__run_results]+run_results_list,axis=0,ignore_index=True)
+        self.__run_results['simulator_id'] = self.__simulator_id
+
+        if timestep_sink is not None and timestep_sink.has_spilled():
+            self.__timestep_data = timestep_sink.finish()
+            return
+        if timestep_sink is not None:
+            timestep_data_list = timestep_sink.get_frames()
+        self.__timestep_data = pd.concat([self.__timestep_data]+timestep_data_list,axis=0,ignore_index=True)
+        if timestep_recording != 'compact':
+            self.__timestep_data['simulator_id'] = self.__simulator_id
+
+    def __iter_run_batches(
+        self,
+        starting_portfolio_value,
+        max_withdrawal_rate,
+        income_schedule,
+        historical_data,
+        simulation_length_years,
+        portfolio_allocation,
+        cash_buffer_years,
+        timestep_recording,
+        workers,
+        engine,
+        batch_size=None,
+        **kwargs
+        ):
+        """
+        runs every time frame on the configured engine, yielding results batch by batch in run_index order
+
+        Parameters:
+            batch_size: int, default None
+                time frames per batch, see iter_runs
+
+            remaining parameters are as in __run_simulations_wrapped
+
+        Yields:
+            run_results, timestep_data: data frames for one batch of time frames, without simulator_id
+        """
+        if engine == 'vectorized':
+            prices, years, months = build_window_arrays(historical_data,simulation_length_years)
+            if batch_size is None:
+                batch_size = max(len(prices),1)
+            for start in range(0, len(prices), batch_size):
+                results = run_kernel(
+                    prices[start:start+batch_size],
+                    income_schedule['desired_income'].to_numpy(),
+                    income_schedule['min_income'].to_numpy(),
+                    starting_portfolio_value,
+                    max_withdrawal_rate,
+                    normalise_allocation(portfolio_allocation),
+                    cash_buffer_years
+                    )
+                yield(kernel_results_to_frames(
+                    results,years[start:start+batch_size],months[start:start+batch_size],timestep_recording,start))
+        elif workers > 1:
+            import progressbar
+            number_of_frames = len(historical_data) - (12 * simulation_length_years) + 1
+            bar = progressbar.ProgressBar(maxval=max(number_of_frames,1)).start()
+            yield from iter_windows_in_pool(
+                historical_data,
+                income_schedule,
+                number_of_frames,
+                workers,
+                starting_portfolio_value,
+                max_withdrawal_rate,
+                simulation_length_years,
+                portfolio_allocation,
+                cash_buffer_years,
+                timestep_recording,
+                batch_size=batch_size,
+                progress=bar.update
+                )
+            bar.finish()
+        else:
+            yield from self.__iter_time_frames_serially(
                 starting_portfolio_value,
                 max_withdrawal_rate,
                 income_schedule,
-                historical_data_subset,
+                historical_data,
+                simulation_length_years,
                 portfolio_allocation,
-                cash_buffer_years
+                cash_buffer_years,
+                timestep_recording,
+                batch_size if batch_size is not None else DEFAULT_RUN_BATCH_SIZE
                 )
+
+    def __iter_time_frames_serially(
+        self,
+        starting_portfolio_value,
+        max_withdrawal_rate,
+        income_schedule,
+        historical_data,
+        simulation_length_years,
+        portfolio_allocation,
+        cash_buffer_years,
+        timestep_recording,
+        batch_size
+        ):
+        """
+        create and run simulations for every time frame in this process
+
+        Yields:
+            run_results, timestep_data: data frames for every batch_size time frames
+        """
+        import progressbar
+
+        number_of_frames = len(historical_data) - (12 * simulation_length_years) + 1
+        
+        run_results_list = [] # for use in concatenating data frames later
+        timestep_data_list = [] # for use in concatenating data frames later
+
+        sim = None
+        bar = progressbar.ProgressBar()
+        for i in bar(range(max(number_of_frames,0))):
+            #       initialise simulation once, then reset it for every following time frame
+            historical_data_subset = slice_time_frame(historical_data,i,simulation_length_years)
+            if sim is None:
+                sim = Simulation(
+                    starting_portfolio_value,
+                    max_withdrawal_rate,
+                    income_schedule,
+                    historical_data_subset,
+                    portfolio_allocation,
+                    cash_buffer_years
+                    )
+            else:
+                sim.reset(historical_data_subset)
             #       run simulation
             run_results, timestep_data = sim.run()
-            
-            #       extract simulation results and append to simulator results
-            # self.__run_results = self.__run_results.append(run_results)
-            # self.__timestep_data = self.__timestep_data.append(timestep_data)
+            run_results['run_index'] = i
+            if timestep_recording == 'compact':
+                timestep_data = compact_timestep_data(timestep_data,i)
 
             run_results_list.append(run_results)
             timestep_data_list.append(timestep_data)
-        
-        self.__run_results = pd.concat([self.__run_results]+run_results_list,axis=0,ignore_index=True)
-        self.__timestep_data = pd.concat([self.__timestep_data]+timestep_data_list,axis=0,ignore_index=True)
-
-        self.__run_results['simulator_id'] = self.__simulator_id
-        self.__timestep_data['simulator_id'] = self.__simulator_id
+            if len(run_results_list) == batch_size:
+                yield(
+                    pd.concat(run_results_list,axis=0,ignore_index=True),
+                    pd.concat(timestep_data_list,axis=0,ignore_index=True)
+                    )
+                run_results_list, timestep_data_list = [], []
 
+        if len(run_results_list) > 0:
+            yield(
+                pd.concat(run_results_list,axis=0,ignore_index=True),
+                pd.concat(timestep_data_list,axis=0,ignore_index=True)
+                )
        
     def _generate_simulation_time_frames(self,historical_data,simulation_length_years):
         """
@@ -416,17 +994,80 @@ class Simulator():
         number_of_frames = len(historical_data) - (12 * simulation_length_years) + 1
 
         for i in range(number_of_frames):
-            df = historical_data[i:(i+12*simulation_length_years)]
-            df = df[::12]
-            df.reset_index(inplace=True,drop=True)
-            time_frames_list.append(df)
+            time_frames_list.append(slice_time_frame(historical_data,i,simulation_length_years))
 
         return(time_frames_list)
 
-    def write_results(self,results_directory='./results/'):
+    def percentile_bands(self,percentiles=(5,25,50,75,95)):
+        """
+        percentile bands of total value (portfolio and cash buffer) at every timestep across runs
+
+        timestep data is scattered into a (runs, years) value matrix and all percentiles
+        are computed in one call, instead of grouping the long timestep table.
+        spilled timestep data is read one chunk at a time
+
+        Parameters:
+            percentiles: tuple of float, default (5,25,50,75,95)
+                percentiles between 0 and 100
+
+        Returns:
+            bands: data frame
+                one row per timestep with columns timestep and p<percentile> for each percentile
+        """
+        for percentile in percentiles:
+            if not 0 <= percentile <= 100:
+                raise ValueError(f"percentiles should be between 0 and 100 inclusive. received '{percentile}'")
+        columns = [f'p{percentile:g}' for percentile in percentiles]
+        timestep_data = self._get_timestep_data()
+        number_of_years = self.__simulation_config['simulation_length_years']
+        if len(timestep_data) == 0:
+            return(pd.DataFrame({column: pd.Series([], dtype='float') for column in ['timestep']+columns}))
+
+        run_key = 'run_index' if self.__simulation_config['timestep_recording'] == 'compact' else 'run_id'
+        value_columns = ['stocks_value','gold_value','bonds_value','cash_notional','cash_buffer']
+        if isinstance(timestep_data,ChunkedResults):
+            run_keys = pd.Index(timestep_data.get_run_ids())
+            frames = timestep_data.iter_frames([run_key,'timestep']+value_columns)
+        else:
+            run_keys = pd.Index(pd.unique(timestep_data[run_key]))
+            frames = [timestep_data]
+
+        values = np.full((len(run_keys), number_of_years), np.nan)
+        for frame in frames:
+            total_value = frame[value_columns[0]].to_numpy(dtype='float64')
+            for column in value_columns[1:]:
+                total_value = total_value + frame[column].to_numpy(dtype='float64')
+            values[run_keys.get_indexer(frame[run_key]), frame['timestep'].to_numpy(dtype='int64') - 1] = total_value
+
+        bands = np.percentile(values, percentiles, axis=0)
+        df = pd.DataFrame({'timestep': np.arange(1, number_of_years + 1)})
+        for column, band in zip(columns, bands):
+            df[column] = band
+        return(df)
+
+    def write_results(self,results_directory='./results/',timestep_format='csv',datasets_directory=None):
         """
         writes results to folder
+
+        Parameters:
+            results_directory: folder path, default './results/'
+                folder under which a folder named after the simulator_id is created
+
+            timestep_format: str, default 'csv'
+                'csv' writes timestep_data.csv
+                'columnar' writes a timestep_data folder with one memory-mappable file per column
+                and a run offset index, readable with portfoliosim.Results. spilled timestep data
+                is written as its chunk folders, readable with results.ChunkedResults
+
+            datasets_directory: folder path, default None
+                folder historical data is stored in once per distinct dataset, named by its
+                content hash. results_directory + 'datasets/' by default. the results folder
+                gets a historical_data.json pointing at it instead of its own copy
         """
+        allowed_timestep_formats = ('csv','columnar')
+        if timestep_format not in allowed_timestep_formats:
+            raise ValueError(f"timestep_format should be one of 'csv', 'columnar'. received '{timestep_format}'")
+
         results_folder = results_directory+str(self.__simulator_id)+'/'
         path = pathlib.Path(results_folder)
         path.mkdir(parents=True, exist_ok=True)
@@ -435,13 +1076,28 @@ class Simulator():
         run_results.to_csv(results_folder+'run_results.csv',index=False)
 
         timestep_data = self._get_timestep_data()
-        timestep_data.to_csv(results_folder+'timestep_data.csv',index=False)
+        if isinstance(timestep_data,ChunkedResults):
+            # spilled chunks are copied as they are or appended to the csv one at a time
+            if timestep_format == 'columnar':
+                shutil.copytree(timestep_data.get_path(),results_folder+'timestep_data/',dirs_exist_ok=True)
+            else:
+                for n,chunk in enumerate(timestep_data.iter_frames()):
+                    chunk.to_csv(results_folder+'timestep_data.csv',index=False,mode='w' if n == 0 else 'a',header=n == 0)
+        elif timestep_format == 'columnar':
+            run_key = 'run_index' if self.__simulation_config['timestep_recording'] == 'compact' else 'run_id'
+            write_timestep_columns(timestep_data,results_folder+'timestep_data/',run_key)
+        else:
+            timestep_data.to_csv(results_folder+'timestep_data.csv',index=False)
 
-        historical_data = self.__historical_data
-        historical_data['simulator_id'] = self.__simulator_id
-        historical_data.to_csv(results_folder+'historical_data.csv',index=False)
+        if datasets_directory is None:
+            datasets_directory = results_directory+'datasets/'
+        dataset_hash, dataset_path = write_dataset(self.__historical_data,datasets_directory)
+        write_dataset_reference(results_folder,dataset_hash,dataset_path,len(self.__historical_data))
 
         simulation_inputs = self._get_simulator_inputs_df()
         simulation_inputs.to_csv(results_folder+'simulation_inputs.csv',index=False)
 
+        percentile_bands = self.percentile_bands()
+        percentile_bands.to_csv(results_folder+'percentile_bands.csv',index=False)
+
 
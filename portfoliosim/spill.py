@@ -0,0 +1,115 @@
+import pandas as pd
+import json
+import pathlib
+import shutil
+from .results import write_timestep_columns, ChunkedResults
+
+class TimestepSpill():
+    """
+    collects timestep data and spills it to columnar chunks on disk under a memory budget
+
+    frames are buffered in memory until their size passes memory_limit, then the
+    buffer is written as one chunk with write_timestep_columns and released.
+    while a chunk is being written, memory use is up to about twice memory_limit.
+    a run that does not finish should call discard, so the folder can be spilled to again
+    """
+    def __init__(self, memory_limit, directory, run_key, template, constants=None, existing=None):
+        """
+        Parameters:
+            memory_limit: int
+                bytes of timestep data to buffer before spilling
+
+            directory: folder path
+                folder the chunks and chunks.json are written to. created if needed.
+                should not already hold chunks unless they are the ones of existing
+
+            run_key: str
+                column identifying the run of each row, as in write_timestep_columns
+
+            template: data frame
+                empty frame giving the column order and dtypes of every chunk
+
+            constants: dict, default None
+                columns set to a single value on every row of a chunk, eg simulator_id
+
+            existing: results.ChunkedResults, default None
+                chunks previously written to directory. new chunks are added after them
+        """
+        self.__memory_limit = memory_limit
+        self.__path = pathlib.Path(directory)
+        self.__run_key = run_key
+        self.__template = template
+        self.__constants = constants if constants is not None else {}
+        self.__frames = []
+        self.__buffered_bytes = 0
+        if existing is not None:
+            self.__chunks = existing.get_chunk_names()
+        elif (self.__path / 'chunks.json').exists():
+            raise ValueError(f"spill_directory should not already hold spilled chunks. received '{directory}'")
+        else:
+            self.__chunks = []
+        self.__existing_chunks = len(self.__chunks)
+
+    def add(self, timestep_data):
+        """
+        buffers a frame of timestep data, spilling the buffer if it passes memory_limit
+        """
+        self.__frames.append(timestep_data)
+        self.__buffered_bytes += int(timestep_data.memory_usage(index=False).sum())
+        if self.__buffered_bytes > self.__memory_limit:
+            self.spill()
+
+    def has_spilled(self):
+        return(len(self.__chunks) > 0)
+
+    def get_frames(self):
+        """
+        returns the frames buffered in memory and not yet spilled
+        """
+        return(list(self.__frames))
+
+    def spill(self):
+        """
+        writes buffered frames as the next chunk and releases them
+        """
+        if len(self.__frames) == 0:
+            return
+        chunk = pd.concat([self.__template]+self.__frames, axis=0, ignore_index=True)
+        self.__frames = []
+        self.__buffered_bytes = 0
+        for column, value in self.__constants.items():
+            chunk[column] = value
+
+        # listed before it is written, so discard also removes a partly written chunk
+        name = f'chunk_{len(self.__chunks):05d}'
+        self.__chunks.append(name)
+        write_timestep_columns(chunk, self.__path / name, self.__run_key)
+        self.__write_index()
+
+    def __write_index(self):
+        self.__path.mkdir(parents=True, exist_ok=True)
+        with open(self.__path / 'chunks.json', 'w') as f:
+            json.dump({'run_key': self.__run_key, 'chunks': self.__chunks}, f)
+
+    def discard(self):
+        """
+        drops buffered frames and removes the chunks written by this spill, leaving
+        the folder as it was when the spill was created
+        """
+        self.__frames = []
+        self.__buffered_bytes = 0
+        for name in self.__chunks[self.__existing_chunks:]:
+            shutil.rmtree(self.__path / name, ignore_errors=True)
+        self.__chunks = self.__chunks[:self.__existing_chunks]
+        if len(self.__chunks) > 0:
+            self.__write_index()
+        elif (self.__path / 'chunks.json').exists():
+            (self.__path / 'chunks.json').unlink()
+
+    def finish(self):
+        """
+        spills what is left and returns a lazy view over every chunk, including those of existing
+        """
+        self.spill()
+        self.__write_index()
+        return(ChunkedResults(self.__path))
@@ -0,0 +1,178 @@
+import inspect
+import numpy as np
+import pandas as pd
+from .simulator import Simulator
+from .kernel import PORTFOLIO_ASSETS
+
+FLOAT_FIELDS = ['desired_annual_income', 'inflation', 'min_income_multiplier', 'starting_portfolio_value', 'max_withdrawal_rate']
+INT_FIELDS = ['simulation_length_years', 'cash_buffer_years', 'workers']
+ALLOCATION_COLUMNS = [f'{asset}_allocation' for asset in PORTFOLIO_ASSETS]
+ALLOWED_VALUES = {
+    'timestep_recording': ('full','compact'),
+    'engine': ('reference','vectorized')
+    }
+
+def get_config_defaults():
+    """
+    returns Simulator's default config values
+    """
+    return({
+        name: parameter.default
+        for name, parameter in inspect.signature(Simulator.__init__).parameters.items()
+        if parameter.default is not inspect.Parameter.empty
+        })
+
+def to_config_table(configs):
+    """
+    converts configs into a data frame with one row per config and Simulator defaults filled in
+
+    portfolio_allocation dicts are flattened into <asset>_allocation columns,
+    the same layout as Simulator's simulation_inputs. missing allocations take the default,
+    other values that are not dicts are left in a portfolio_allocation column
+
+    Parameters:
+        configs: data frame or list of dict
+            Simulator configs. a data frame may hold either a portfolio_allocation
+            column of dicts or <asset>_allocation columns
+
+    Returns:
+        table: data frame of raw, unvalidated config values
+    """
+    if isinstance(configs, pd.DataFrame):
+        table = configs.copy()
+    else:
+        # object columns keep each value as given, so messages show what the caller passed
+        configs = list(configs)
+        keys = list(dict.fromkeys(key for config in configs for key in config))
+        table = pd.DataFrame({
+            key: pd.Series([config.get(key) for config in configs], dtype='object') for key in keys
+            }, index=pd.RangeIndex(len(configs)))
+
+    defaults = get_config_defaults()
+    if 'portfolio_allocation' in table.columns:
+        # only missing allocations take the default. anything else that is not a dict is kept
+        # in the portfolio_allocation column for validate_configs to report
+        invalid = table['portfolio_allocation'].map(lambda value: not isinstance(value, dict) and not _is_missing(value)).astype('bool')
+        allocations = table['portfolio_allocation'].map(lambda value: value if isinstance(value, dict) else defaults['portfolio_allocation'])
+        table['portfolio_allocation'] = table['portfolio_allocation'].astype('object').where(invalid, None)
+    elif any(column in table.columns for column in ALLOCATION_COLUMNS):
+        allocations = None
+    else:
+        allocations = pd.Series([defaults['portfolio_allocation']]*len(table), index=table.index, dtype='object')
+
+    if allocations is not None:
+        assets = list(dict.fromkeys(asset for allocation in allocations for asset in allocation))
+        for asset in assets:
+            table[f'{asset}_allocation'] = pd.Series([allocation.get(asset) for allocation in allocations], index=table.index, dtype='object')
+
+    for field, default in defaults.items():
+        if field == 'portfolio_allocation':
+            continue
+        if field not in table.columns:
+            table[field] = pd.Series([default]*len(table), index=table.index, dtype='object')
+        else:
+            table[field] = table[field].where(table[field].notna(), default)
+    for column in ALLOCATION_COLUMNS:
+        if column not in table.columns:
+            table[column] = 0.0
+    return(table)
+
+def _is_missing(value):
+    return(value is None or value is pd.NA or (isinstance(value, float) and np.isnan(value)))
+
+def validate_configs(configs):
+    """
+    validates a whole table of Simulator configs with vectorized checks
+
+    every check is applied to every row and all errors of a row are reported, instead of
+    stopping at the first one like Simulator does. messages match Simulator's
+
+    Parameters:
+        configs: data frame or list of dict
+            Simulator configs, as accepted by to_config_table
+
+    Returns:
+        valid_configs: data frame
+            rows without errors, with numeric columns cast to float/int.
+            index labels are those of the input (positions for a list)
+
+        errors: data frame
+            one row per error with columns row, field, message
+    """
+    table = to_config_table(configs)
+    errors = []
+
+    def flag(mask, field, message):
+        for row in table.index[np.asarray(mask, dtype='bool')]:
+            errors.append((row, field, message(table.at[row, field])))
+
+    if 'starting_portfolio_value' not in table.columns:
+        table['starting_portfolio_value'] = None
+    missing = table['starting_portfolio_value'].isna().to_numpy()
+    flag(missing, 'starting_portfolio_value', lambda value: 'starting_portfolio_value is required')
+
+    values = {}
+    castable = {}
+    for field in FLOAT_FIELDS + INT_FIELDS + ALLOCATION_COLUMNS:
+        values[field] = pd.to_numeric(table[field], errors='coerce')
+        castable[field] = values[field].notna().to_numpy()
+
+    for field in FLOAT_FIELDS:
+        not_castable = ~castable[field] & ~missing if field == 'starting_portfolio_value' else ~castable[field]
+        flag(not_castable, field,
+            lambda value, field=field: f"{field} should be castable to float. received '{value}' of type {type(value)}")
+
+    for field in INT_FIELDS:
+        whole = castable[field] & (values[field].fillna(0) % 1 == 0).to_numpy()
+        flag(~whole, field,
+            lambda value, field=field: f"{field} should be castable to int. received '{value}' of type {type(value)}")
+        castable[field] = whole
+
+    if 'portfolio_allocation' in table.columns:
+        flag(table['portfolio_allocation'].notna().to_numpy(), 'portfolio_allocation',
+            lambda value: f"portfolio_allocation should be a dict of asset to allocation. received '{value}' of type {type(value)}")
+        table = table.drop(columns=['portfolio_allocation'])
+
+    for column, asset in zip(ALLOCATION_COLUMNS, PORTFOLIO_ASSETS):
+        absent = table[column].isna().to_numpy()
+        flag(absent, column, lambda value, asset=asset: f"portfolio_allocation for {asset} is required")
+        flag(~castable[column] & ~absent, column,
+            lambda value, asset=asset: f"portfolio_allocation for {asset} should be castable to float. received '{value}' of type {type(value)}")
+        flag(castable[column] & (values[column] < 0).to_numpy(), column,
+            lambda value, asset=asset: f"portfolio_allocation for {asset} should be at least zero. received '{value}'")
+
+    for column in table.columns:
+        if column.endswith('_allocation') and column not in ALLOCATION_COLUMNS:
+            asset = column[:-len('_allocation')]
+            flag(table[column].notna(), column,
+                lambda value, asset=asset: f"portfolio assets should only be stocks, bonds, cash, gold. received '{asset}'")
+
+    for field in ['starting_portfolio_value','desired_annual_income','inflation','simulation_length_years']:
+        flag(castable[field] & (values[field] <= 0).to_numpy(), field,
+            lambda value, field=field: f"{field} should be greater than zero. received '{value}'")
+    flag(castable['cash_buffer_years'] & (values['cash_buffer_years'] < 0).to_numpy(), 'cash_buffer_years',
+        lambda value: f"cash_buffer_years should be at least zero. received '{value}'")
+    flag(castable['min_income_multiplier'] & ~values['min_income_multiplier'].between(0,1).to_numpy(), 'min_income_multiplier',
+        lambda value: f"min_income_multiplier should be between 0 and 1 inclusive. received '{value}'")
+    flag(castable['max_withdrawal_rate'] & ~((values['max_withdrawal_rate'] > 0) & (values['max_withdrawal_rate'] <= 1)).to_numpy(), 'max_withdrawal_rate',
+        lambda value: f"max_withdrawal_rate should be greater than zero and less than or equal to one. received '{value}'")
+    flag(castable['workers'] & (values['workers'] < 1).to_numpy(), 'workers',
+        lambda value: f"workers should be an int of at least one. received '{value}'")
+
+    flag(table['memory_limit'].map(lambda value: value is not None and (
+            isinstance(value, bool) or not isinstance(value, (int, np.integer)) or value < 1)).to_numpy(), 'memory_limit',
+        lambda value: f"memory_limit should be an int of at least one byte or None. received '{value}'")
+
+    for field, allowed in ALLOWED_VALUES.items():
+        flag(~table[field].isin(allowed).to_numpy(), field,
+            lambda value, field=field, allowed=allowed: f"{field} should be one of {', '.join(repr(i) for i in allowed)}. received '{value}'")
+    flag((table['engine'] == 'vectorized').to_numpy() & castable['workers'] & (values['workers'] > 1).to_numpy(), 'workers',
+        lambda value: f"the vectorized engine runs in a single process. received workers '{value}'")
+
+    errors = pd.DataFrame(errors, columns=['row','field','message'])
+    valid_configs = table.drop(index=errors['row'].unique())
+    for field in FLOAT_FIELDS + ALLOCATION_COLUMNS:
+        valid_configs[field] = values[field].loc[valid_configs.index].astype('float64')
+    for field in INT_FIELDS:
+        valid_configs[field] = values[field].loc[valid_configs.index].astype('int64')
+    return(valid_configs, errors)
@@ -0,0 +1,328 @@
+import sqlite3
+import json
+import hashlib
+import time
+import os
+import socket
+import shutil
+import pathlib
+import threading
+import contextlib
+
+class WorkQueue():
+    """
+    resumable work queue of Simulator configs backed by a SQLite file
+
+    every config becomes a work unit identified by the hash of its contents.
+    workers claim units under a lease, write their results, then mark them complete.
+    units whose lease expired (eg the worker died) can be claimed again,
+    units that are complete are never recomputed
+    """
+    def __init__(self, path, lease_seconds=3600):
+        """
+        opens the queue, creating the database file if it does not exist
+
+        Parameters:
+            path: file path
+                path to the SQLite database holding the queue
+                can live on a filesystem shared by several machines
+
+            lease_seconds: float, default 3600
+                how long a claimed unit stays reserved for its worker before
+                other workers may claim it again
+        """
+        self.__path = str(path)
+        self.__lease_seconds = lease_seconds
+        self.__connection = sqlite3.connect(self.__path, timeout=60, isolation_level=None)
+        self.__connection.execute('PRAGMA journal_mode=DELETE')
+        self.__connection.execute(
+            """
+            CREATE TABLE IF NOT EXISTS work_units (
+                unit_id TEXT PRIMARY KEY,
+                position INTEGER NOT NULL,
+                config TEXT NOT NULL,
+                status TEXT NOT NULL DEFAULT 'pending',
+                worker_id TEXT,
+                lease_expires REAL,
+                attempts INTEGER NOT NULL DEFAULT 0,
+                result_location TEXT,
+                error TEXT
+                )
+            """
+            )
+        self.__connection.execute('CREATE INDEX IF NOT EXISTS work_units_status ON work_units (status, position)')
+
+    def get_path(self):
+        return(self.__path)
+
+    def get_lease_seconds(self):
+        return(self.__lease_seconds)
+
+    def close(self):
+        self.__connection.close()
+
+    def __enter__(self):
+        return(self)
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    @staticmethod
+    def get_unit_id(config):
+        """
+        returns the id of the work unit for config. identical configs share an id
+        """
+        return(hashlib.sha256(_dump_config(config).encode('utf-8')).hexdigest())
+
+    def add_configs(self, configs):
+        """
+        adds Simulator configs to the queue. configs already in the queue are skipped
+
+        Parameters:
+            configs: iterable of dict
+                keyword arguments for Simulator. must be JSON serialisable,
+                so historical_data_source has to be a file path
+
+        Returns:
+            unit_ids: list of work unit ids, one per config
+        """
+        unit_ids = []
+        rows = []
+        for config in configs:
+            unit_id = self.get_unit_id(config)
+            unit_ids.append(unit_id)
+            rows.append((unit_id, _dump_config(config)))
+
+        self.__connection.execute('BEGIN IMMEDIATE')
+        try:
+            position = self.__connection.execute('SELECT COALESCE(MAX(position), -1) + 1 FROM work_units').fetchone()[0]
+            self.__connection.executemany(
+                'INSERT OR IGNORE INTO work_units (unit_id, position, config) VALUES (?, ?, ?)',
+                [(unit_id, position + n, config) for n, (unit_id, config) in enumerate(rows)]
+                )
+            self.__connection.execute('COMMIT')
+        except BaseException:
+            self.__connection.execute('ROLLBACK')
+            raise
+        return(unit_ids)
+
+    def claim(self, worker_id):
+        """
+        claims the next available work unit for worker_id
+
+        pending units are handed out in the order they were added,
+        followed by running units whose lease has expired
+
+        Returns:
+            (unit_id, config) of the claimed unit, or None if nothing is available
+        """
+        now = time.time()
+        self.__connection.execute('BEGIN IMMEDIATE')
+        try:
+            row = self.__connection.execute(
+                """
+                SELECT unit_id, config FROM work_units
+                WHERE status = 'pending' OR (status = 'running' AND lease_expires < ?)
+                ORDER BY position LIMIT 1
+                """,
+                (now,)
+                ).fetchone()
+            if row is not None:
+                self.__connection.execute(
+                    """
+                    UPDATE work_units
+                    SET status = 'running', worker_id = ?, lease_expires = ?, attempts = attempts + 1
+                    WHERE unit_id = ?
+                    """,
+                    (worker_id, now + self.__lease_seconds, row[0])
+                    )
+            self.__connection.execute('COMMIT')
+        except BaseException:
+            self.__connection.execute('ROLLBACK')
+            raise
+        if row is None:
+            return(None)
+        return((row[0], json.loads(row[1])))
+
+    def heartbeat(self, unit_id, worker_id):
+        """
+        extends the lease on a unit held by worker_id
+
+        Returns:
+            True if the lease was extended, False if the unit is no longer held by worker_id
+        """
+        cursor = self.__connection.execute(
+            "UPDATE work_units SET lease_expires = ? WHERE unit_id = ? AND worker_id = ? AND status = 'running'",
+            (time.time() + self.__lease_seconds, unit_id, worker_id)
+            )
+        return(cursor.rowcount == 1)
+
+    def complete(self, unit_id, worker_id, result_location=None):
+        """
+        marks a unit held by worker_id as complete and records where its results were written
+
+        Returns:
+            True if the unit was marked complete, False if it is no longer held by worker_id
+        """
+        cursor = self.__connection.execute(
+            """
+            UPDATE work_units SET status = 'complete', lease_expires = NULL, result_location = ?, error = NULL
+            WHERE unit_id = ? AND worker_id = ? AND status = 'running'
+            """,
+            (result_location, unit_id, worker_id)
+            )
+        return(cursor.rowcount == 1)
+
+    def fail(self, unit_id, worker_id, error):
+        """
+        marks a unit held by worker_id as failed. failed units are not claimed again until reset_failed is called
+
+        Returns:
+            True if the unit was marked failed, False if it is no longer held by worker_id
+        """
+        cursor = self.__connection.execute(
+            "UPDATE work_units SET status = 'failed', lease_expires = NULL, error = ? WHERE unit_id = ? AND worker_id = ? AND status = 'running'",
+            (str(error), unit_id, worker_id)
+            )
+        return(cursor.rowcount == 1)
+
+    def reset_failed(self):
+        """
+        puts failed units back into the pending state
+        """
+        self.__connection.execute("UPDATE work_units SET status = 'pending', error = NULL WHERE status = 'failed'")
+
+    def get_status_counts(self):
+        """
+        returns dict of status to number of units in that status
+        """
+        counts = {'pending': 0, 'running': 0, 'complete': 0, 'failed': 0}
+        for status, count in self.__connection.execute('SELECT status, COUNT(*) FROM work_units GROUP BY status'):
+            counts[status] = count
+        return(counts)
+
+    def get_units(self):
+        """
+        returns list of dicts describing every unit in the queue in the order they were added
+        """
+        cursor = self.__connection.execute(
+            'SELECT unit_id, status, worker_id, attempts, result_location, error FROM work_units ORDER BY position'
+            )
+        columns = [description[0] for description in cursor.description]
+        return([dict(zip(columns, row)) for row in cursor.fetchall()])
+
+def _dump_config(config):
+    """
+    canonical JSON representation of a config, used for hashing and storage
+    """
+    try:
+        return(json.dumps(config, sort_keys=True, separators=(',', ':')))
+    except TypeError:
+        raise TypeError(f"work queue configs should be JSON serialisable. received '{config}'")
+
+def _publish_folder(staging_folder, unit_folder):
+    """
+    atomically renames a finished staging folder to its final name.
+    if another worker already published the same unit, the staging folder is discarded
+    """
+    try:
+        os.replace(staging_folder, unit_folder)
+    except OSError:
+        if not unit_folder.exists():
+            raise
+        shutil.rmtree(staging_folder)
+
+@contextlib.contextmanager
+def _keep_lease(queue, unit_id, worker_id, interval):
+    """
+    sends heartbeats for a unit from a background thread until the block exits
+
+    the thread opens its own connection, as SQLite connections are not shared between threads.
+    heartbeats stop early once the unit is no longer held by worker_id
+    """
+    stop = threading.Event()
+    def beat():
+        with WorkQueue(queue.get_path(), queue.get_lease_seconds()) as connection:
+            while not stop.wait(interval):
+                if not connection.heartbeat(unit_id, worker_id):
+                    return
+    thread = threading.Thread(target=beat, name='portfoliosim-workqueue-heartbeat', daemon=True)
+    thread.start()
+    try:
+        yield
+    finally:
+        stop.set()
+        thread.join()
+
+def get_default_worker_id():
+    return(f'{socket.gethostname()}-{os.getpid()}')
+
+def run_worker(queue, results_directory='./results/', worker_id=None, max_units=None, heartbeat_interval=None):
+    """
+    claims and runs work units from queue until no units are left
+
+    results for each unit are written with Simulator.write_results into a
+    staging folder which is renamed to results_directory/<unit_id>/ once complete.
+    a unit whose folder already exists is marked complete without being recomputed.
+    while a unit runs its lease is extended by heartbeats from a background thread,
+    so units may take longer than the queue's lease_seconds
+
+    Parameters:
+        queue: WorkQueue or file path
+            queue to take work units from
+
+        results_directory: folder path, default './results/'
+            folder under which each unit's results are written
+
+        worker_id: str, default None
+            id recorded against claimed units. defaults to <hostname>-<pid>
+
+        max_units: int, default None
+            stop after running this many units
+
+        heartbeat_interval: float, default None
+            seconds between heartbeats. a third of the queue's lease_seconds by default
+
+    Returns:
+        unit_ids: list of units completed by this worker
+    """
+    # imported here so that managing the queue does not load pandas
+    from .simulator import Simulator
+
+    if not isinstance(queue, WorkQueue):
+        queue = WorkQueue(queue)
+    if worker_id is None:
+        worker_id = get_default_worker_id()
+    if heartbeat_interval is None:
+        heartbeat_interval = max(queue.get_lease_seconds() / 3, 0.001)
+
+    completed = []
+    while max_units is None or len(completed) < max_units:
+        claimed = queue.claim(worker_id)
+        if claimed is None:
+            break
+        unit_id, config = claimed
+        unit_folder = pathlib.Path(results_directory) / unit_id
+        if unit_folder.exists():
+            # results were written but the worker stopped before marking the unit complete
+            if queue.complete(unit_id, worker_id, str(unit_folder)):
+                completed.append(unit_id)
+            continue
+
+        staging_folder = pathlib.Path(results_directory) / f'{unit_id}.{worker_id}.partial'
+        if staging_folder.exists():
+            shutil.rmtree(staging_folder)
+        try:
+            with _keep_lease(queue, unit_id, worker_id, heartbeat_interval):
+                simulator = Simulator(**config)
+                simulator.run_simulations()
+                simulator.write_results(str(staging_folder) + '/', datasets_directory=str(pathlib.Path(results_directory) / 'datasets') + '/')
+                _publish_folder(staging_folder, unit_folder)
+        except Exception as e:
+            queue.fail(unit_id, worker_id, repr(e))
+            continue
+        # the unit may have been taken over by another worker after its lease expired
+        if queue.complete(unit_id, worker_id, str(unit_folder)):
+            completed.append(unit_id)
+
+    return(completed)
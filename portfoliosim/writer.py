@@ -0,0 +1,92 @@
+import queue
+import threading
+
+class ResultsWriter():
+    """
+    writes simulator results on a background thread so the next simulator can run meanwhile
+
+    submitted simulators wait in a bounded queue and are written in submission order.
+    when max_pending simulators are waiting, submit blocks until one is written, which
+    caps the results held in memory. a simulator must not be run again until flush returns.
+    errors raised while writing are raised again by the next submit, flush or close,
+    and when leaving a with block unless the block itself raised
+    """
+    def __init__(self, max_pending=2):
+        """
+        Parameters:
+            max_pending: int, default 2
+                simulators that may wait to be written before submit blocks
+        """
+        if isinstance(max_pending, bool) or not isinstance(max_pending, int) or max_pending < 1:
+            raise ValueError(f"max_pending should be an int of at least one. received '{max_pending}'")
+        self.__queue = queue.Queue(maxsize=max_pending)
+        self.__errors = []
+        self.__closed = False
+        self.__thread = threading.Thread(target=self.__write_loop, name='portfoliosim-results-writer', daemon=True)
+        self.__thread.start()
+
+    def __write_loop(self):
+        while True:
+            item = self.__queue.get()
+            try:
+                if item is None:
+                    return
+                simulator, args, kwargs = item
+                simulator.write_results(*args, **kwargs)
+            except Exception as e:
+                self.__errors.append(e)
+            finally:
+                self.__queue.task_done()
+
+    def __raise_errors(self):
+        if len(self.__errors) > 0:
+            error = self.__errors[0]
+            self.__errors.clear()
+            raise error
+
+    def submit(self, simulator, *args, **kwargs):
+        """
+        queues simulator.write_results(*args, **kwargs) on the writer thread
+
+        Parameters:
+            simulator: Simulator
+                simulator whose run_simulations has completed
+
+            args, kwargs:
+                arguments of Simulator.write_results
+        """
+        if self.__closed:
+            raise ValueError('ResultsWriter is closed')
+        self.__raise_errors()
+        self.__queue.put((simulator, args, kwargs))
+
+    def flush(self):
+        """
+        blocks until every submitted simulator has been written
+        """
+        self.__queue.join()
+        self.__raise_errors()
+
+    def __stop(self):
+        if self.__closed:
+            return
+        self.__closed = True
+        self.__queue.put(None)
+        self.__thread.join()
+
+    def close(self):
+        """
+        flushes and stops the writer thread
+        """
+        self.__stop()
+        self.__raise_errors()
+
+    def __enter__(self):
+        return(self)
+
+    def __exit__(self, *exc_info):
+        # when the with block raised, its exception is kept instead of being replaced by a writer error
+        if exc_info[0] is not None:
+            self.__stop()
+            return
+        self.close()
@@ -27,12 +27,15 @@ def main():
     x.write_results('./results/basic/')
 
     ## run simulations of varying simulation durations
-    for i in range(10,51,10):
-        print(f'running simulation for simulation length {i} years')
-        simulation_cofig["simulation_length_years"] = i 
-        x = ps.Simulator(**simulation_cofig)
-        x.run_simulations()
-        x.write_results('./results/vary_simulation_years/')
+    ## results are written in the background while the next simulation runs
+    with ps.ResultsWriter() as writer:
+        for i in range(10,51,10):
+            print(f'running simulation for simulation length {i} years')
+            simulation_cofig["simulation_length_years"] = i 
+            x = ps.Simulator(**simulation_cofig)
+            x.run_simulations()
+            writer.submit(x,'./results/vary_simulation_years/')
+        writer.flush()
 
 if __name__ == "__main__":
     start = time.time()
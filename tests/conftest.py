@@ -1,6 +1,96 @@
-# import portfoliosim as ps
-# import pandas as pd
-# import pytest
+import portfoliosim as ps
+import pandas as pd
+import numpy as np
+import pytest
+
+
+def build_historical_data(shape='linear', years=3, seed=None, drift=(0,0,0), volatility=(0.05,0.1,0.03)):
+    """
+    returns monthly historical asset prices starting in january 2000
+
+    args:
+        shape: 'linear', 'sine' or 'random'
+            'linear' and 'sine' have gold and bonds rising steadily, with stocks rising
+            linearly or swinging around 100. 'random' is a random walk of every asset
+        years: number of years of prices
+        seed: seed of the random walk
+        drift, volatility: monthly log return mean and standard deviation of gold, stocks and bonds in a random walk
+    """
+    months = 12*years
+    if shape == 'random':
+        rng = np.random.default_rng(seed)
+        return(pd.DataFrame(data={
+            'year': np.repeat(np.arange(2000,2000+years),12),
+            'month': np.tile(np.arange(1,13),years),
+            'gold': 100*np.exp(np.cumsum(rng.normal(drift[0],volatility[0],months))),
+            'stocks': 100*np.exp(np.cumsum(rng.normal(drift[1],volatility[1],months))),
+            'bonds': 100*np.exp(np.cumsum(rng.normal(drift[2],volatility[2],months)))
+            }))
+    return(pd.DataFrame(data={
+        'year': np.repeat(np.arange(2000,2000+years),12),
+        'month': np.tile(np.arange(1,13),years),
+        'gold': np.linspace(100,130,months),
+        'bonds': np.linspace(100,110,months),
+        'stocks': np.linspace(100,160,months) if shape == 'linear' else 100 + 20*np.sin(np.arange(months))
+        }))
+
+@pytest.fixture
+def create_historical_data():
+    """
+    builds historical data, see build_historical_data
+    """
+    return(build_historical_data)
+
+@pytest.fixture
+def historical_data(create_historical_data):
+    """
+    historical data of the simulator configs. override in a test module to simulate other prices
+    """
+    return(create_historical_data('linear'))
+
+@pytest.fixture
+def historical_data_path(historical_data, tmp_path):
+    """
+    historical data written to a csv, for configs that have to be serialisable
+    """
+    path = tmp_path / 'historical_data.csv'
+    historical_data.to_csv(path,index=False)
+    return(str(path))
+
+@pytest.fixture
+def simulation_defaults():
+    """
+    Simulator arguments other than historical data. override in a test module to change them
+    """
+    return({
+        'starting_portfolio_value': 1000000.0,
+        "desired_annual_income": 30000,
+        "max_withdrawal_rate" : 0.04,
+        'simulation_length_years' : 2
+        })
+
+@pytest.fixture
+def create_simulation_config(simulation_defaults, historical_data):
+    """
+    builds Simulator configs from a copy of historical_data and simulation_defaults, updated with kwargs
+    """
+    def create(**kwargs):
+        simulation_cofig = {'historical_data_source': historical_data.copy()}
+        simulation_cofig.update(simulation_defaults)
+        simulation_cofig.update(kwargs)
+        return(simulation_cofig)
+    return(create)
+
+@pytest.fixture
+def create_simulator(create_simulation_config):
+    """
+    builds a Simulator from create_simulation_config(**kwargs) and runs it
+    """
+    def create(**kwargs):
+        x = ps.Simulator(**create_simulation_config(**kwargs))
+        x.run_simulations()
+        return(x)
+    return(create)
 
 
 # class TestingSimulator(ps.Simulator):
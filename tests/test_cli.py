@@ -0,0 +1,98 @@
+from portfoliosim.cli import main, expand_grid, deduplicate_configs, load_config_file
+from portfoliosim.results_store import open_results_store
+import json
+
+
+def test_cli_expand_grid():
+    """
+    ensure that grid entries expand to every combination of their values
+    """
+    configs = expand_grid({
+        'starting_portfolio_value': 100,
+        'grid': {'inflation': [1.01,1.02], 'cash_buffer_years': [0,1,2]}
+        })
+    assert len(configs) == 6
+    assert configs[0] == {'starting_portfolio_value': 100, 'inflation': 1.01, 'cash_buffer_years': 0}
+    assert configs[-1] == {'starting_portfolio_value': 100, 'inflation': 1.02, 'cash_buffer_years': 2}
+
+def test_cli_deduplicate_configs():
+    """
+    ensure that identical configs are only kept once regardless of key order
+    """
+    configs = [{'a': 1, 'b': 2}, {'b': 2, 'a': 1}, {'a': 2, 'b': 2}]
+    assert deduplicate_configs(configs) == [{'a': 1, 'b': 2}, {'a': 2, 'b': 2}]
+
+def test_cli_load_toml(tmp_path):
+    """
+    ensure that TOML files with [[simulators]] tables load as a list of configs
+    """
+    path = tmp_path / 'configs.toml'
+    path.write_text(
+        '[[simulators]]\nstarting_portfolio_value = 100\n\n'
+        '[[simulators]]\nstarting_portfolio_value = 200\n[simulators.grid]\ninflation = [1.0, 1.1]\n'
+        )
+    configs = load_config_file(path)
+    assert len(configs) == 2
+    assert configs[1]['grid'] == {'inflation': [1.0,1.1]}
+
+def test_cli_runs_configs_into_store(tmp_path, capsys, historical_data_path):
+    """
+    ensure that the cli runs every unique config and writes them to a results store
+    """
+    config_path = tmp_path / 'configs.json'
+    config_path.write_text(json.dumps([
+        {
+            'starting_portfolio_value': 1000000,
+            'desired_annual_income': 30000,
+            'simulation_length_years': 2,
+            'historical_data_source': historical_data_path,
+            'grid': {'inflation': [1.01,1.02,1.01]}
+            }
+        ]))
+    store_path = tmp_path / 'results.sqlite'
+    exit_code = main([str(config_path),'--engine','vectorized','--recording','compact','--output','sqlite','--store',str(store_path)])
+
+    output = capsys.readouterr().out
+    assert exit_code == 0
+    assert '2 configs to run (1 duplicates removed)' in output
+    for phase in ['load','expand','validate','build','run','write','total']:
+        assert phase in output
+    with open_results_store(store_path) as store:
+        assert len(store.get_simulation_inputs()) == 2
+        assert len(store.get_run_results()) == 2 * 13
+
+def test_cli_check_reports_invalid_configs(tmp_path, capsys, historical_data_path):
+    """
+    ensure that --check validates configs without running them and reports invalid ones
+    """
+    config_path = tmp_path / 'configs.json'
+    config_path.write_text(json.dumps({
+        'starting_portfolio_value': 1000000,
+        'simulation_length_years': 2,
+        'historical_data_source': historical_data_path,
+        'grid': {'inflation': [1.01,-1]}
+        }))
+    exit_code = main([str(config_path),'--check','--results-directory',str(tmp_path / 'results')])
+
+    assert exit_code == 1
+    assert "config 2: inflation should be greater than zero. received '-1'" in capsys.readouterr().err
+    assert not (tmp_path / 'results').exists()
+
+def test_cli_workers_only_apply_to_reference_engine(tmp_path, capsys, historical_data_path):
+    """
+    ensure that --workers is rejected with --engine vectorized and skips configs on the vectorized engine
+    """
+    config_path = tmp_path / 'configs.json'
+    config_path.write_text(json.dumps({
+        'starting_portfolio_value': 1000000,
+        'simulation_length_years': 2,
+        'historical_data_source': historical_data_path,
+        'grid': {'engine': ['reference','vectorized']}
+        }))
+    exit_code = main([str(config_path),'--engine','vectorized','--workers','2','--check'])
+    assert exit_code == 2
+    assert "error: --workers only applies to the reference engine, the vectorized engine runs in a single process. received '2'" in capsys.readouterr().err
+
+    exit_code = main([str(config_path),'--workers','2','--check'])
+    assert exit_code == 0
+    assert capsys.readouterr().err == ''
@@ -0,0 +1,40 @@
+from portfoliosim.datasets import get_dataset_hash, read_dataset_reference
+import pandas as pd
+
+
+def test_write_results_stores_dataset_once(tmp_path, create_simulator, create_historical_data):
+    """
+    ensure that simulators sharing historical data store it once and reference it from their folders
+    """
+    historical_data = create_historical_data()
+    x = create_simulator(historical_data_source=historical_data)
+    y = create_simulator(historical_data_source=create_historical_data(), max_withdrawal_rate=0.05)
+    x.write_results(str(tmp_path)+'/')
+    y.write_results(str(tmp_path)+'/')
+
+    datasets = list((tmp_path / 'datasets').iterdir())
+    assert [path.name for path in datasets] == [f'{get_dataset_hash(historical_data)}.csv']
+    for simulator in (x, y):
+        results_folder = tmp_path / str(simulator._get_run_results()['simulator_id'][0])
+        assert not (results_folder / 'historical_data.csv').exists()
+        pd.testing.assert_frame_equal(read_dataset_reference(results_folder), historical_data)
+
+def test_write_results_does_not_modify_historical_data(tmp_path, create_simulator, create_historical_data):
+    """
+    ensure that writing results leaves the caller's historical data frame untouched
+    """
+    historical_data = create_historical_data()
+    x = create_simulator(historical_data_source=historical_data)
+    x.write_results(str(tmp_path)+'/')
+    pd.testing.assert_frame_equal(historical_data, create_historical_data())
+
+def test_dataset_hash_depends_on_content(create_historical_data):
+    """
+    ensure that the dataset hash changes with values and column names
+    """
+    historical_data = create_historical_data()
+    changed = create_historical_data()
+    changed.loc[5,'stocks'] = 0
+    assert get_dataset_hash(historical_data) == get_dataset_hash(create_historical_data())
+    assert get_dataset_hash(historical_data) != get_dataset_hash(changed)
+    assert get_dataset_hash(historical_data) != get_dataset_hash(historical_data.rename(columns={'gold':'silver'}))
@@ -0,0 +1,36 @@
+import portfoliosim as ps
+import subprocess
+import sys
+
+
+def test_package_import_defers_heavy_dependencies():
+    """
+    ensure that importing the package does not import pandas, numpy or progressbar
+    """
+    output = subprocess.run(
+        [sys.executable, '-c', "import sys, portfoliosim; print(sorted(m for m in ['pandas','numpy','progressbar'] if m in sys.modules))"],
+        check=True,
+        capture_output=True,
+        text=True
+        ).stdout
+    assert output.strip() == '[]'
+
+def test_package_lazy_attributes():
+    """
+    ensure that lazily imported names resolve to the classes in their submodules
+    """
+    from portfoliosim.simulator import Simulator
+    from portfoliosim import Simulation
+    assert ps.Simulator is Simulator
+    assert Simulation.__name__ == 'Simulation'
+    assert 'Results' in dir(ps)
+
+def test_package_unknown_attribute():
+    """
+    ensure that unknown attributes still raise AttributeError
+    """
+    try:
+        ps.NotAThing
+        assert False, 'AttributeError should be raised for unknown attributes'
+    except AttributeError as ae:
+        assert str(ae) == "module 'portfoliosim' has no attribute 'NotAThing'"
@@ -0,0 +1,71 @@
+import portfoliosim as ps
+from portfoliosim.paths import LognormalReturns, iter_path_batches
+import numpy as np
+import pytest
+
+
+@pytest.fixture
+def historical_data(create_historical_data):
+    return(create_historical_data('sine', years=5))
+
+@pytest.fixture
+def simulation_defaults():
+    return({
+        'starting_portfolio_value': 1000000.0,
+        "desired_annual_income": 60000,
+        "inflation": 1.03,
+        "min_income_multiplier": 0.5,
+        "max_withdrawal_rate" : 0.1,
+        'simulation_length_years' : 5,
+        'cash_buffer_years' : 1
+        })
+
+def test_lognormal_returns_moments():
+    """
+    ensure that generated yearly returns have the requested mean, volatility and correlation
+    """
+    correlation = [[1, 0.5, -0.3], [0.5, 1, 0], [-0.3, 0, 1]]
+    generator = LognormalReturns({'stocks': 0.07, 'gold': 0.03, 'bonds': 0.02}, {'stocks': 0.2, 'gold': 0.15, 'bonds': 0.05}, correlation)
+    prices = generator.generate(200000, 2, np.random.default_rng(0))
+
+    assert prices.shape == (200000, 2, 3)
+    np.testing.assert_array_equal(prices[:,0,:], 1)
+    returns = prices[:,1,:] - 1
+    np.testing.assert_allclose(returns.mean(axis=0), [0.07, 0.03, 0.02], atol=0.002)
+    np.testing.assert_allclose(returns.std(axis=0), [0.2, 0.15, 0.05], rtol=0.02)
+    np.testing.assert_allclose(np.corrcoef(np.log(prices[:,1,:]).T), correlation, atol=0.01)
+
+def test_path_batches_are_seeded_per_batch():
+    """
+    ensure that batches are reproducible from the seed and only hold batch_size paths
+    """
+    generator = LognormalReturns({'stocks': 0.07}, {'stocks': 0.2})
+    batches = list(iter_path_batches(generator, 25, 3, batch_size=10, seed=5))
+    assert [(offset, len(prices)) for offset, prices in batches] == [(0, 10), (10, 10), (20, 5)]
+
+    again = list(iter_path_batches(generator, 25, 3, batch_size=10, seed=5))
+    for (offset, prices), (offset_again, prices_again) in zip(batches, again):
+        np.testing.assert_array_equal(prices, prices_again)
+
+def test_run_parametric_flat_paths_match_simulator(create_simulation_config):
+    """
+    ensure that paths without volatility give the same result as a Simulator run on flat prices
+    """
+    flat_history = create_simulation_config()['historical_data_source'].assign(gold=1.0, bonds=1.0, stocks=1.0)
+    x = ps.Simulator(**create_simulation_config(historical_data_source=flat_history))
+    run_results = x.run_parametric(LognormalReturns({}, {}), 7, batch_size=3, seed=1)
+
+    x.run_simulations()
+    assert list(run_results['path_index']) == list(range(7))
+    np.testing.assert_allclose(run_results['final_value'], x._get_run_results()['final_value'][0])
+    assert (run_results['survival_duration'] == x._get_run_results()['survival_duration'][0]).all()
+
+def test_lognormal_returns_invalid_correlation():
+    """
+    ensure that a correlation matrix that is not positive definite raises an error
+    """
+    try:
+        LognormalReturns({'stocks': 0.07}, {'stocks': 0.2}, [[1, 1.5, 0], [1.5, 1, 0], [0, 0, 1]])
+        assert False, 'ValueError should be raised for a correlation that is not positive definite'
+    except ValueError as ve:
+        assert str(ve) == "correlation should be positive definite. received '[[1.0, 1.5, 0.0], [1.5, 1.0, 0.0], [0.0, 0.0, 1.0]]'"
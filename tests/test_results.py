@@ -0,0 +1,69 @@
+import portfoliosim as ps
+from portfoliosim.results import write_timestep_columns
+import pandas as pd
+import numpy as np
+
+
+def test_results_get_run(tmp_path, create_simulator):
+    """
+    ensure that a single run read through Results matches the simulator's timestep data
+    """
+    x = create_simulator()
+    x.write_results(str(tmp_path)+'/',timestep_format='columnar')
+    simulator_id = x._get_run_results()['simulator_id'][0]
+    results = ps.Results(tmp_path / str(simulator_id) / 'timestep_data')
+
+    timestep_data = x._get_timestep_data()
+    run_id = x._get_run_results()['run_id'][4]
+    expected = timestep_data[timestep_data['run_id'] == run_id].reset_index(drop=True)
+
+    assert not (tmp_path / str(simulator_id) / 'timestep_data.csv').exists()
+    assert len(results) == len(timestep_data)
+    assert results.get_run_key() == 'run_id'
+    assert list(results.get_run_ids()) == list(x._get_run_results()['run_id'])
+    pd.testing.assert_frame_equal(results.get_run(run_id),expected)
+
+def test_results_get_column(tmp_path, create_simulator):
+    """
+    ensure that a column is returned memory-mapped across all runs
+    """
+    x = create_simulator(timestep_recording='compact')
+    x.write_results(str(tmp_path)+'/',timestep_format='columnar')
+    simulator_id = x._get_run_results()['simulator_id'][0]
+    results = ps.Results(tmp_path / str(simulator_id) / 'timestep_data')
+
+    column = results.get_column('stocks_value')
+    assert isinstance(column,np.memmap)
+    assert column.dtype == 'float32'
+    np.testing.assert_array_equal(column,x._get_timestep_data()['stocks_value'].to_numpy())
+    assert results.get_run_key() == 'run_index'
+    assert len(results.get_run(3,columns=['timestep','failed'])) == 2
+
+def test_write_timestep_columns_groups_runs(tmp_path):
+    """
+    ensure that rows of a run are grouped together when they are not contiguous
+    """
+    timestep_data = pd.DataFrame({
+        'run_id': [7,9,7,9],
+        'timestep': [1,1,2,2],
+        'failed': pd.Series([False,False,True,False],dtype='boolean')
+        })
+    write_timestep_columns(timestep_data,tmp_path)
+    results = ps.Results(tmp_path)
+    assert list(results.get_run_ids()) == [7,9]
+    pd.testing.assert_frame_equal(results.get_run(7),pd.DataFrame({
+        'run_id': [7,7],
+        'timestep': [1,2],
+        'failed': pd.Series([False,True],dtype='boolean')
+        }))
+
+def test_write_results_unknown_timestep_format(tmp_path, create_simulator):
+    """
+    ensure that unknown timestep formats are rejected
+    """
+    x = create_simulator()
+    try:
+        x.write_results(str(tmp_path)+'/',timestep_format='xml')
+        assert False, 'ValueError should be raised for unknown timestep formats'
+    except ValueError as ve:
+        assert str(ve) == "timestep_format should be one of 'csv', 'columnar'. received 'xml'"
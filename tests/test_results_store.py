@@ -0,0 +1,102 @@
+from portfoliosim.results_store import open_results_store, ParquetResultsStore
+import numpy as np
+import pytest
+import importlib.util
+
+
+@pytest.mark.parametrize('backend', ['sqlite','duckdb'])
+def test_results_store_round_trip(tmp_path, backend, create_simulator):
+    """
+    ensure that results written to a store can be read back per simulator and per run
+    """
+    if backend == 'duckdb':
+        pytest.importorskip('duckdb')
+    x = create_simulator()
+    y = create_simulator(timestep_recording='compact',inflation=1.03)
+
+    with open_results_store(tmp_path / f'results.{backend}',backend=backend) as store:
+        store.write_simulators([x,y])
+
+        assert len(store.get_simulation_inputs()) == 2
+        run_results = store.get_run_results(x._get_run_results()['simulator_id'][0])
+        assert len(run_results) == 13
+        np.testing.assert_allclose(
+            run_results.sort_values('run_index')['final_value'].to_numpy(),
+            x._get_run_results()['final_value'].to_numpy()
+            )
+
+        run_id = y._get_run_results()['run_id'][5]
+        timestep_data = store.get_timestep_data(y._get_run_results()['simulator_id'][0],run_id)
+        assert len(timestep_data) == 2
+        assert (timestep_data['run_id'] == run_id).all()
+
+        start_2001 = store.query('SELECT COUNT(*) AS n FROM run_results WHERE start_ref_year = 2001')
+        assert start_2001['n'][0] == 2
+
+def test_results_store_indexes(tmp_path):
+    """
+    ensure that the sqlite store indexes simulator_id, run_id and start date
+    """
+    with open_results_store(tmp_path / 'results.sqlite') as store:
+        indexes = store.query("SELECT name FROM sqlite_master WHERE type = 'index'")['name'].tolist()
+    for index in ['run_results_simulator_id','run_results_run_id','run_results_start','timestep_data_simulator_id_run_id']:
+        assert index in indexes
+
+def test_results_store_unknown_backend(tmp_path):
+    """
+    ensure that unknown backends are rejected
+    """
+    try:
+        open_results_store(tmp_path / 'results.db',backend='csv')
+        assert False, 'ValueError should be raised for unknown backends'
+    except ValueError as ve:
+        assert str(ve) == "backend should be one of 'sqlite', 'duckdb', 'parquet'. received 'csv'"
+
+def test_parquet_store_partitions(tmp_path, create_simulator):
+    """
+    ensure that the parquet store partitions by config keys and reads back with dtypes kept
+    """
+    pytest.importorskip('pyarrow')
+    x = create_simulator()
+    y = create_simulator(timestep_recording='compact',max_withdrawal_rate=0.05)
+
+    store = ParquetResultsStore(tmp_path / 'results.parquet',partition_keys=('max_withdrawal_rate',))
+    store.write_simulators([x,y])
+
+    partitions = sorted(i.name for i in (tmp_path / 'results.parquet' / 'run_results').iterdir())
+    assert partitions == ['max_withdrawal_rate=0.04','max_withdrawal_rate=0.05']
+    for table in ('run_results','timestep_data'):
+        inner = [i.name for i in (tmp_path / 'results.parquet' / table / 'max_withdrawal_rate=0.04').iterdir()]
+        assert inner == [f"simulator_id={x._get_run_results()['simulator_id'][0]}"]
+
+    simulator_id = x._get_run_results()['simulator_id'][0]
+    run_results = store.get_run_results(simulator_id)
+    assert len(run_results) == 13
+    assert run_results['survival_duration'].dtype == 'int64'
+    assert run_results['simulator_id'].dtype == 'int64'
+    np.testing.assert_allclose(
+        run_results.sort_values('run_index')['final_value'].to_numpy(),
+        x._get_run_results()['final_value'].to_numpy()
+        )
+
+    run_id = y._get_run_results()['run_id'][5]
+    timestep_data = store.get_timestep_data(y._get_run_results()['simulator_id'][0],run_id)
+    assert len(timestep_data) == 2
+    assert (timestep_data['run_id'] == run_id).all()
+    assert len(store.get_timestep_data(simulator_id)) == 26
+    assert store.get_timestep_data(simulator_id)['failed'].dtype == 'bool'
+
+    if importlib.util.find_spec('duckdb') is not None:
+        start_2001 = store.query('SELECT COUNT(*) AS n FROM run_results WHERE start_ref_year = 2001 AND max_withdrawal_rate = 0.05')
+        assert start_2001['n'][0] == 1
+
+def test_parquet_store_invalid_partition_keys(tmp_path):
+    """
+    ensure that partition keys outside simulation_inputs are rejected
+    """
+    pytest.importorskip('pyarrow')
+    try:
+        ParquetResultsStore(tmp_path / 'results.parquet',partition_keys=('final_value',))
+        assert False, 'ValueError should be raised for partition keys outside simulation_inputs'
+    except ValueError as ve:
+        assert str(ve) == "partition_keys should be columns of simulation_inputs. received 'final_value'"
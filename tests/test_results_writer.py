@@ -0,0 +1,71 @@
+import portfoliosim as ps
+import pandas as pd
+
+
+def test_results_writer_matches_write_results(tmp_path, create_simulator):
+    """
+    ensure that results written in the background match write_results once flushed
+    """
+    simulators = [create_simulator(inflation=1.0+i/100) for i in range(3)]
+    with ps.ResultsWriter(max_pending=1) as writer:
+        for x in simulators:
+            writer.submit(x,str(tmp_path)+'/background/')
+        writer.flush()
+        for x in simulators:
+            x.write_results(str(tmp_path)+'/direct/')
+
+            simulator_id = str(x._get_run_results()['simulator_id'][0])
+            for file_name in ['run_results.csv','timestep_data.csv','simulation_inputs.csv','percentile_bands.csv']:
+                background = pd.read_csv(tmp_path / 'background' / simulator_id / file_name)
+                direct = pd.read_csv(tmp_path / 'direct' / simulator_id / file_name)
+                pd.testing.assert_frame_equal(background, direct)
+
+def test_results_writer_raises_write_errors(tmp_path, create_simulator):
+    """
+    ensure that errors on the writer thread are raised by flush
+    """
+    x = create_simulator()
+    writer = ps.ResultsWriter()
+    writer.submit(x,str(tmp_path)+'/',timestep_format='parquet')
+    try:
+        writer.flush()
+        assert False, 'ValueError should be raised by flush for failed writes'
+    except ValueError as ve:
+        assert str(ve) == "timestep_format should be one of 'csv', 'columnar'. received 'parquet'"
+    writer.close()
+
+    try:
+        writer.submit(x,str(tmp_path)+'/')
+        assert False, 'ValueError should be raised when submitting to a closed writer'
+    except ValueError as ve:
+        assert str(ve) == 'ResultsWriter is closed'
+
+def test_results_writer_keeps_with_block_error(tmp_path, create_simulator):
+    """
+    ensure that an exception raised in the with block is not replaced by a write error on exit
+    """
+    x = create_simulator()
+    try:
+        with ps.ResultsWriter() as writer:
+            writer.submit(x,str(tmp_path)+'/',timestep_format='parquet')
+            raise KeyError('raised in the with block')
+        assert False, 'KeyError should be raised by the with block'
+    except KeyError as ke:
+        assert str(ke) == "'raised in the with block'"
+
+    try:
+        with ps.ResultsWriter() as writer:
+            writer.submit(x,str(tmp_path)+'/',timestep_format='parquet')
+        assert False, 'ValueError should be raised on exit for failed writes'
+    except ValueError as ve:
+        assert str(ve) == "timestep_format should be one of 'csv', 'columnar'. received 'parquet'"
+
+def test_results_writer_invalid_max_pending():
+    """
+    ensure that max_pending must be a positive int
+    """
+    try:
+        ps.ResultsWriter(max_pending=0)
+        assert False, 'ValueError should be raised for max_pending below one'
+    except ValueError as ve:
+        assert str(ve) == "max_pending should be an int of at least one. received '0'"
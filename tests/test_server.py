@@ -0,0 +1,100 @@
+from portfoliosim.server import SimulationServer
+from portfoliosim.batch import run_config_table, summarise_runs
+from portfoliosim.validation import validate_configs
+import concurrent.futures
+import urllib.request
+import urllib.error
+import json
+import pytest
+
+
+@pytest.fixture
+def historical_data(create_historical_data):
+    return(create_historical_data('random', years=10, seed=3))
+
+def create_request(**kwargs):
+    config = {
+        'starting_portfolio_value': 1000000.0,
+        'desired_annual_income': 60000,
+        'max_withdrawal_rate': 0.06,
+        'simulation_length_years': 5
+        }
+    config.update(kwargs)
+    return(config)
+
+def post(url, body):
+    request = urllib.request.Request(url + '/simulate', data=json.dumps(body).encode(), method='POST',
+        headers={'Content-Type': 'application/json'})
+    with urllib.request.urlopen(request, timeout=30) as response:
+        return(json.loads(response.read()))
+
+def test_server_coalesces_requests(historical_data):
+    """
+    ensure that concurrent requests are batched, cached and match a direct batch run
+    """
+    requests = [create_request(desired_annual_income=income) for income in range(40000,80000,2000)]
+    requests += [create_request(simulation_length_years=3, portfolio_allocation={'stocks': 0.3, 'bonds': 0.7, 'gold': 0, 'cash': 0})]
+
+    with SimulationServer(historical_data, batch_window=0.05) as server:
+        assert server.get_url().startswith('http://127.0.0.1:')
+        with concurrent.futures.ThreadPoolExecutor(max_workers=len(requests)) as executor:
+            summaries = list(executor.map(lambda config: post(server.get_url(), config), requests))
+        stats = server.get_stats()
+        assert stats['requests'] == len(requests)
+        assert stats['batches'] < len(requests)
+        assert stats['configs_run'] == len(requests)
+
+        assert post(server.get_url(), requests[0]) == summaries[0]
+        assert server.get_stats()['cache_hits'] == 1
+        with urllib.request.urlopen(server.get_url() + '/stats', timeout=30) as response:
+            assert json.loads(response.read())['cache_hits'] == 1
+
+    valid_configs, errors = validate_configs([dict(config, historical_data_source=historical_data) for config in requests])
+    expected = summarise_runs(run_config_table(valid_configs))
+    for n, summary in enumerate(summaries):
+        assert summary['runs'] == expected['runs'][n]
+        assert summary['success_rate'] == pytest.approx(expected['success_rate'][n])
+        assert summary['median_final_value'] == pytest.approx(expected['median_final_value'][n])
+
+def test_server_rejects_invalid_configs(historical_data):
+    """
+    ensure that invalid configs and unknown paths are answered with errors
+    """
+    with SimulationServer(historical_data) as server:
+        try:
+            post(server.get_url(), create_request(max_withdrawal_rate=2))
+            assert False, 'HTTPError should be raised for invalid configs'
+        except urllib.error.HTTPError as e:
+            assert e.code == 400
+            assert json.loads(e.read())['error'] == "max_withdrawal_rate should be greater than zero and less than or equal to one. received '2'"
+
+        try:
+            post(server.get_url(), create_request(historical_data_source='/etc/passwd'))
+            assert False, 'HTTPError should be raised for requests setting historical_data_source'
+        except urllib.error.HTTPError as e:
+            assert e.code == 400
+            assert json.loads(e.read())['error'] == 'historical_data_source is set by the server and should not be sent'
+
+        try:
+            urllib.request.urlopen(server.get_url() + '/other', timeout=30)
+            assert False, 'HTTPError should be raised for unknown paths'
+        except urllib.error.HTTPError as e:
+            assert e.code == 404
+
+def test_server_request_timeout(historical_data):
+    """
+    ensure that a request whose batch does not finish within request_timeout is answered with 504
+    """
+    with SimulationServer(historical_data, batch_window=1, request_timeout=0.1) as server:
+        try:
+            post(server.get_url(), create_request())
+            assert False, 'HTTPError should be raised when the request times out'
+        except urllib.error.HTTPError as e:
+            assert e.code == 504
+            assert json.loads(e.read())['error'] == 'simulation did not finish within 0.1 seconds'
+
+    try:
+        SimulationServer(historical_data, request_timeout=0)
+        assert False, 'ValueError should be raised when request_timeout is not positive'
+    except ValueError as ve:
+        assert str(ve) == "request_timeout should be greater than zero. received '0'"
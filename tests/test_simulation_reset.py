@@ -0,0 +1,80 @@
+import portfoliosim as ps
+import pandas as pd
+
+
+def get_simulation_config():
+    return({
+        "starting_portfolio_value" : 1202,
+        "max_withdrawal_rate" : 0.1,
+        "income_schedule" : pd.DataFrame(data={
+            'year':pd.Series([1,2,3], dtype='int'),
+            'desired_income':pd.Series([100,102,104], dtype='float'),
+            'min_income':pd.Series([50,51,52], dtype='float')
+            }),
+        "historical_data_subset": pd.DataFrame(data={
+            'year':pd.Series([1,2,3], dtype='int'),
+            'month':pd.Series([1,2,3], dtype='float'),
+            'gold':pd.Series([5,10,20], dtype='float'),
+            'stocks':pd.Series([10,20,40], dtype='float'),
+            'bonds':pd.Series([50,100,200], dtype='float')
+            }),
+        "portfolio_allocation" : {
+            'stocks' : 1,
+            'gold' : 1,
+            'bonds' : 1,
+            'cash' : 1
+            },
+        "cash_buffer_years" : 2
+        })
+
+def test_simulation_reset_matches_new_simulation():
+    """
+    ensure that a reset simulation produces the same results as a newly created one
+    """
+    other_time_frame = pd.DataFrame(data={
+        'year':pd.Series([4,5,6], dtype='int'),
+        'month':pd.Series([1,1,1], dtype='float'),
+        'gold':pd.Series([20,5,4], dtype='float'),
+        'stocks':pd.Series([40,8,2], dtype='float'),
+        'bonds':pd.Series([200,150,100], dtype='float')
+        })
+
+    reused = ps.Simulation(**get_simulation_config())
+    reused.run()
+    reused.reset(other_time_frame)
+    reused_run_results, reused_timestep_data = reused.run()
+
+    config = get_simulation_config()
+    config['historical_data_subset'] = other_time_frame
+    expected_run_results, expected_timestep_data = ps.Simulation(**config).run()
+
+    pd.testing.assert_frame_equal(reused_run_results.drop(columns='run_id'),expected_run_results.drop(columns='run_id'))
+    pd.testing.assert_frame_equal(reused_timestep_data.drop(columns='run_id'),expected_timestep_data.drop(columns='run_id'))
+
+def test_simulation_does_not_modify_portfolio_allocation():
+    """
+    ensure that normalising the portfolio allocation leaves the caller's dict untouched
+    """
+    config = get_simulation_config()
+    ps.Simulation(**config)
+    assert config['portfolio_allocation'] == {'stocks' : 1, 'gold' : 1, 'bonds' : 1, 'cash' : 1}
+
+def test_simulation_reset_keeps_earlier_timestep_data():
+    """
+    ensure that timestep data returned by a run is not overwritten when the simulation is reset and run again
+    """
+    x = ps.Simulation(**get_simulation_config())
+    run_results, timestep_data = x.run()
+    expected = timestep_data.copy()
+
+    x.reset(pd.DataFrame(data={
+        'year':pd.Series([4,5,6], dtype='int'),
+        'month':pd.Series([1,1,1], dtype='float'),
+        'gold':pd.Series([20,5,4], dtype='float'),
+        'stocks':pd.Series([40,8,2], dtype='float'),
+        'bonds':pd.Series([200,150,100], dtype='float')
+        }))
+    assert len(x.get_timestep_data()) == 0
+    x.run()
+    assert len(x.get_timestep_data()) == 3
+    pd.testing.assert_frame_equal(timestep_data,expected)
@@ -0,0 +1,138 @@
+import portfoliosim as ps
+from portfoliosim.asynchronous import get_range_spec, run_time_frame_range
+import pandas as pd
+import numpy as np
+import pytest
+import asyncio
+import concurrent.futures
+import threading
+import time
+
+
+@pytest.fixture
+def simulation_defaults(simulation_defaults):
+    return(dict(simulation_defaults, inflation=1.02, min_income_multiplier=0.5, cash_buffer_years=1))
+
+@pytest.fixture
+def historical_data(create_historical_data):
+    return(create_historical_data('sine'))
+
+def test_arun_matches_run_simulations(create_simulation_config):
+    """
+    ensure that concurrent arun calls sharing a process pool match run_simulations
+    """
+    configs = [create_simulation_config(), create_simulation_config(engine='vectorized', timestep_recording='compact')]
+    simulators = [ps.Simulator(**config) for config in configs]
+
+    async def run_all(executor):
+        await asyncio.gather(*[x.arun(executor=executor,batch_size=4) for x in simulators])
+
+    with concurrent.futures.ProcessPoolExecutor(max_workers=2) as executor:
+        asyncio.run(run_all(executor))
+
+    for config, x in zip(configs, simulators):
+        y = ps.Simulator(**config)
+        y.run_simulations()
+        assert list(x._get_run_results()['run_index']) == list(range(13))
+        assert (x._get_run_results()['simulator_id'] == x._get_simulator_inputs()['simulator_id']).all()
+        np.testing.assert_allclose(x._get_run_results()['final_value'],y._get_run_results()['final_value'])
+        assert len(x._get_timestep_data()) == len(y._get_timestep_data())
+
+def test_aiter_runs_yields_batches(create_simulation_config):
+    """
+    ensure that aiter_runs yields batches in run_index order without keeping them
+    """
+    x = ps.Simulator(**create_simulation_config())
+
+    async def collect():
+        return([run_results async for run_results, timestep_data in x.aiter_runs(batch_size=5)])
+
+    batches = asyncio.run(collect())
+    assert [list(run_results['run_index']) for run_results in batches] == [list(range(5)),list(range(5,10)),list(range(10,13))]
+    assert len(x._get_run_results()) == 0
+
+def test_arun_cancellation(create_simulation_config):
+    """
+    ensure that cancelling arun cancels batches that have not started and keeps no results
+    """
+    x = ps.Simulator(**create_simulation_config())
+    release = threading.Event()
+    futures = []
+
+    async def cancel_run(executor):
+        executor.submit(release.wait)
+        submit = executor.submit
+        executor.submit = lambda *args, **kwargs: futures.append(submit(*args, **kwargs)) or futures[-1]
+        task = asyncio.create_task(x.arun(executor=executor,batch_size=1))
+        await asyncio.sleep(0.05)
+        task.cancel()
+        try:
+            await task
+            assert False, 'CancelledError should be raised by a cancelled arun'
+        except asyncio.CancelledError:
+            pass
+
+    with concurrent.futures.ThreadPoolExecutor(max_workers=1) as executor:
+        asyncio.run(cancel_run(executor))
+        release.set()
+    assert len(futures) == 13
+    assert all(future.cancelled() for future in futures)
+    assert len(x._get_run_results()) == 0
+
+def test_arun_cancellation_discards_spilled_chunks(tmp_path, create_simulation_config):
+    """
+    ensure that cancelling a spilling arun removes its chunks, so the simulator can run again
+    """
+    x = ps.Simulator(**create_simulation_config(memory_limit=600, spill_directory=str(tmp_path)))
+    spill_path = tmp_path / str(x._get_simulator_inputs()['simulator_id'])
+
+    async def cancel_run(executor):
+        submit = executor.submit
+        executor.submit = lambda fn, *args: submit(lambda: time.sleep(0.02) or fn(*args))
+        task = asyncio.create_task(x.arun(executor=executor,batch_size=1))
+        while not (spill_path / 'chunks.json').exists():
+            await asyncio.sleep(0.005)
+        task.cancel()
+        try:
+            await task
+            assert False, 'CancelledError should be raised by a cancelled arun'
+        except asyncio.CancelledError:
+            pass
+
+    with concurrent.futures.ThreadPoolExecutor(max_workers=1) as executor:
+        asyncio.run(cancel_run(executor))
+    assert list(spill_path.iterdir()) == []
+    assert len(x._get_run_results()) == 0
+
+    x.run_simulations()
+    expected = ps.Simulator(**create_simulation_config())
+    expected.run_simulations()
+    pd.testing.assert_frame_equal(
+        x._get_timestep_data().to_frame().drop(columns=['run_id','simulator_id']),
+        expected._get_timestep_data().drop(columns=['run_id','simulator_id'])
+        )
+
+@pytest.mark.parametrize('engine', ['reference','vectorized'])
+@pytest.mark.parametrize('timestep_recording', ['full','compact'])
+def test_range_spec_holds_only_rows_of_range(create_simulation_config, historical_data, engine, timestep_recording):
+    """
+    ensure that a range spec holds only the historical data its time frames read and gives the same results
+    """
+    spec = {
+        'historical_data': historical_data,
+        'income_schedule': ps.Simulator(**create_simulation_config())._get_income_schedule(),
+        'starting_portfolio_value': 1000000.0,
+        'max_withdrawal_rate': 0.04,
+        'simulation_length_years': 2,
+        'portfolio_allocation': {'stocks': 0.6, 'bonds': 0.4, 'gold': 0.0, 'cash': 0.0},
+        'cash_buffer_years': 1,
+        'timestep_recording': timestep_recording,
+        'engine': engine
+        }
+    range_spec = get_range_spec(spec, 4, 8)
+    assert len(range_spec['historical_data']) == (8 - 4) - 1 + 24
+    run_results, timestep_data = run_time_frame_range(range_spec, 4, 8)
+    expected_run_results, expected_timestep_data = run_time_frame_range(spec, 4, 8)
+    assert list(run_results['run_index']) == [4,5,6,7]
+    pd.testing.assert_frame_equal(run_results.drop(columns='run_id'), expected_run_results.drop(columns='run_id'))
+    pd.testing.assert_frame_equal(timestep_data.drop(columns='run_id', errors='ignore'), expected_timestep_data.drop(columns='run_id', errors='ignore'))
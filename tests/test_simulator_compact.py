@@ -0,0 +1,97 @@
+import portfoliosim as ps
+import pandas as pd
+import pytest
+
+
+@pytest.fixture
+def simulation_defaults(simulation_defaults):
+    return(dict(simulation_defaults, inflation=1.02, min_income_multiplier=0.5, cash_buffer_years=1))
+
+def test_simulator_check_timestep_recording(create_simulation_config):
+    """
+    ensure that Simulator flags unknown timestep_recording values
+    """
+    try:
+        x = ps.Simulator(**create_simulation_config(timestep_recording='tiny'))
+        assert False, 'ValueError should be raised when timestep_recording is not a known layout'
+    except ValueError as ve:
+        assert str(ve) == "timestep_recording should be one of 'full', 'compact'. received 'tiny'"
+
+def test_simulator_compact_timestep_dtypes(create_simulation_config):
+    """
+    ensure that compact timestep data uses small dtypes and holds no ids
+    """
+    x = ps.Simulator(**create_simulation_config(timestep_recording='compact'))
+    x.run_simulations()
+    timestep_data = x._get_timestep_data()
+
+    assert 'run_id' not in timestep_data.columns
+    assert 'simulator_id' not in timestep_data.columns
+    assert timestep_data['run_index'].dtype == 'int32'
+    assert timestep_data['timestep'].dtype == 'int16'
+    assert timestep_data['year'].dtype == 'int16'
+    assert timestep_data['month'].dtype == 'int8'
+    assert timestep_data['stocks_value'].dtype == 'float32'
+    assert timestep_data['failed'].dtype == 'bool'
+    assert len(timestep_data) == 13 * 2
+    assert sorted(timestep_data['run_index'].unique()) == list(range(13))
+
+def test_simulator_compact_timestep_data_expands_to_full(create_simulation_config):
+    """
+    ensure that expanded compact timestep data matches the full layout
+    """
+    full = ps.Simulator(**create_simulation_config())
+    full.run_simulations()
+    compact = ps.Simulator(**create_simulation_config(timestep_recording='compact'))
+    compact.run_simulations()
+
+    expected = full._get_timestep_data().drop(columns=['simulator_id','run_id'])
+    expanded = compact._get_expanded_timestep_data()
+
+    assert list(expanded.columns) == list(full._get_timestep_data().columns)
+    assert (expanded['simulator_id'] == compact._get_run_results()['simulator_id'][0]).all()
+    assert set(expanded['run_id']) == set(compact._get_run_results()['run_id'])
+    pd.testing.assert_frame_equal(
+        expanded.drop(columns=['simulator_id','run_id']),
+        expected,
+        check_dtype=False,
+        rtol=1e-6
+        )
+
+def test_simulator_compact_timestep_data_smaller(create_simulation_config):
+    """
+    ensure that compact timestep data uses considerably less memory
+    """
+    full = ps.Simulator(**create_simulation_config())
+    full.run_simulations()
+    compact = ps.Simulator(**create_simulation_config(timestep_recording='compact'))
+    compact.run_simulations()
+
+    full_bytes = full._get_timestep_data().memory_usage(index=False).sum()
+    compact_bytes = compact._get_timestep_data().memory_usage(index=False).sum()
+    assert compact_bytes * 2 < full_bytes
+
+@pytest.mark.parametrize('config', [
+    {},
+    {'engine': 'vectorized'},
+    {'memory_limit': 600}
+    ])
+def test_simulator_compact_run_twice(tmp_path, config, create_simulation_config):
+    """
+    ensure that a second run_simulations gives its runs new run_index values
+    """
+    once = ps.Simulator(**create_simulation_config(timestep_recording='compact'))
+    once.run_simulations()
+    number_of_runs = len(once._get_run_results())
+
+    x = ps.Simulator(**create_simulation_config(timestep_recording='compact', spill_directory=str(tmp_path), **config))
+    x.run_simulations()
+    x.run_simulations()
+    run_results = x._get_run_results()
+    assert run_results['run_index'].tolist() == list(range(2 * number_of_runs))
+
+    expanded = x._get_expanded_timestep_data()
+    assert len(expanded) == 2 * len(once._get_expanded_timestep_data())
+    assert expanded['run_id'].nunique() == run_results['run_id'].nunique()
+    # every run appears twice, which leaves the extremes and the median unchanged
+    pd.testing.assert_frame_equal(x.percentile_bands([0,50,100]), once.percentile_bands([0,50,100]))
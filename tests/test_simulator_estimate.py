@@ -0,0 +1,36 @@
+import portfoliosim as ps
+
+
+def test_estimate_counts(create_simulation_config):
+    """
+    ensure that estimate predicts the window and row counts of a run
+    """
+    x = ps.Simulator(**create_simulation_config())
+    estimate = x.estimate()
+    x.run_simulations()
+
+    assert estimate['windows'] == len(x._get_run_results()) == 13
+    assert estimate['timestep_rows'] == len(x._get_timestep_data()) == 26
+    assert estimate['seconds'] > 0
+    assert estimate['peak_memory_bytes'] > estimate['timestep_data_bytes']
+
+    compact = ps.Simulator(**create_simulation_config(timestep_recording='compact',engine='vectorized')).estimate()
+    assert compact['timestep_data_bytes'] < estimate['timestep_data_bytes']
+
+def test_estimate_over_limits(create_simulation_config):
+    """
+    ensure that estimate refuses configs over the limits and suggests what to change
+    """
+    x = ps.Simulator(**create_simulation_config())
+    try:
+        x.estimate(max_memory=1000)
+        assert False, 'ValueError should be raised when the estimated memory is above max_memory'
+    except ValueError as ve:
+        assert str(ve).startswith('estimated peak memory of ')
+        assert str(ve).endswith('set memory_limit to spill timestep data to disk')
+
+    try:
+        x.estimate(max_seconds=0)
+        assert False, 'ValueError should be raised when the estimated run time is above max_seconds'
+    except ValueError as ve:
+        assert str(ve).endswith('use the vectorized engine or more workers')
@@ -0,0 +1,59 @@
+import portfoliosim as ps
+import pandas as pd
+import numpy as np
+import pytest
+
+
+@pytest.fixture
+def simulation_defaults(simulation_defaults):
+    return(dict(simulation_defaults, inflation=1.02, min_income_multiplier=0.5, cash_buffer_years=1))
+
+@pytest.fixture
+def historical_data(create_historical_data):
+    return(create_historical_data('sine'))
+
+@pytest.mark.parametrize('engine_config', [
+    {'engine': 'reference'},
+    {'engine': 'reference', 'workers': 2},
+    {'engine': 'vectorized'},
+    {'engine': 'vectorized', 'timestep_recording': 'compact'}
+    ])
+def test_iter_runs_matches_run_simulations(engine_config, create_simulation_config):
+    """
+    ensure that iter_runs yields batches in run_index order matching run_simulations
+    """
+    x = ps.Simulator(**create_simulation_config(**engine_config))
+    batches = list(x.iter_runs(batch_size=5))
+    assert [len(run_results) for run_results, timestep_data in batches] == [5,5,3]
+    assert len(x._get_run_results()) == 0
+
+    y = ps.Simulator(**create_simulation_config(**engine_config))
+    y.run_simulations()
+    run_results = pd.concat([run_results for run_results, timestep_data in batches],ignore_index=True)
+    timestep_data = pd.concat([timestep_data for run_results, timestep_data in batches],ignore_index=True)
+    assert list(run_results['run_index']) == list(range(13))
+    assert (run_results['simulator_id'] == x._get_simulator_inputs()['simulator_id']).all()
+    np.testing.assert_allclose(run_results['final_value'],y._get_run_results()['final_value'])
+    np.testing.assert_array_equal(run_results['survival_duration'],y._get_run_results()['survival_duration'])
+    assert len(timestep_data) == len(y._get_timestep_data())
+
+def test_iter_runs_stops_early(create_simulation_config):
+    """
+    ensure that closing iter_runs after the first batch stops the process pool
+    """
+    x = ps.Simulator(**create_simulation_config(workers=2))
+    runs = x.iter_runs(batch_size=1)
+    run_results, timestep_data = next(runs)
+    assert list(run_results['run_index']) == [0]
+    runs.close()
+
+def test_iter_runs_invalid_batch_size(create_simulation_config):
+    """
+    ensure that iter_runs rejects batch sizes that are not positive ints
+    """
+    x = ps.Simulator(**create_simulation_config())
+    try:
+        next(x.iter_runs(batch_size=0))
+        assert False, 'ValueError should be raised for batch_size below one'
+    except ValueError as ve:
+        assert str(ve) == "batch_size should be an int of at least one or None. received '0'"
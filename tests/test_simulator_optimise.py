@@ -0,0 +1,75 @@
+import portfoliosim as ps
+import numpy as np
+import pytest
+
+
+@pytest.fixture
+def historical_data(create_historical_data):
+    return(create_historical_data('random', years=12, seed=4, drift=(0.003,0.006,0.002), volatility=(0.05,0.08,0.02)))
+
+@pytest.fixture
+def simulation_defaults():
+    return({
+        'starting_portfolio_value': 1000000.0,
+        "desired_annual_income": 180000,
+        "inflation": 1.03,
+        "min_income_multiplier": 1.0,
+        "max_withdrawal_rate" : 0.1,
+        'simulation_length_years' : 6,
+        'cash_buffer_years' : 1
+        })
+
+def test_optimise_allocation_matches_simulator(create_simulation_config):
+    """
+    ensure that the best allocation is listed first and its metrics match a Simulator run
+    """
+    x = ps.Simulator(**create_simulation_config())
+    frontier = x.optimise_allocation()
+
+    assert list(frontier.columns) == ['stocks','gold','bonds','cash','success_rate','final_value_p50','on_frontier']
+    assert len(frontier) >= 286
+    assert np.allclose(frontier[['stocks','gold','bonds','cash']].sum(axis=1), 1)
+    assert (frontier[['stocks','gold','bonds','cash']] >= 0).all().all()
+    assert frontier['success_rate'].is_monotonic_decreasing
+    assert frontier['success_rate'].nunique() > 1
+    assert frontier['on_frontier'].iloc[0]
+
+    best = frontier.iloc[0]
+    y = ps.Simulator(**create_simulation_config(engine='vectorized',
+        portfolio_allocation={asset: best[asset] for asset in ['stocks','gold','bonds','cash']}))
+    y.run_simulations()
+    run_results = y._get_run_results()
+    assert best['success_rate'] == pytest.approx((run_results['survival_duration'] >= 6).mean())
+    assert best['final_value_p50'] == pytest.approx(run_results['final_value'].median())
+
+def test_optimise_allocation_frontier_and_assets(create_simulation_config):
+    """
+    ensure that restricted assets stay at zero and frontier points are not dominated
+    """
+    x = ps.Simulator(**create_simulation_config())
+    frontier = x.optimise_allocation(objective='final_value',percentile=25,assets=('stocks','cash'),grid_step=0.25,refinement_steps=1)
+
+    assert (frontier[['gold','bonds']] == 0).all().all()
+    assert frontier['final_value_p25'].is_monotonic_decreasing
+    on_frontier = frontier[frontier['on_frontier']]
+    for row in on_frontier.itertuples():
+        beaten = (frontier['success_rate'] >= row.success_rate) & (frontier['final_value_p25'] > row.final_value_p25)
+        beaten |= (frontier['success_rate'] > row.success_rate) & (frontier['final_value_p25'] >= row.final_value_p25)
+        assert not beaten.any()
+
+def test_optimise_allocation_invalid_arguments(create_simulation_config):
+    """
+    ensure that unknown objectives and grid steps that do not divide 1 are rejected
+    """
+    x = ps.Simulator(**create_simulation_config())
+    try:
+        x.optimise_allocation(objective='sharpe')
+        assert False, 'ValueError should be raised for unknown objectives'
+    except ValueError as ve:
+        assert str(ve) == "objective should be one of 'success_rate', 'final_value'. received 'sharpe'"
+
+    try:
+        x.optimise_allocation(grid_step=0.3)
+        assert False, 'ValueError should be raised for grid steps that do not divide 1'
+    except ValueError as ve:
+        assert str(ve) == "grid_step should divide 1 into a whole number of steps. received '0.3'"
@@ -0,0 +1,59 @@
+import portfoliosim as ps
+from portfoliosim.shared import SharedArray, attach_shared_array
+import pandas as pd
+import numpy as np
+import pytest
+
+
+@pytest.fixture
+def simulation_defaults(simulation_defaults):
+    return(dict(simulation_defaults, inflation=1.02, min_income_multiplier=0.5, cash_buffer_years=1))
+
+@pytest.fixture
+def historical_data(create_historical_data):
+    return(create_historical_data('sine'))
+
+def test_simulator_check_workers(create_simulation_config):
+    """
+    ensure that Simulator flags workers that are not positive ints
+    """
+    for i in [0,-1,1.5,'a']:
+        try:
+            x = ps.Simulator(**create_simulation_config(workers=i))
+            assert False, 'ValueError should be raised when workers is not an int of at least one'
+        except ValueError as ve:
+            assert str(ve) == f"workers should be an int of at least one. received '{i}'"
+
+def test_shared_array_attach():
+    """
+    ensure that an attached shared array sees the published values without copying them
+    """
+    data = np.arange(12,dtype='float64').reshape(4,3)
+    with SharedArray(data) as shared:
+        attached = attach_shared_array(shared.get_descriptor())
+        np.testing.assert_array_equal(attached,data)
+        shared.get_array()[0,0] = 99
+        assert attached[0,0] == 99
+        assert not attached.flags.writeable
+
+def test_simulator_parallel_matches_serial(create_simulation_config):
+    """
+    ensure that running simulations in worker processes gives the same results as running serially
+    """
+    for timestep_recording in ['full','compact']:
+        serial = ps.Simulator(**create_simulation_config(timestep_recording=timestep_recording))
+        serial.run_simulations()
+        parallel = ps.Simulator(**create_simulation_config(timestep_recording=timestep_recording,workers=2))
+        parallel.run_simulations()
+
+        serial_runs = serial._get_run_results()
+        parallel_runs = parallel._get_run_results()
+        assert parallel_runs['run_id'].is_unique
+        pd.testing.assert_frame_equal(
+            parallel_runs.drop(columns=['run_id','simulator_id']),
+            serial_runs.drop(columns=['run_id','simulator_id'])
+            )
+        pd.testing.assert_frame_equal(
+            parallel._get_timestep_data().drop(columns=['run_id','simulator_id'],errors='ignore'),
+            serial._get_timestep_data().drop(columns=['run_id','simulator_id'],errors='ignore')
+            )
@@ -0,0 +1,51 @@
+import pandas as pd
+import numpy as np
+import pytest
+
+
+@pytest.fixture
+def simulation_defaults(simulation_defaults):
+    return(dict(simulation_defaults, cash_buffer_years=1))
+
+@pytest.fixture
+def historical_data(create_historical_data):
+    return(create_historical_data('sine'))
+
+@pytest.mark.parametrize('timestep_recording', ['full','compact'])
+def test_percentile_bands_match_groupby_quantile(timestep_recording, create_simulator):
+    """
+    ensure that percentile bands match a groupby quantile over the timestep data
+    """
+    x = create_simulator(timestep_recording=timestep_recording)
+    bands = x.percentile_bands()
+
+    timestep_data = x._get_timestep_data().astype({'stocks_value':'float64','gold_value':'float64',
+        'bonds_value':'float64','cash_notional':'float64','cash_buffer':'float64'})
+    total_value = (timestep_data['stocks_value'] + timestep_data['gold_value'] + timestep_data['bonds_value']
+        + timestep_data['cash_notional'] + timestep_data['cash_buffer'])
+    expected = total_value.groupby(timestep_data['timestep']).quantile([0.05,0.25,0.5,0.75,0.95]).unstack()
+
+    assert list(bands.columns) == ['timestep','p5','p25','p50','p75','p95']
+    assert list(bands['timestep']) == [1,2]
+    np.testing.assert_allclose(bands[['p5','p25','p50','p75','p95']].to_numpy(), expected.to_numpy())
+
+def test_write_results_writes_percentile_bands(tmp_path, create_simulator):
+    """
+    ensure that write_results writes percentile bands next to the other results
+    """
+    x = create_simulator()
+    x.write_results(str(tmp_path)+'/')
+    simulator_id = x._get_run_results()['simulator_id'][0]
+    written = pd.read_csv(tmp_path / str(simulator_id) / 'percentile_bands.csv')
+    pd.testing.assert_frame_equal(written, x.percentile_bands())
+
+def test_percentile_bands_invalid_percentile(create_simulator):
+    """
+    ensure that percentiles outside 0 to 100 raise an error
+    """
+    x = create_simulator()
+    try:
+        x.percentile_bands((50,150))
+        assert False, 'ValueError should be raised for percentiles above 100'
+    except ValueError as ve:
+        assert str(ve) == "percentiles should be between 0 and 100 inclusive. received '150'"
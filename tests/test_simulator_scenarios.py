@@ -0,0 +1,78 @@
+import portfoliosim as ps
+from portfoliosim.kernel import build_window_arrays
+from portfoliosim.scenarios import apply_scenario
+import numpy as np
+import pytest
+
+
+@pytest.fixture
+def historical_data(create_historical_data):
+    return(create_historical_data('random', years=10, seed=3))
+
+@pytest.fixture
+def simulation_defaults():
+    return({
+        'starting_portfolio_value': 1000000.0,
+        "desired_annual_income": 150000,
+        "inflation": 1.03,
+        "min_income_multiplier": 0.5,
+        "max_withdrawal_rate" : 0.1,
+        'simulation_length_years' : 5,
+        'cash_buffer_years' : 1
+        })
+
+def test_apply_scenario_overlays_shocks(historical_data):
+    """
+    ensure that shocked years take the shock return and later years keep their historical return
+    """
+    prices, years, months = build_window_arrays(historical_data, 5)
+    shocked = apply_scenario(prices, {'stocks': [-0.4, 0, None]})
+
+    np.testing.assert_allclose(shocked[:,0,:], prices[:,0,:])
+    np.testing.assert_allclose(shocked[:,1,0], 0.6*prices[:,0,0])
+    np.testing.assert_allclose(shocked[:,2,0], shocked[:,1,0])
+    np.testing.assert_allclose(shocked[:,3,0]/shocked[:,2,0], prices[:,3,0]/prices[:,2,0])
+    np.testing.assert_allclose(shocked[:,4,0]/shocked[:,3,0], prices[:,4,0]/prices[:,3,0])
+    np.testing.assert_allclose(shocked[:,:,1:], prices[:,:,1:])
+
+def test_run_scenarios_matches_shocked_simulator(create_simulation_config, historical_data):
+    """
+    ensure that a scenario run matches a Simulator run on the shocked time frame
+    """
+    x = ps.Simulator(**create_simulation_config())
+    run_results = x.run_scenarios({'crash': {'stocks': [-0.4, 0, 0]}, 'gold rally': {'gold': [0.5]}})
+
+    assert list(run_results['scenario'].unique()) == ['historical','crash','gold rally']
+    assert (run_results.groupby('scenario').size() == 120 - 12*5 + 1).all()
+
+    # rebuild the shocked version of one time frame as monthly historical data
+    start = 7
+    prices, years, months = build_window_arrays(historical_data, 5)
+    shocked = apply_scenario(prices, {'stocks': [-0.4, 0, 0]})[start]
+    shocked_history = historical_data.iloc[start:start+60].reset_index(drop=True)
+    for n, asset in enumerate(['stocks','gold','bonds']):
+        shocked_history.loc[[0,12,24,36,48], asset] = shocked[:,n]
+    y = ps.Simulator(**create_simulation_config(historical_data_source=shocked_history))
+    y.run_simulations()
+
+    crash = run_results[(run_results['scenario'] == 'crash') & (run_results['run_index'] == start)].iloc[0]
+    assert crash['final_value'] == pytest.approx(y._get_run_results()['final_value'][0])
+    assert crash['survival_duration'] == y._get_run_results()['survival_duration'][0]
+    assert crash['start_ref_year'] == 2000 and crash['start_ref_month'] == 8
+
+def test_run_scenarios_invalid_shocks(create_simulation_config):
+    """
+    ensure that unknown assets and returns of -100% or less raise errors
+    """
+    x = ps.Simulator(**create_simulation_config())
+    try:
+        x.run_scenarios({'crash': {'cash': [-0.4]}})
+        assert False, 'ValueError should be raised for shocks on cash'
+    except ValueError as ve:
+        assert str(ve) == "scenario assets should only be stocks, gold, bonds. received 'cash'"
+
+    try:
+        x.run_scenarios({'crash': {'stocks': [-1]}})
+        assert False, 'ValueError should be raised for returns of -100%'
+    except ValueError as ve:
+        assert str(ve) == "scenario returns should be greater than -1. received '-1' for stocks in crash"
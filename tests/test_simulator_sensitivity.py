@@ -0,0 +1,84 @@
+import portfoliosim as ps
+import pytest
+
+
+@pytest.fixture
+def historical_data(create_historical_data):
+    return(create_historical_data('random', years=10, seed=2))
+
+@pytest.fixture
+def simulation_defaults():
+    return({
+        'starting_portfolio_value': 1000000.0,
+        "desired_annual_income": 150000,
+        "inflation": 1.03,
+        "min_income_multiplier": 0.5,
+        "max_withdrawal_rate" : 0.1,
+        'simulation_length_years' : 5,
+        'cash_buffer_years' : 1
+        })
+
+def get_summary(simulator):
+    simulator.run_simulations()
+    run_results = simulator._get_run_results()
+    return({
+        'success_rate': (run_results['survival_duration'] >= 5).mean(),
+        'median_final_value': run_results['final_value'].median()
+        })
+
+def test_sensitivity_matches_separate_runs(create_simulation_config):
+    """
+    ensure that the base and perturbed metrics match separate Simulator runs
+    """
+    x = ps.Simulator(**create_simulation_config())
+    sensitivity = x.sensitivity(['max_withdrawal_rate','cash_buffer_years'],[0.02,1])
+
+    assert list(sensitivity['parameter']) == 2*['max_withdrawal_rate'] + 2*['cash_buffer_years']
+    assert list(sensitivity['metric']) == 2*['success_rate','median_final_value']
+
+    expected = {
+        ('max_withdrawal_rate','base'): get_summary(ps.Simulator(**create_simulation_config())),
+        ('max_withdrawal_rate','lower'): get_summary(ps.Simulator(**create_simulation_config(max_withdrawal_rate=0.08))),
+        ('max_withdrawal_rate','upper'): get_summary(ps.Simulator(**create_simulation_config(max_withdrawal_rate=0.12))),
+        ('cash_buffer_years','lower'): get_summary(ps.Simulator(**create_simulation_config(cash_buffer_years=0))),
+        ('cash_buffer_years','upper'): get_summary(ps.Simulator(**create_simulation_config(cash_buffer_years=2)))
+        }
+    for row in sensitivity.itertuples():
+        assert row.base == pytest.approx(expected[('max_withdrawal_rate','base')][row.metric])
+        assert row.lower == pytest.approx(expected[(row.parameter,'lower')][row.metric])
+        assert row.upper == pytest.approx(expected[(row.parameter,'upper')][row.metric])
+        assert row.partial_effect == pytest.approx((row.upper - row.lower) / (row.upper_value - row.lower_value))
+
+def test_sensitivity_one_sided_at_boundary(create_simulation_config):
+    """
+    ensure that a perturbation outside the valid range falls back to the base value
+    """
+    x = ps.Simulator(**create_simulation_config(max_withdrawal_rate=1.0))
+    sensitivity = x.sensitivity(['max_withdrawal_rate','stocks_allocation'],{'max_withdrawal_rate': 0.1, 'stocks_allocation': 0.1})
+
+    withdrawal = sensitivity[sensitivity['parameter'] == 'max_withdrawal_rate'].iloc[0]
+    assert withdrawal['upper_value'] == 1.0
+    assert withdrawal['lower_value'] == pytest.approx(0.9)
+    assert withdrawal['upper'] == withdrawal['base']
+
+    stocks = sensitivity[sensitivity['parameter'] == 'stocks_allocation'].iloc[0]
+    assert stocks['base_value'] == pytest.approx(0.6)
+    assert stocks['lower_value'] == pytest.approx(0.5)
+    assert stocks['upper_value'] == pytest.approx(0.7)
+
+def test_sensitivity_invalid_parameter(create_simulation_config):
+    """
+    ensure that unknown parameters and invalid deltas raise errors
+    """
+    x = ps.Simulator(**create_simulation_config())
+    try:
+        x.sensitivity(['starting_portfolio_value'],[1])
+        assert False, 'ValueError should be raised for parameters that cannot be perturbed'
+    except ValueError as ve:
+        assert str(ve) == "parameters should be among max_withdrawal_rate, inflation, desired_annual_income, min_income_multiplier, cash_buffer_years, stocks_allocation. received 'starting_portfolio_value'"
+
+    try:
+        x.sensitivity(['cash_buffer_years'],[0.5])
+        assert False, 'ValueError should be raised for fractional cash_buffer_years deltas'
+    except ValueError as ve:
+        assert str(ve) == "delta for cash_buffer_years should be an int of at least one. received '0.5'"
@@ -0,0 +1,173 @@
+import portfoliosim as ps
+from portfoliosim.results import ChunkedResults
+from portfoliosim.validation import validate_configs
+import pandas as pd
+import pathlib
+import gc
+import pytest
+
+
+@pytest.fixture
+def simulation_defaults(simulation_defaults):
+    return(dict(simulation_defaults, cash_buffer_years=1))
+
+@pytest.fixture
+def historical_data(create_historical_data):
+    return(create_historical_data('sine'))
+
+@pytest.mark.parametrize('config', [
+    {},
+    {'timestep_recording': 'compact'},
+    {'engine': 'vectorized'},
+    {'engine': 'vectorized', 'timestep_recording': 'compact'}
+    ])
+def test_spilled_timestep_data_matches_in_memory(tmp_path, config, create_simulation_config):
+    """
+    ensure that timestep data spilled under a memory limit reads back the same as when held in memory
+    """
+    in_memory = ps.Simulator(**create_simulation_config(**config))
+    in_memory.run_simulations()
+    spilled = ps.Simulator(**create_simulation_config(memory_limit=600, spill_directory=str(tmp_path / 'spill'), **config))
+    spilled.run_simulations()
+
+    view = spilled._get_timestep_data()
+    assert isinstance(view, ChunkedResults)
+    assert len(view.get_chunks()) > 1
+    assert len(view) == len(in_memory._get_timestep_data())
+
+    expected = in_memory._get_timestep_data().drop(columns=['run_id','simulator_id'], errors='ignore')
+    actual = view.to_frame()
+    assert list(actual.columns) == list(in_memory._get_timestep_data().columns)
+    pd.testing.assert_frame_equal(actual.drop(columns=['run_id','simulator_id'], errors='ignore'), expected)
+    pd.testing.assert_frame_equal(
+        spilled._get_run_results().drop(columns=['run_id','simulator_id']),
+        in_memory._get_run_results().drop(columns=['run_id','simulator_id'])
+        )
+    pd.testing.assert_frame_equal(spilled.percentile_bands(), in_memory.percentile_bands())
+
+def test_spilled_timestep_data_written_as_csv(tmp_path, create_simulation_config):
+    """
+    ensure that write_results writes spilled timestep data to a single csv
+    """
+    x = ps.Simulator(**create_simulation_config(memory_limit=600, spill_directory=str(tmp_path / 'spill')))
+    x.run_simulations()
+    x.write_results(str(tmp_path)+'/')
+    simulator_id = x._get_run_results()['simulator_id'][0]
+    written = pd.read_csv(tmp_path / str(simulator_id) / 'timestep_data.csv')
+    expected = x._get_timestep_data().to_frame()
+    assert len(written) == len(expected)
+    assert (written['run_id'] == expected['run_id']).all()
+
+    x.write_results(str(tmp_path / 'columnar')+'/', timestep_format='columnar')
+    copied = ChunkedResults(tmp_path / 'columnar' / str(simulator_id) / 'timestep_data')
+    pd.testing.assert_frame_equal(copied.to_frame(), expected)
+
+def test_memory_limit_not_reached_stays_in_memory(tmp_path, create_simulation_config):
+    """
+    ensure that timestep data below the memory limit is kept as a data frame
+    """
+    x = ps.Simulator(**create_simulation_config(memory_limit=10**9, spill_directory=str(tmp_path / 'spill')))
+    x.run_simulations()
+    assert isinstance(x._get_timestep_data(), pd.DataFrame)
+    assert len(x._get_timestep_data()) == 26
+
+@pytest.mark.parametrize('config', [{}, {'engine': 'vectorized'}])
+def test_simulators_sharing_spill_directory(tmp_path, config, create_simulation_config):
+    """
+    ensure that simulators spilling to the same spill_directory keep their own chunks
+    """
+    a = ps.Simulator(**create_simulation_config(memory_limit=600, spill_directory=str(tmp_path), **config))
+    b = ps.Simulator(**create_simulation_config(memory_limit=600, spill_directory=str(tmp_path), desired_annual_income=80000, **config))
+    a.run_simulations()
+    b.run_simulations()
+
+    for x, desired_annual_income in ((a, 30000), (b, 80000)):
+        simulator_id = x._get_run_results()['simulator_id'][0]
+        view = x._get_timestep_data()
+        assert view.get_path() == tmp_path / str(simulator_id)
+        timestep_data = view.to_frame()
+        assert (timestep_data['simulator_id'] == simulator_id).all()
+        assert timestep_data.loc[timestep_data['timestep'] == 0, 'desired_allowance'].eq(desired_annual_income / 12).all()
+
+def test_spilled_simulator_run_twice(tmp_path, create_simulation_config):
+    """
+    ensure that running a spilled simulator again adds its chunks to the same view
+    """
+    x = ps.Simulator(**create_simulation_config(memory_limit=600, spill_directory=str(tmp_path)))
+    x.run_simulations()
+    first = x._get_timestep_data().to_frame()
+    x.run_simulations()
+    view = x._get_timestep_data()
+    assert isinstance(view, ChunkedResults)
+    assert len(view) == 2 * len(first)
+    pd.testing.assert_frame_equal(view.to_frame().iloc[:len(first)], first)
+
+def test_interrupted_spilling_run_can_run_again(tmp_path, monkeypatch, create_simulation_config):
+    """
+    ensure that a spilling run that is interrupted removes its chunks so the simulator can run again
+    """
+    kernel_results_to_frames = ps.simulator.kernel_results_to_frames
+    calls = []
+    def interrupt_third_batch(*args, **kwargs):
+        calls.append(1)
+        if len(calls) == 3:
+            raise KeyboardInterrupt
+        return(kernel_results_to_frames(*args, **kwargs))
+    monkeypatch.setattr(ps.simulator, 'kernel_results_to_frames', interrupt_third_batch)
+
+    x = ps.Simulator(**create_simulation_config(memory_limit=600, spill_directory=str(tmp_path), engine='vectorized'))
+    try:
+        x.run_simulations()
+        assert False, 'KeyboardInterrupt should be raised by the third batch'
+    except KeyboardInterrupt:
+        pass
+    simulator_id = x._get_simulator_inputs()['simulator_id']
+    assert list((tmp_path / str(simulator_id)).iterdir()) == []
+    assert len(x._get_run_results()) == 0
+
+    monkeypatch.setattr(ps.simulator, 'kernel_results_to_frames', kernel_results_to_frames)
+    x.run_simulations()
+    expected = ps.Simulator(**create_simulation_config(engine='vectorized'))
+    expected.run_simulations()
+    assert isinstance(x._get_timestep_data(), ChunkedResults)
+    pd.testing.assert_frame_equal(
+        x._get_timestep_data().to_frame().drop(columns=['run_id','simulator_id']),
+        expected._get_timestep_data().drop(columns=['run_id','simulator_id'])
+        )
+
+def test_spill_directory_holding_chunks(create_simulation_config):
+    """
+    ensure that a spill folder already holding chunks is not written over
+    """
+    x = ps.Simulator(**create_simulation_config(memory_limit=600))
+    x.run_simulations()
+    path = x._get_timestep_data().get_path()
+    try:
+        ps.spill.TimestepSpill(600, path, 'run_id', pd.DataFrame())
+        assert False, 'ValueError should be raised when spill_directory already holds chunks'
+    except ValueError as ve:
+        assert str(ve) == f"spill_directory should not already hold spilled chunks. received '{path}'"
+
+def test_default_spill_directory_removed(create_simulation_config):
+    """
+    ensure that the default temporary spill folder is removed with its simulator
+    """
+    x = ps.Simulator(**create_simulation_config(memory_limit=600))
+    x.run_simulations()
+    path = pathlib.Path(x._get_timestep_data().get_path())
+    assert path.exists()
+    del x
+    gc.collect()
+    assert not path.exists()
+
+def test_invalid_memory_limit(create_simulation_config):
+    """
+    ensure that memory_limit that is not a positive int raises errors
+    """
+    try:
+        ps.Simulator(**create_simulation_config(memory_limit=0.5))
+        assert False, 'ValueError should be raised when memory_limit is not an int'
+    except ValueError as ve:
+        assert str(ve) == "memory_limit should be an int of at least one byte or None. received '0.5'"
+        valid_configs, errors = validate_configs([create_simulation_config(memory_limit=0.5)])
+        assert errors['message'].tolist() == [str(ve)]
@@ -0,0 +1,145 @@
+import portfoliosim as ps
+from portfoliosim.kernel import build_window_arrays, normalise_allocation, get_income_arrays, get_config_arrays, run_kernel, run_config_kernel
+import portfoliosim.kernel
+import pandas as pd
+import numpy as np
+import pytest
+
+
+@pytest.fixture
+def historical_data(create_historical_data):
+    return(create_historical_data('random', years=10, seed=1))
+
+@pytest.fixture
+def simulation_defaults():
+    return({
+        'starting_portfolio_value': 1000000.0,
+        "desired_annual_income": 60000,
+        "inflation": 1.03,
+        "min_income_multiplier": 0.5,
+        "max_withdrawal_rate" : 0.04,
+        'simulation_length_years' : 5,
+        'cash_buffer_years' : 2
+        })
+
+@pytest.mark.parametrize('config', [
+    {},
+    {'desired_annual_income': 300000, 'max_withdrawal_rate': 0.5, 'cash_buffer_years': 3, 'min_income_multiplier': 0.8},
+    {'desired_annual_income': 20000, 'max_withdrawal_rate': 0.03, 'cash_buffer_years': 0, 'min_income_multiplier': 1},
+    {'desired_annual_income': 90000, 'max_withdrawal_rate': 0.06, 'cash_buffer_years': 5, 'min_income_multiplier': 0.3,
+        'portfolio_allocation': {'stocks': 0.5, 'bonds': 0.2, 'gold': 0.1, 'cash': 0.2}},
+    ])
+def test_simulator_vectorized_matches_reference(config, create_simulation_config):
+    """
+    ensure that the vectorized engine reproduces the reference engine's results
+    """
+    reference = ps.Simulator(**create_simulation_config(**config))
+    reference.run_simulations()
+    vectorized = ps.Simulator(**create_simulation_config(engine='vectorized',**config))
+    vectorized.run_simulations()
+
+    pd.testing.assert_frame_equal(
+        vectorized._get_run_results().drop(columns=['run_id','simulator_id']),
+        reference._get_run_results().drop(columns=['run_id','simulator_id']),
+        rtol=1e-9
+        )
+    pd.testing.assert_frame_equal(
+        vectorized._get_timestep_data().drop(columns=['run_id','simulator_id']),
+        reference._get_timestep_data().drop(columns=['run_id','simulator_id']),
+        rtol=1e-9
+        )
+    assert vectorized._get_run_results()['run_id'].is_unique
+
+def test_simulator_vectorized_survival_duration(create_simulation_config):
+    """
+    ensure that the vectorized engine records failures the same way as the reference engine
+    """
+    config = {'desired_annual_income': 400000, 'max_withdrawal_rate': 1.0, 'min_income_multiplier': 1}
+    reference = ps.Simulator(**create_simulation_config(**config))
+    reference.run_simulations()
+    vectorized = ps.Simulator(**create_simulation_config(engine='vectorized',**config))
+    vectorized.run_simulations()
+
+    survival_duration = vectorized._get_run_results()['survival_duration']
+    assert survival_duration.max() < 5
+    assert list(survival_duration) == list(reference._get_run_results()['survival_duration'])
+
+def test_simulator_vectorized_compact_recording(create_simulation_config):
+    """
+    ensure that the vectorized engine produces the compact layout directly
+    """
+    full = ps.Simulator(**create_simulation_config(engine='vectorized'))
+    full.run_simulations()
+    compact = ps.Simulator(**create_simulation_config(engine='vectorized',timestep_recording='compact'))
+    compact.run_simulations()
+
+    assert compact._get_timestep_data()['stocks_value'].dtype == 'float32'
+    pd.testing.assert_frame_equal(
+        compact._get_expanded_timestep_data().drop(columns=['run_id','simulator_id']),
+        full._get_timestep_data().drop(columns=['run_id','simulator_id']),
+        check_dtype=False,
+        rtol=1e-6
+        )
+
+def test_simulator_check_engine(create_simulation_config):
+    """
+    ensure that Simulator flags unknown engines and workers with the vectorized engine
+    """
+    try:
+        ps.Simulator(**create_simulation_config(engine='gpu'))
+        assert False, 'ValueError should be raised for unknown engines'
+    except ValueError as ve:
+        assert str(ve) == "engine should be one of 'reference', 'vectorized'. received 'gpu'"
+    try:
+        ps.Simulator(**create_simulation_config(engine='vectorized',workers=2))
+        assert False, 'ValueError should be raised for workers with the vectorized engine'
+    except ValueError as ve:
+        assert str(ve) == "the vectorized engine runs in a single process. received workers '2'"
+
+def test_build_window_arrays():
+    """
+    ensure that window arrays hold one row per year of each time frame
+    """
+    historical_data = pd.DataFrame(data={
+        'year': 12*[2000]+12*[2001],
+        'month': 2*list(range(1,13)),
+        'stocks': np.arange(24.0),
+        'bonds': np.arange(24.0)+100
+        })
+    prices, years, months = build_window_arrays(historical_data,1)
+    assert prices.shape == (13,1,3)
+    assert list(prices[-1,0]) == [12.0,1.0,112.0]
+    assert list(years[:,0]) == 12*[2000]+[2001]
+
+def test_normalise_allocation_leaves_input_untouched():
+    """
+    ensure that normalise_allocation does not modify the caller's dict
+    """
+    portfolio_allocation = {'stocks': 2, 'bonds': 1, 'gold': 1, 'cash': 0}
+    np.testing.assert_allclose(normalise_allocation(portfolio_allocation),[0.5,0.25,0.25,0.0])
+    assert portfolio_allocation == {'stocks': 2, 'bonds': 1, 'gold': 1, 'cash': 0}
+
+def test_run_config_kernel_matches_run_kernel(monkeypatch, create_simulation_config, historical_data):
+    """
+    ensure that every config of a config-batched kernel run matches its own run_kernel call, across blocks
+    """
+    monkeypatch.setattr(portfoliosim.kernel, 'CONFIG_BLOCK_ELEMENTS', 100)
+    prices, years, months = build_window_arrays(historical_data, 5)
+    configs = [
+        dict(create_simulation_config(), desired_annual_income=income, max_withdrawal_rate=rate, cash_buffer_years=buffer,
+            portfolio_allocation={'stocks': stocks, 'bonds': 0.9 - stocks, 'gold': 0.05, 'cash': 0.05})
+        for income, rate, buffer, stocks in [(20000,0.03,0,0.6),(60000,0.04,2,0.3),(300000,0.5,3,0.9),(90000,0.06,5,0.5)]
+        ]
+    results = run_config_kernel(prices, **get_config_arrays(configs, 5), record_timesteps=True)
+    shifted = run_config_kernel(np.stack([prices, 2*prices, prices, prices]), **get_config_arrays(configs, 5))
+    assert results['final_value'].shape == (4, len(prices))
+
+    for n, config in enumerate(configs):
+        desired_income, min_income = get_income_arrays(config['desired_annual_income'], config['inflation'], config['min_income_multiplier'], 5)
+        for config_prices, config_results in ((prices, results), (prices if n != 1 else 2*prices, shifted)):
+            expected = run_kernel(config_prices, desired_income, min_income, config['starting_portfolio_value'],
+                config['max_withdrawal_rate'], normalise_allocation(config['portfolio_allocation']), config['cash_buffer_years'])
+            np.testing.assert_array_equal(config_results['final_value'][n], expected['final_value'])
+            np.testing.assert_array_equal(config_results['survival_duration'][n], expected['survival_duration'])
+            if config_results is results:
+                np.testing.assert_array_equal(results['timesteps']['allowance'][n], expected['timesteps']['allowance'])
@@ -0,0 +1,118 @@
+import portfoliosim as ps
+from portfoliosim.validation import validate_configs
+from portfoliosim.batch import run_config_table, summarise_runs
+import pandas as pd
+import numpy as np
+
+
+def test_validate_configs_reports_all_errors_per_row():
+    """
+    ensure that every error of every row is reported with Simulator's messages
+    """
+    configs = [
+        {'starting_portfolio_value': 1000, 'inflation': 'a', 'max_withdrawal_rate': 2},
+        {'starting_portfolio_value': 1000},
+        {'starting_portfolio_value': -1, 'min_income_multiplier': 1.5, 'cash_buffer_years': -1,
+            'portfolio_allocation': {'stocks': -0.5, 'cats': 1}},
+        {'desired_annual_income': 10, 'simulation_length_years': 2.5, 'engine': 'gpu'}
+        ]
+    valid_configs, errors = validate_configs(configs)
+
+    assert list(valid_configs.index) == [1]
+    messages = errors.groupby('row')['message'].apply(list).to_dict()
+    assert messages[0] == [
+        "inflation should be castable to float. received 'a' of type <class 'str'>",
+        "max_withdrawal_rate should be greater than zero and less than or equal to one. received '2'"
+        ]
+    assert sorted(messages[2]) == sorted([
+        "portfolio_allocation for stocks should be at least zero. received '-0.5'",
+        'portfolio_allocation for gold is required',
+        'portfolio_allocation for bonds is required',
+        'portfolio_allocation for cash is required',
+        "portfolio assets should only be stocks, bonds, cash, gold. received 'cats'",
+        "starting_portfolio_value should be greater than zero. received '-1'",
+        "cash_buffer_years should be at least zero. received '-1'",
+        "min_income_multiplier should be between 0 and 1 inclusive. received '1.5'"
+        ])
+    assert sorted(messages[3]) == sorted([
+        'starting_portfolio_value is required',
+        "simulation_length_years should be castable to int. received '2.5' of type <class 'float'>",
+        "engine should be one of 'reference', 'vectorized'. received 'gpu'"
+        ])
+
+def test_validate_configs_matches_simulator_messages():
+    """
+    ensure that the first error reported for a row is the one Simulator raises
+    """
+    config = {'starting_portfolio_value': 1000000.0, 'desired_annual_income': 100000, 'inflation': 1.01,
+        'min_income_multiplier': 0.5, 'max_withdrawal_rate': 0}
+    valid_configs, errors = validate_configs([config])
+    try:
+        ps.Simulator(**config)
+        assert False, 'ValueError should be raised when max_withdrawal_rate is 0'
+    except ValueError as ve:
+        assert errors['message'].tolist() == [str(ve)]
+
+def test_validate_configs_accepts_data_frame():
+    """
+    ensure that a data frame with flattened allocation columns is validated and cast
+    """
+    configs = pd.DataFrame({
+        'starting_portfolio_value': ['1000', '2000'],
+        'stocks_allocation': [1.0, 'x'],
+        'bonds_allocation': [0.0, 1.0]
+        }, index=['a','b'])
+    valid_configs, errors = validate_configs(configs)
+    assert list(valid_configs.index) == ['a']
+    assert valid_configs['starting_portfolio_value'].dtype == 'float64'
+    assert valid_configs.loc['a','gold_allocation'] == 0.0
+    assert errors['message'].tolist() == ["portfolio_allocation for stocks should be castable to float. received 'x' of type <class 'str'>"]
+
+def test_run_config_table_matches_simulator(create_historical_data):
+    """
+    ensure that valid configs run straight on the vectorized kernel give Simulator's results
+    """
+    historical_data = create_historical_data('sine')
+    configs = [
+        {'starting_portfolio_value': 1000000, 'desired_annual_income': 30000, 'simulation_length_years': 2,
+            'historical_data_source': historical_data, 'cash_buffer_years': 1},
+        {'starting_portfolio_value': 1000000, 'desired_annual_income': 300000, 'simulation_length_years': 2,
+            'historical_data_source': historical_data, 'max_withdrawal_rate': 0.1,
+            'portfolio_allocation': {'stocks': 1, 'bonds': 0, 'gold': 1, 'cash': 0}}
+        ]
+    valid_configs, errors = validate_configs(configs)
+    run_results = run_config_table(valid_configs)
+
+    for row, config in enumerate(configs):
+        x = ps.Simulator(**config)
+        x.run_simulations()
+        runs = run_results[run_results['config'] == row]
+        np.testing.assert_allclose(runs['final_value'].to_numpy(),x._get_run_results()['final_value'].to_numpy())
+        assert list(runs['survival_duration']) == list(x._get_run_results()['survival_duration'])
+
+    summary = summarise_runs(run_results)
+    assert list(summary['runs']) == [13,13]
+    assert summary.loc[0,'success_rate'] == 1.0
+
+def test_validate_configs_reports_invalid_portfolio_allocation():
+    """
+    ensure that a portfolio_allocation that is not a dict is reported instead of replaced by the default
+    """
+    configs = [
+        {'starting_portfolio_value': 1000, 'portfolio_allocation': 'stocks'},
+        {'starting_portfolio_value': 1000, 'portfolio_allocation': [0.6, 0.4]},
+        {'starting_portfolio_value': 1000, 'portfolio_allocation': None},
+        {'starting_portfolio_value': 1000}
+        ]
+    valid_configs, errors = validate_configs(configs)
+    assert list(valid_configs.index) == [2,3]
+    assert 'portfolio_allocation' not in valid_configs.columns
+    assert valid_configs.loc[2,'stocks_allocation'] == 0.6
+    assert errors['row'].tolist() == [0,1]
+    assert errors['field'].tolist() == ['portfolio_allocation','portfolio_allocation']
+    for row in [0,1]:
+        try:
+            ps.Simulator(**configs[row])
+            assert False, 'ValueError should be raised when portfolio_allocation is not a dict'
+        except ValueError as ve:
+            assert errors['message'][row] == str(ve)
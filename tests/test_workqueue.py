@@ -0,0 +1,106 @@
+from portfoliosim.workqueue import WorkQueue, run_worker, _keep_lease
+import pathlib
+import time
+import pytest
+
+
+@pytest.fixture
+def simulation_defaults(simulation_defaults, historical_data_path):
+    # work queue configs are stored as JSON, so historical data is given as a csv path
+    return(dict(simulation_defaults, historical_data_source=historical_data_path))
+
+def test_workqueue_deduplicates_configs(tmp_path, create_simulation_config):
+    """
+    ensure that identical configs map to the same work unit
+    """
+    with WorkQueue(tmp_path / 'queue.sqlite') as queue:
+        unit_ids = queue.add_configs([create_simulation_config(),create_simulation_config(),create_simulation_config(inflation=1.02)])
+        assert unit_ids[0] == unit_ids[1]
+        assert unit_ids[0] != unit_ids[2]
+        queue.add_configs([create_simulation_config()])
+        assert queue.get_status_counts()['pending'] == 2
+
+def test_workqueue_claim_complete(tmp_path, create_simulation_config):
+    """
+    ensure that units are claimed in order and complete units are not handed out again
+    """
+    with WorkQueue(tmp_path / 'queue.sqlite') as queue:
+        unit_ids = queue.add_configs([create_simulation_config(inflation=1.01),create_simulation_config(inflation=1.02)])
+        unit_id, config = queue.claim('a')
+        assert unit_id == unit_ids[0]
+        assert config['inflation'] == 1.01
+        assert not queue.complete(unit_id,'b','somewhere')
+        assert queue.complete(unit_id,'a','somewhere')
+        unit_id, config = queue.claim('b')
+        assert unit_id == unit_ids[1]
+        assert queue.claim('c') is None
+        assert queue.get_status_counts() == {'pending': 0, 'running': 1, 'complete': 1, 'failed': 0}
+
+def test_workqueue_reclaims_expired_lease(tmp_path, create_simulation_config):
+    """
+    ensure that a unit held by a worker whose lease expired can be claimed by another worker
+    """
+    with WorkQueue(tmp_path / 'queue.sqlite', lease_seconds=-1) as queue:
+        unit_ids = queue.add_configs([create_simulation_config()])
+        assert queue.claim('dead')[0] == unit_ids[0]
+        assert queue.claim('alive')[0] == unit_ids[0]
+        assert queue.get_units()[0]['attempts'] == 2
+
+def test_workqueue_run_worker_resumes(tmp_path, create_simulation_config):
+    """
+    ensure that run_worker writes results for each unit and does not recompute finished units
+    """
+    queue_path = tmp_path / 'queue.sqlite'
+    results_directory = str(tmp_path / 'results') + '/'
+    with WorkQueue(queue_path) as queue:
+        unit_ids = queue.add_configs([create_simulation_config(inflation=1.01),create_simulation_config(inflation=1.02)])
+
+    assert run_worker(queue_path,results_directory,max_units=1) == [unit_ids[0]]
+    first_results = list((pathlib.Path(results_directory) / unit_ids[0]).iterdir())
+    assert len(first_results) == 1
+
+    assert run_worker(queue_path,results_directory) == [unit_ids[1]]
+    assert list((pathlib.Path(results_directory) / unit_ids[0]).iterdir()) == first_results
+    assert (pathlib.Path(results_directory) / unit_ids[1]).exists()
+    with WorkQueue(queue_path) as queue:
+        assert queue.get_status_counts()['complete'] == 2
+
+def test_workqueue_run_worker_records_failures(tmp_path, create_simulation_config):
+    """
+    ensure that a unit whose Simulator raises is marked failed with the error
+    """
+    queue_path = tmp_path / 'queue.sqlite'
+    with WorkQueue(queue_path) as queue:
+        queue.add_configs([create_simulation_config(historical_data_source=str(tmp_path / 'missing.csv'))])
+    assert run_worker(queue_path,str(tmp_path / 'results') + '/') == []
+    with WorkQueue(queue_path) as queue:
+        units = queue.get_units()
+        assert units[0]['status'] == 'failed'
+        assert 'FileNotFoundError' in units[0]['error']
+
+def test_workqueue_complete_fail_check_worker(tmp_path, create_simulation_config):
+    """
+    ensure that a worker whose unit was taken over cannot complete or fail it
+    """
+    with WorkQueue(tmp_path / 'queue.sqlite', lease_seconds=-1) as queue:
+        unit_ids = queue.add_configs([create_simulation_config()])
+        queue.claim('dead')
+        queue.claim('alive')
+        assert not queue.fail(unit_ids[0],'dead','error')
+        assert not queue.complete(unit_ids[0],'dead','somewhere')
+        assert queue.get_units()[0]['status'] == 'running'
+        assert queue.fail(unit_ids[0],'alive','error')
+        assert queue.get_units()[0]['status'] == 'failed'
+
+def test_workqueue_keep_lease(tmp_path, create_simulation_config):
+    """
+    ensure that heartbeats keep other workers from claiming a unit past its lease
+    """
+    with WorkQueue(tmp_path / 'queue.sqlite', lease_seconds=0.5) as queue:
+        queue.add_configs([create_simulation_config()])
+        unit_id, config = queue.claim('a')
+        with _keep_lease(queue, unit_id, 'a', 0.05):
+            time.sleep(1)
+            assert queue.claim('b') is None
+        time.sleep(1)
+        assert queue.claim('b')[0] == unit_id